@@ -9,7 +9,8 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from models import Base
+from database import Base
+import models  # noqa: F401 - регистрирует модели в Base.metadata
 from database import SQLALCHEMY_DATABASE_URL
 
 # this is the Alembic Config object, which provides
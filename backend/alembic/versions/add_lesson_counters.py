@@ -0,0 +1,43 @@
+"""add per-student lesson counters
+
+Revision ID: add_lesson_counters
+Revises: add_tenant_shards
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_lesson_counters'
+down_revision = 'add_tenant_shards'
+branch_labels = None
+depends_on = None
+
+COUNTERS = {
+    # Отменённое занятие считается отменённым, даже если отмечено проведённым
+    'lessons_cancelled': "COALESCE(lessons.is_cancelled, false) = true",
+    'lessons_completed': "COALESCE(lessons.is_cancelled, false) = false AND COALESCE(lessons.is_completed, false) = true",
+    'lessons_scheduled': "COALESCE(lessons.is_cancelled, false) = false AND COALESCE(lessons.is_completed, false) = false",
+}
+
+
+def upgrade():
+    with op.batch_alter_table('students') as batch_op:
+        for name in COUNTERS:
+            batch_op.add_column(sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+
+    # Занятия в архиве (ARCHIVE_ENABLED) здесь не видны - их досчитывает
+    # задача lesson_counters с {"repair": true}
+    assignments = ", ".join(
+        f"{name} = (SELECT COUNT(*) FROM lessons WHERE lessons.student_id = students.id AND {condition})"
+        for name, condition in COUNTERS.items()
+    )
+    op.execute(f"UPDATE students SET {assignments}")
+
+
+def downgrade():
+    with op.batch_alter_table('students') as batch_op:
+        for name in COUNTERS:
+            batch_op.drop_column(name)
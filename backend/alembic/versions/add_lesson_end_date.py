@@ -0,0 +1,46 @@
+"""add lesson end_date for overlap checks
+
+Revision ID: add_lesson_end_date
+Revises: add_sync_tracking
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_lesson_end_date'
+down_revision = 'add_sync_tracking'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('lessons', sa.Column('end_date', sa.DateTime(), nullable=True))
+    op.create_index('ix_lessons_user_id_duration', 'lessons', ['user_id', 'duration'])
+
+    # Заполняем end_date в Python: арифметика дат в SQL у каждой СУБД своя
+    lessons = sa.table(
+        'lessons',
+        sa.column('id', sa.Integer),
+        sa.column('date', sa.DateTime),
+        sa.column('duration', sa.Integer),
+        sa.column('end_date', sa.DateTime),
+    )
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(lessons.c.id, lessons.c.date, lessons.c.duration)).fetchall()
+    for row in rows:
+        bind.execute(
+            lessons.update().where(lessons.c.id == row.id).values(
+                end_date=row.date + timedelta(minutes=row.duration)
+            )
+        )
+
+
+def downgrade():
+    op.drop_index('ix_lessons_user_id_duration', table_name='lessons')
+    with op.batch_alter_table('lessons') as batch_op:
+        batch_op.drop_column('end_date')
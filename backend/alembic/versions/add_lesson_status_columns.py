@@ -1,7 +1,7 @@
 """add lesson status columns
 
 Revision ID: add_lesson_status_columns
-Revises: 
+Revises: add_is_cancelled_to_lessons
 Create Date: 2024-04-02 10:00:00.000000
 
 """
@@ -11,7 +11,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision = 'add_lesson_status_columns'
-down_revision = None
+down_revision = 'add_is_cancelled_to_lessons'
 branch_labels = None
 depends_on = None
 
@@ -19,11 +19,13 @@ depends_on = None
 def upgrade():
     # Добавляем колонку is_completed
     op.add_column('lessons', sa.Column('is_completed', sa.Boolean(), nullable=False, server_default='false'))
-    # Добавляем колонку is_cancelled
-    op.add_column('lessons', sa.Column('is_cancelled', sa.Boolean(), nullable=False, server_default='false'))
+    # is_cancelled уже добавлена предыдущей ревизией в цепочке; на базах,
+    # где применялась только эта ревизия, колонки может не быть
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('lessons')}
+    if 'is_cancelled' not in columns:
+        op.add_column('lessons', sa.Column('is_cancelled', sa.Boolean(), nullable=False, server_default='false'))
 
 
 def downgrade():
-    # Удаляем колонки в обратном порядке
-    op.drop_column('lessons', 'is_cancelled')
+    # is_cancelled удаляется ревизией add_is_cancelled_to_lessons
     op.drop_column('lessons', 'is_completed') 
\ No newline at end of file
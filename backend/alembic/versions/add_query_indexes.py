@@ -0,0 +1,40 @@
+"""add composite indexes for router queries
+
+Revision ID: add_query_indexes
+Revises: add_lesson_status_columns
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_query_indexes'
+down_revision = 'add_lesson_status_columns'
+branch_labels = None
+depends_on = None
+
+
+# (имя индекса, таблица, колонки) - совпадают с __table_args__ моделей
+INDEXES = [
+    ('ix_lessons_user_id_date', 'lessons', ['user_id', 'date']),
+    ('ix_lessons_student_id_date', 'lessons', ['student_id', 'date']),
+    ('ix_students_user_id_name', 'students', ['user_id', 'name']),
+    ('ix_subscriptions_user_id_start_date', 'subscriptions', ['user_id', 'start_date']),
+    ('ix_subscriptions_student_id', 'subscriptions', ['student_id']),
+    ('ix_expenses_user_id_date', 'expenses', ['user_id', 'date']),
+    ('ix_expenses_user_id_category_date', 'expenses', ['user_id', 'category', 'date']),
+    ('ix_incomes_user_id_date', 'incomes', ['user_id', 'date']),
+    ('ix_incomes_user_id_category_date', 'incomes', ['user_id', 'category', 'date']),
+    ('ix_rent_settings_user_id', 'rent_settings', ['user_id']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
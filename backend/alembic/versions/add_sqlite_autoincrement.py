@@ -0,0 +1,71 @@
+"""never reuse ids of archived tables
+
+Revision ID: add_sqlite_autoincrement
+Revises: add_lesson_counters
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+import os
+import sqlite3
+
+from alembic import op
+import sqlalchemy as sa
+
+from config import settings
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_sqlite_autoincrement'
+down_revision = 'add_lesson_counters'
+branch_labels = None
+depends_on = None
+
+# Таблицы, строки которых переносит в архив services/archive.py
+TABLES = ('lessons', 'expenses', 'incomes')
+
+
+def _archive_max_ids():
+    # Архив подключается только в приложении - читаем файл напрямую
+    path = settings.ARCHIVE_DATABASE_PATH
+    if not os.path.exists(path):
+        return {}
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        return {
+            table: conn.execute(f'SELECT MAX(id) FROM "{table}"').fetchone()[0] or 0
+            for table in TABLES if table in existing
+        }
+    finally:
+        conn.close()
+
+
+def upgrade():
+    # Только SQLite выдаёт заново id удалённой строки с максимальным id;
+    # в PostgreSQL последовательности и так не откатываются
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for table in TABLES:
+        with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+
+    # Счётчик не ниже id, уже выданных строкам в основной таблице и в архиве
+    archived = _archive_max_ids()
+    for table in TABLES:
+        op.execute(sa.text("DELETE FROM sqlite_sequence WHERE name = :name").bindparams(name=table))
+        op.execute(
+            sa.text(
+                f"INSERT INTO sqlite_sequence (name, seq) "
+                f"SELECT :name, MAX(COALESCE(MAX(id), 0), :archived) FROM {table}"
+            ).bindparams(name=table, archived=archived.get(table, 0))
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for table in TABLES:
+        with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+            pass
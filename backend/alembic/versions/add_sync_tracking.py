@@ -0,0 +1,51 @@
+"""add change tracking for delta sync
+
+Revision ID: add_sync_tracking
+Revises: add_jobs_table
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_sync_tracking'
+down_revision = 'add_jobs_table'
+branch_labels = None
+depends_on = None
+
+
+TRACKED_TABLES = ['students', 'lessons', 'subscriptions', 'expenses', 'incomes']
+
+
+def upgrade():
+    op.add_column('users', sa.Column('change_seq', sa.Integer(), nullable=False, server_default='0'))
+    for table in TRACKED_TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        # Существующие строки получают 0 и попадают только в полную выгрузку (since=0)
+        op.add_column(table, sa.Column('change_seq', sa.Integer(), nullable=False, server_default='0'))
+        op.create_index(f'ix_{table}_user_id_change_seq', table, ['user_id', 'change_seq'])
+
+    op.create_table(
+        'sync_tombstones',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('entity', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('change_seq', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+    )
+    op.create_index('ix_sync_tombstones_user_id_change_seq', 'sync_tombstones', ['user_id', 'change_seq'])
+
+
+def downgrade():
+    op.drop_index('ix_sync_tombstones_user_id_change_seq', table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
+    for table in reversed(TRACKED_TABLES):
+        op.drop_index(f'ix_{table}_user_id_change_seq', table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('change_seq')
+            batch_op.drop_column('updated_at')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('change_seq')
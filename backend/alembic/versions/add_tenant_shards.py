@@ -0,0 +1,29 @@
+"""add tenant shard directory
+
+Revision ID: add_tenant_shards
+Revises: add_lesson_end_date
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_tenant_shards'
+down_revision = 'add_lesson_end_date'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'tenant_shards',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+        sa.Column('path', sa.String(), nullable=False, unique=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table('tenant_shards')
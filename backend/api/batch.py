@@ -0,0 +1,161 @@
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.sync import add_tombstones, stamp_change
+from schemas.batch import BatchItemResult, BatchResult
+from services.write_queue import run_write
+
+# SQLite ограничивает число параметров в одном запросе
+BATCH_CHUNK_SIZE = 500
+
+
+def chunked(ids: List[int], size: int = BATCH_CHUNK_SIZE) -> Iterable[List[int]]:
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def parse_ids(value: str, name: str = "ids") -> List[int]:
+    """"3,1,3" из строки запроса -> [3, 1]."""
+    try:
+        ids = list(dict.fromkeys(int(item) for item in value.split(",") if item.strip()))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{name} must be a comma-separated list of integers"
+        )
+    if len(ids) > settings.MULTI_GET_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.MULTI_GET_MAX_IDS} {name} per request"
+        )
+    return ids
+
+
+def filter_conditions(model, flt: Optional[BaseModel]) -> list:
+    """Переводит фильтр из тела запроса в условия WHERE."""
+    if flt is None:
+        return []
+    conditions = []
+    for key, value in flt.dict(exclude_none=True).items():
+        if key == "start_date":
+            conditions.append(model.date >= value)
+        elif key == "end_date":
+            conditions.append(model.date <= value)
+        else:
+            conditions.append(getattr(model, key) == value)
+    return conditions
+
+
+def _select_ids(db: Session, model, user_id: int, ids: Optional[List[int]], conditions: list) -> List[int]:
+    base = [model.user_id == user_id, *conditions]
+    if ids is None:
+        return [row[0] for row in db.query(model.id).filter(*base).all()]
+
+    found = []
+    for chunk in chunked(ids):
+        found.extend(row[0] for row in db.query(model.id).filter(*base, model.id.in_(chunk)).all())
+    return found
+
+
+def _build_result(ids: Optional[List[int]], matched: List[int], done_status: str) -> BatchResult:
+    matched_set = set(matched)
+    requested = matched if ids is None else ids
+    return BatchResult(
+        matched=len(matched),
+        results=[
+            BatchItemResult(id=item_id, status=done_status if item_id in matched_set else "not_found")
+            for item_id in requested
+        ],
+    )
+
+
+def _validate_target(ids: Optional[List[int]], flt: Optional[BaseModel]) -> Optional[List[int]]:
+    if ids is None and flt is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Either ids or filter must be provided"
+        )
+    # Пустой фильтр дал бы WHERE user_id=? - все строки пользователя
+    if ids is not None and not ids:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="ids must not be empty"
+        )
+    if flt is not None and not flt.dict(exclude_none=True):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="filter must contain at least one condition"
+        )
+    if ids is None:
+        return None
+    # Убираем дубликаты, сохраняя порядок
+    return list(dict.fromkeys(ids))
+
+
+async def batch_update(
+    db: Session, model, user_id: int, ids, flt, values: dict, after_update=None, before_update=None,
+    validate=None
+) -> BatchResult:
+    """UPDATE ... WHERE user_id=? AND id IN (...) одной транзакцией через run_write.
+
+    before_update(session, ids, seq) и after_update(session, ids) вызываются до
+    коммита - для счётчиков и пересчёта производных полей. validate(session, ids)
+    вызывается после изменения всех строк; исключение из него откатывает транзакцию.
+    """
+    ids = _validate_target(ids, flt)
+    if not values:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No fields to update"
+        )
+
+    def write(session):
+        matched = _select_ids(session, model, user_id, ids, filter_conditions(model, flt))
+        row_values = values
+        if matched:
+            # Массовый UPDATE идёт мимо событий ORM - номер изменения ставим сами
+            seq = stamp_change(session, user_id, model.__tablename__)
+            row_values = {**values, "change_seq": seq, "updated_at": datetime.utcnow()}
+        for chunk in chunked(matched):
+            if before_update is not None:
+                before_update(session, chunk, row_values["change_seq"])
+            session.query(model).filter(
+                model.user_id == user_id,
+                model.id.in_(chunk)
+            ).update(row_values, synchronize_session=False)
+            if after_update is not None:
+                after_update(session, chunk)
+        if validate is not None and matched:
+            validate(session, matched)
+        return _build_result(ids, matched, "updated")
+
+    return await run_write(db, write)
+
+
+async def batch_delete(db: Session, model, user_id: int, ids, flt, before_delete=None) -> BatchResult:
+    """DELETE ... WHERE user_id=? AND id IN (...) одной транзакцией через run_write.
+
+    before_delete(session, ids, seq) вызывается до удаления каждой части.
+    """
+    ids = _validate_target(ids, flt)
+
+    def write(session):
+        matched = _select_ids(session, model, user_id, ids, filter_conditions(model, flt))
+        if matched:
+            seq = stamp_change(session, user_id, model.__tablename__)
+            add_tombstones(session, model.__tablename__, user_id, matched, seq)
+        for chunk in chunked(matched):
+            if before_delete is not None:
+                before_delete(session, chunk, seq)
+            session.query(model).filter(
+                model.user_id == user_id,
+                model.id.in_(chunk)
+            ).delete(synchronize_session=False)
+        return _build_result(ids, matched, "deleted")
+
+    return await run_write(db, write)
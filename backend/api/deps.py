@@ -1,23 +1,59 @@
+from functools import partial
+import logging
 from typing import Generator
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
 
-from database import SessionLocal
+from database import ReadSessionLocal, SessionLocal
 from models import User
+from api.statements import USER_BY_USERNAME
 from api_config import SECURITY_CONFIG
+from config import settings
+from services.shards import ShardedSession
+from services.log_pipeline import user_id_var
+from services.tracing import span
+
+logger = logging.getLogger(__name__)
 
 oauth2_scheme = SECURITY_CONFIG["oauth2_scheme"]
 
-def get_db() -> Generator:
-    db = SessionLocal()
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def _session(factory) -> Generator:
+    db = factory()
     try:
         yield db
     finally:
         db.close()
 
+def _request_user_id(request: Request):
+    # Выставляет get_current_user; до проверки токена - None (основная база)
+    return getattr(request.state, "user_id", None)
+
+def get_db(request: Request) -> Generator:
+    """Сессия по методу запроса: чтение - из пула читателей, изменения - из пула писателей.
+
+    При SHARDING_ENABLED данные читаются из базы пользователя (services/shards.py).
+    """
+    readonly = request.method in READ_METHODS
+    if settings.SHARDING_ENABLED:
+        factory = partial(ShardedSession, partial(_request_user_id, request), readonly=readonly)
+    else:
+        factory = ReadSessionLocal if readonly else SessionLocal
+    yield from _session(factory)
+
+def get_write_db(request: Request) -> Generator:
+    """Сессия писателя для GET-обработчиков, которым всё же нужно записать."""
+    if settings.SHARDING_ENABLED:
+        yield from _session(partial(ShardedSession, partial(_request_user_id, request)))
+    else:
+        yield from _session(SessionLocal)
+
 async def get_current_user(
+    request: Request,
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ) -> User:
@@ -34,19 +70,39 @@ async def get_current_user(
         # Убираем "Bearer " из токена
         token = token[7:]
         
-        payload = jwt.decode(
-            token,
-            SECURITY_CONFIG["secret_key"],
-            algorithms=[SECURITY_CONFIG["algorithm"]]
-        )
+        with span("auth.jwt_decode", "auth"):
+            payload = jwt.decode(
+                token,
+                SECURITY_CONFIG["secret_key"],
+                algorithms=[SECURITY_CONFIG["algorithm"]]
+            )
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
     except JWTError as e:
-        print(f"JWT Error: {e}")
+        logger.info("JWT error: %s", e)
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == username).first()
+    with span("auth.user_lookup", "auth"):
+        user = db.scalars(USER_BY_USERNAME, {"username": username}).first()
     if user is None:
         raise credentials_exception
-    return user 
\ No newline at end of file
+    # Возвращаем соединение в пул до следующего await: иначе одновременные
+    # запросы успевают разобрать весь пул ещё на проверке токена, и очередной
+    # checkout блокирует цикл событий. Пользователь остаётся загруженным.
+    db.close()
+    # Нужен middleware сброса кэша после изменяющих запросов
+    request.state.user_id = user.id
+    user_id_var.set(user.id)
+    return user
+
+def is_admin(user: User) -> bool:
+    return user.username in [name.strip() for name in settings.ADMIN_USERNAMES.split(",")]
+
+async def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Недостаточно прав"
+        )
+    return current_user
\ No newline at end of file
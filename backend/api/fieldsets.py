@@ -0,0 +1,105 @@
+"""Частичные ответы списков: параметры fields= и include=.
+
+fields=id,date,student_id сужает и SELECT (только эти колонки), и ответ.
+include=student подгружает связь selectinload - одним запросом IN на всю
+страницу (частями по 500 id), а не ленивой загрузкой на каждую строку - и
+кладёт её в запись. Такие ответы - словари (SparseList), которые кэш
+ответов сериализует без response_model.
+"""
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, load_only, selectinload
+
+from services.response_cache import SparseList
+
+
+def _split(value: str) -> List[str]:
+    return list(dict.fromkeys(item.strip() for item in value.split(",") if item.strip()))
+
+
+def parse_fields(value: Optional[str], schema) -> Optional[Tuple[str, ...]]:
+    """"date,student_id" -> ("id", "date", "student_id"); id нужен клиенту всегда."""
+    if not value:
+        return None
+    names = tuple(dict.fromkeys(["id", *_split(value)]))
+    unknown = [name for name in names if name not in schema.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown fields: " + ", ".join(unknown)
+        )
+    return names
+
+
+def parse_include(value: Optional[str], relations: Dict[str, type]) -> Tuple[str, ...]:
+    if not value:
+        return ()
+    names = tuple(_split(value))
+    unknown = [name for name in names if name not in relations]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown include: " + ", ".join(unknown) + ". Allowed: " + ", ".join(relations)
+        )
+    return names
+
+
+@lru_cache(maxsize=None)
+def project(statement, source, fields: Tuple[str, ...]):
+    """statement (select(source) ...) с колонками fields вместо сущности.
+
+    Кэшируется, как и сами запросы в api/statements.py: выражение и его ключ
+    кэша SQL строятся один раз на набор полей.
+    """
+    return statement.with_only_columns(*(getattr(source, name).label(name) for name in fields))
+
+
+@lru_cache(maxsize=None)
+def with_relations(statement, source, fields: Optional[Tuple[str, ...]], include: Tuple[str, ...]):
+    options = [selectinload(getattr(source, name)) for name in include]
+    mapper = inspect(source).mapper
+    if fields is not None and all(name in mapper.column_attrs for name in fields):
+        # Внешние ключи связей нужны selectinload, иначе он догрузит их по строке
+        keys = set(fields)
+        for name in include:
+            keys.update(column.key for column in mapper.relationships[name].local_columns)
+        options.append(load_only(*(getattr(source, key) for key in keys)))
+    return statement.options(*options)
+
+
+def _dump(schema, obj) -> dict:
+    return schema.model_validate(obj).model_dump()
+
+
+def list_rows(db: Session, statement, params: dict, source, schema,
+              fields: Optional[str] = None, include: Optional[str] = None,
+              relations: Optional[Dict[str, type]] = None) -> list:
+    """Строки списка по statement; с fields/include - SparseList словарей.
+
+    relations - связи, разрешённые в include, и схемы их ответа.
+    """
+    field_names = parse_fields(fields, schema)
+    included = parse_include(include, relations or {})
+    if field_names is None and not included:
+        return db.scalars(statement, params).all()
+    if not included:
+        rows = db.execute(project(statement, source, field_names), params).mappings()
+        return SparseList(dict(row) for row in rows)
+
+    result = SparseList()
+    for obj in db.scalars(with_relations(statement, source, field_names, included), params):
+        if field_names is None:
+            item = _dump(schema, obj)
+        else:
+            item = {name: getattr(obj, name) for name in field_names}
+        for name in included:
+            related = getattr(obj, name)
+            if isinstance(related, list):
+                item[name] = [_dump(relations[name], value) for value in related]
+            else:
+                item[name] = None if related is None else _dump(relations[name], related)
+        result.append(item)
+    return result
@@ -6,6 +6,12 @@ from .expenses import router as expenses_router
 from .incomes import router as incomes_router
 from .rent_settings import router as rent_settings_router
 from .finance import router as finance_router
+from .jobs import router as jobs_router
+from .sync import router as sync_router
+from .events import router as events_router
+from .profiler import router as profiler_router
+from .maintenance import router as maintenance_router
+from .views import router as views_router
 
 __all__ = [
     "auth_router",
@@ -15,5 +21,11 @@ __all__ = [
     "expenses_router",
     "incomes_router",
     "rent_settings_router",
-    "finance_router"
+    "finance_router",
+    "jobs_router",
+    "sync_router",
+    "events_router",
+    "profiler_router",
+    "maintenance_router",
+    "views_router"
 ] 
\ No newline at end of file
@@ -0,0 +1,55 @@
+import asyncio
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from api.deps import get_current_user, get_db
+from config import settings
+from models import User
+from services.events import broker, format_sse
+
+router = APIRouter()
+
+@router.get("/")
+async def stream_events(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Поток изменений пользователя (text/event-stream).
+
+    Событие change содержит seq и список изменённых таблиц - клиент
+    догружает сами строки через GET /sync?since=<последний seq>.
+    """
+    user_id = current_user.id
+    # Соединение из пула не должно висеть всё время жизни потока
+    db.close()
+    subscriber = broker.subscribe(user_id)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not subscriber.dropped.is_set():
+                try:
+                    payload = await asyncio.wait_for(
+                        subscriber.queue.get(), timeout=settings.SSE_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    # Комментарий держит соединение живым через прокси
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse(payload)
+            # Клиент отстал: пусть переподключится и догонит через /sync
+            yield "event: overflow\ndata: {}\n\n"
+        finally:
+            broker.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={
+            # GZipMiddleware буферизует сжатый поток - отдаём как есть
+            "Content-Encoding": "identity",
+            "X-Accel-Buffering": "no",
+        },
+    )
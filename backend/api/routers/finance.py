@@ -1,42 +1,41 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from typing import List
 from datetime import datetime
-from fastapi_cache.decorator import cache
 
 from api.deps import get_current_user, get_db
 from models import User, Expense, Income
-from schemas.expense import ExpenseCreate, ExpenseUpdate, ExpenseResponse
-from schemas.income import IncomeCreate, IncomeUpdate, IncomeResponse
+from schemas.expense import ExpenseCreate, ExpenseUpdate, ExpenseResponse, ExpenseBatchUpdate, ExpenseBatchDelete
+from schemas.income import IncomeCreate, IncomeUpdate, IncomeResponse, IncomeBatchUpdate, IncomeBatchDelete
 from schemas.finance import FinanceSummary
+from schemas.batch import BatchResult
+from api.batch import batch_update, batch_delete
+from api.fieldsets import list_rows
+from api.statements import data_version, get_owned, ledger_query, ledger_totals
+from services.archive import archive_source
+from services.response_cache import cache_response
+from services.write_queue import run_write
 from api_config import CACHE_CONFIG
 
 router = APIRouter()
 
 # Эндпоинты для расходов
 @router.get("/expenses/", response_model=List[ExpenseResponse])
-@cache(expire=CACHE_CONFIG["expire"])
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
 async def read_expenses(
     skip: int = 0,
     limit: int = 100,
     start_date: datetime = None,
     end_date: datetime = None,
     category: str = None,
+    fields: str = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Expense).filter(Expense.user_id == current_user.id)
-    
-    if start_date:
-        query = query.filter(Expense.date >= start_date)
-    if end_date:
-        query = query.filter(Expense.date <= end_date)
-    if category:
-        query = query.filter(Expense.category == category)
-    
-    expenses = query.offset(skip).limit(limit).all()
-    return expenses
+    # Диапазон, уходящий за горизонт архива, читается вместе с архивом
+    source = archive_source(Expense, start_date)
+    stmt, params = ledger_query(source, current_user.id, skip, limit, start_date, end_date, category)
+    return list_rows(db, stmt, params, source, ExpenseResponse, fields)
 
 @router.post("/expenses/", response_model=ExpenseResponse, status_code=status.HTTP_201_CREATED)
 async def create_expense(
@@ -44,11 +43,31 @@ async def create_expense(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_expense = Expense(**expense.dict(), user_id=current_user.id)
-    db.add(db_expense)
-    db.commit()
-    db.refresh(db_expense)
-    return db_expense
+    def write(session):
+        db_expense = Expense(**expense.dict(), user_id=current_user.id)
+        session.add(db_expense)
+        return db_expense
+
+    return await run_write(db, write)
+
+@router.patch("/expenses/batch", response_model=BatchResult)
+async def batch_update_expenses(
+    batch: ExpenseBatchUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return await batch_update(
+        db, Expense, current_user.id, batch.ids, batch.filter,
+        batch.changes.dict(exclude_unset=True)
+    )
+
+@router.delete("/expenses/batch", response_model=BatchResult)
+async def batch_delete_expenses(
+    batch: ExpenseBatchDelete,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return await batch_delete(db, Expense, current_user.id, batch.ids, batch.filter)
 
 @router.put("/expenses/{expense_id}", response_model=ExpenseResponse)
 async def update_expense(
@@ -57,19 +76,16 @@ async def update_expense(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_expense = db.query(Expense).filter(
-        Expense.id == expense_id,
-        Expense.user_id == current_user.id
-    ).first()
-    if db_expense is None:
-        raise HTTPException(status_code=404, detail="Expense not found")
-    
-    for key, value in expense.dict(exclude_unset=True).items():
-        setattr(db_expense, key, value)
-    
-    db.commit()
-    db.refresh(db_expense)
-    return db_expense
+    def write(session):
+        db_expense = get_owned(session, Expense, current_user.id, expense_id)
+        if db_expense is None:
+            raise HTTPException(status_code=404, detail="Expense not found")
+
+        for key, value in expense.dict(exclude_unset=True).items():
+            setattr(db_expense, key, value)
+        return db_expense
+
+    return await run_write(db, write)
 
 @router.delete("/expenses/{expense_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_expense(
@@ -77,40 +93,32 @@ async def delete_expense(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    expense = db.query(Expense).filter(
-        Expense.id == expense_id,
-        Expense.user_id == current_user.id
-    ).first()
-    if expense is None:
-        raise HTTPException(status_code=404, detail="Expense not found")
-    
-    db.delete(expense)
-    db.commit()
+    def write(session):
+        expense = get_owned(session, Expense, current_user.id, expense_id)
+        if expense is None:
+            raise HTTPException(status_code=404, detail="Expense not found")
+        session.delete(expense)
+
+    await run_write(db, write)
     return None
 
 # Эндпоинты для доходов
 @router.get("/incomes/", response_model=List[IncomeResponse])
-@cache(expire=CACHE_CONFIG["expire"])
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
 async def read_incomes(
     skip: int = 0,
     limit: int = 100,
     start_date: datetime = None,
     end_date: datetime = None,
     category: str = None,
+    fields: str = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Income).filter(Income.user_id == current_user.id)
-    
-    if start_date:
-        query = query.filter(Income.date >= start_date)
-    if end_date:
-        query = query.filter(Income.date <= end_date)
-    if category:
-        query = query.filter(Income.category == category)
-    
-    incomes = query.offset(skip).limit(limit).all()
-    return incomes
+    # Диапазон, уходящий за горизонт архива, читается вместе с архивом
+    source = archive_source(Income, start_date)
+    stmt, params = ledger_query(source, current_user.id, skip, limit, start_date, end_date, category)
+    return list_rows(db, stmt, params, source, IncomeResponse, fields)
 
 @router.post("/incomes/", response_model=IncomeResponse, status_code=status.HTTP_201_CREATED)
 async def create_income(
@@ -118,11 +126,31 @@ async def create_income(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_income = Income(**income.dict(), user_id=current_user.id)
-    db.add(db_income)
-    db.commit()
-    db.refresh(db_income)
-    return db_income
+    def write(session):
+        db_income = Income(**income.dict(), user_id=current_user.id)
+        session.add(db_income)
+        return db_income
+
+    return await run_write(db, write)
+
+@router.patch("/incomes/batch", response_model=BatchResult)
+async def batch_update_incomes(
+    batch: IncomeBatchUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return await batch_update(
+        db, Income, current_user.id, batch.ids, batch.filter,
+        batch.changes.dict(exclude_unset=True)
+    )
+
+@router.delete("/incomes/batch", response_model=BatchResult)
+async def batch_delete_incomes(
+    batch: IncomeBatchDelete,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return await batch_delete(db, Income, current_user.id, batch.ids, batch.filter)
 
 @router.put("/incomes/{income_id}", response_model=IncomeResponse)
 async def update_income(
@@ -131,19 +159,16 @@ async def update_income(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_income = db.query(Income).filter(
-        Income.id == income_id,
-        Income.user_id == current_user.id
-    ).first()
-    if db_income is None:
-        raise HTTPException(status_code=404, detail="Income not found")
-    
-    for key, value in income.dict(exclude_unset=True).items():
-        setattr(db_income, key, value)
-    
-    db.commit()
-    db.refresh(db_income)
-    return db_income
+    def write(session):
+        db_income = get_owned(session, Income, current_user.id, income_id)
+        if db_income is None:
+            raise HTTPException(status_code=404, detail="Income not found")
+
+        for key, value in income.dict(exclude_unset=True).items():
+            setattr(db_income, key, value)
+        return db_income
+
+    return await run_write(db, write)
 
 @router.delete("/incomes/{income_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_income(
@@ -151,60 +176,31 @@ async def delete_income(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    income = db.query(Income).filter(
-        Income.id == income_id,
-        Income.user_id == current_user.id
-    ).first()
-    if income is None:
-        raise HTTPException(status_code=404, detail="Income not found")
-    
-    db.delete(income)
-    db.commit()
+    def write(session):
+        income = get_owned(session, Income, current_user.id, income_id)
+        if income is None:
+            raise HTTPException(status_code=404, detail="Income not found")
+        session.delete(income)
+
+    await run_write(db, write)
     return None
 
 # Эндпоинт для получения финансовой сводки
 @router.get("/summary/", response_model=FinanceSummary)
-@cache(expire=CACHE_CONFIG["expire"])
+@cache_response(expire=CACHE_CONFIG["expire"], stale=CACHE_CONFIG["stale"], version=data_version)
 async def get_finance_summary(
     start_date: datetime = None,
     end_date: datetime = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Запросы для расходов
-    expenses_query = db.query(Expense).filter(Expense.user_id == current_user.id)
-    if start_date:
-        expenses_query = expenses_query.filter(Expense.date >= start_date)
-    if end_date:
-        expenses_query = expenses_query.filter(Expense.date <= end_date)
-    
-    total_expenses = expenses_query.with_entities(func.sum(Expense.amount)).scalar() or 0
-    expenses_by_category = (
-        expenses_query.with_entities(
-            Expense.category,
-            func.sum(Expense.amount).label('total')
-        )
-        .group_by(Expense.category)
-        .all()
+    total_expenses, expenses_by_category = ledger_totals(
+        db, archive_source(Expense, start_date), current_user.id, start_date, end_date
     )
-    
-    # Запросы для доходов
-    incomes_query = db.query(Income).filter(Income.user_id == current_user.id)
-    if start_date:
-        incomes_query = incomes_query.filter(Income.date >= start_date)
-    if end_date:
-        incomes_query = incomes_query.filter(Income.date <= end_date)
-    
-    total_incomes = incomes_query.with_entities(func.sum(Income.amount)).scalar() or 0
-    incomes_by_category = (
-        incomes_query.with_entities(
-            Income.category,
-            func.sum(Income.amount).label('total')
-        )
-        .group_by(Income.category)
-        .all()
+    total_incomes, incomes_by_category = ledger_totals(
+        db, archive_source(Income, start_date), current_user.id, start_date, end_date
     )
-    
+
     return FinanceSummary(
         total_expenses=total_expenses,
         total_incomes=total_incomes,
@@ -0,0 +1,129 @@
+import os
+import shutil
+import uuid
+from typing import List
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from api.deps import get_current_user, get_db, is_admin
+from config import settings
+from models import User, Job
+from schemas.job import JobCreate, JobResponse
+from services.jobs import JOB_TYPES, FINISHED_STATUSES, JobRejected, runner
+import services.database_jobs  # noqa: F401 - регистрирует export/import
+import services.archive  # noqa: F401 - регистрирует archive
+import services.lesson_counters  # noqa: F401 - регистрирует lesson_counters
+
+router = APIRouter()
+
+
+def to_response(job: Job) -> JobResponse:
+    response = JobResponse.model_validate(job)
+    if job.result_path:
+        response.result_url = f"{settings.API_V1_STR}/jobs/{job.id}/result"
+    return response
+
+
+def get_user_job(db: Session, job_id: int, user: User) -> Job:
+    job = db.query(Job).filter(Job.id == job_id, Job.user_id == user.id).first()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def enqueue(db: Session, user: User, type_name: str, params: dict) -> JobResponse:
+    job_def = JOB_TYPES.get(type_name)
+    if job_def is not None and job_def.admin_only and not is_admin(user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Недостаточно прав")
+    try:
+        job = runner.create(db, user.id, type_name, params)
+    except JobRejected as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return to_response(job)
+
+
+@router.post("/", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(
+    job: JobCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if job.type == "import_database":
+        raise HTTPException(status_code=400, detail="Use POST /jobs/import to upload a database")
+    return enqueue(db, current_user, job.type, job.params)
+
+
+@router.post("/import", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_import_job(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if not is_admin(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Недостаточно прав")
+
+    upload_dir = os.path.join(settings.JOB_RESULTS_DIR, "uploads")
+    os.makedirs(upload_dir, exist_ok=True)
+    upload_path = os.path.join(upload_dir, f"{uuid.uuid4().hex}.db")
+    with open(upload_path, "wb") as buffer:
+        await run_in_threadpool(shutil.copyfileobj, file.file, buffer)
+
+    return enqueue(db, current_user, "import_database", {"upload_path": upload_path})
+
+
+@router.get("/", response_model=List[JobResponse])
+async def read_jobs(
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    jobs = (
+        db.query(Job)
+        .filter(Job.user_id == current_user.id)
+        .order_by(Job.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    return [to_response(job) for job in jobs]
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def read_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return to_response(get_user_job(db, job_id, current_user))
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    job = get_user_job(db, job_id, current_user)
+    if job.status in FINISHED_STATUSES:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Job already finished")
+    return to_response(runner.cancel(db, job))
+
+
+@router.get("/{job_id}/result")
+async def read_job_result(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    job = get_user_job(db, job_id, current_user)
+    if job.status != "succeeded" or not job.result_path or not os.path.exists(job.result_path):
+        raise HTTPException(status_code=404, detail="Job result not found")
+    return FileResponse(
+        job.result_path,
+        media_type="application/octet-stream",
+        filename=os.path.basename(job.result_path)
+    )
@@ -1,26 +1,81 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
-from fastapi_cache.decorator import cache
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
 
 from api.deps import get_current_user, get_db
-from models import User, Lesson
-from schemas.lesson import LessonCreate, LessonUpdate, LessonResponse
+from config import settings
+from models import User, Lesson, Student
+from models.lesson import (
+    COUNTER_FIELDS, counters_before_delete, counters_before_update, lesson_end, refresh_end_dates
+)
+from schemas.lesson import (
+    LessonCreate, LessonUpdate, LessonResponse, LessonBatchUpdate, LessonBatchDelete, FreeSlot
+)
+from schemas.batch import BatchResult
+from schemas.student import StudentResponse
+from api.batch import batch_update, batch_delete, chunked, parse_ids
+from api.fieldsets import list_rows
+from api.statements import (
+    LESSONS_BY_STUDENT, LESSONS_BY_USER, data_version, get_owned, get_owned_many, lessons_by_students,
+    lessons_on_date
+)
+from services.response_cache import cache_response
+from services.archive import archive_source
+from services.schedule import busy_lessons, free_slots, naive_utc, overlapping_lessons, parse_working_hours
+from services.write_queue import run_write
 from api_config import CACHE_CONFIG
 
 router = APIRouter()
 
+# Поля, от которых зависит, занимает ли занятие время в расписании
+SCHEDULE_FIELDS = {"date", "duration", "is_cancelled"}
+
+# Связи для include=
+LESSON_INCLUDES = {"student": StudentResponse}
+
+
+def check_student(session: Session, user_id: int, student_id: int):
+    # Занятие нельзя привязать к ученику другого пользователя
+    if get_owned(session, Student, user_id, student_id) is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+
+
+def check_overlap(session: Session, user_id: int, lesson: Lesson):
+    if lesson.is_cancelled:
+        return
+    conflicts = busy_lessons(
+        session, user_id, lesson.date, lesson_end(lesson.date, lesson.duration), exclude_id=lesson.id
+    )
+    if conflicts:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Lesson overlaps with lessons: " + ", ".join(str(item.id) for item in conflicts)
+        )
+
+
+def check_batch_overlap(session: Session, user_id: int, ids: List[int]):
+    conflicts = []
+    for chunk in chunked(ids):
+        conflicts.extend(overlapping_lessons(session, user_id, chunk))
+    if conflicts:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Lessons overlap: " + ", ".join(f"{first}-{second}" for first, second in conflicts)
+        )
+
 @router.get("/", response_model=List[LessonResponse])
-@cache(expire=CACHE_CONFIG["expire"])
+@cache_response(expire=CACHE_CONFIG["expire"], stale=CACHE_CONFIG["stale"], version=data_version)
 async def read_lessons(
     skip: int = 0,
     limit: int = 100,
+    fields: str = None,
+    include: str = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    lessons = db.query(Lesson).filter(Lesson.user_id == current_user.id).offset(skip).limit(limit).all()
-    return lessons
+    params = {"user_id": current_user.id, "skip": skip, "limit": limit}
+    return list_rows(db, LESSONS_BY_USER, params, Lesson, LessonResponse, fields, include, LESSON_INCLUDES)
 
 @router.post("/", response_model=LessonResponse, status_code=status.HTTP_201_CREATED)
 async def create_lesson(
@@ -28,23 +83,110 @@ async def create_lesson(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_lesson = Lesson(**lesson.dict(), user_id=current_user.id)
-    db.add(db_lesson)
-    db.commit()
-    db.refresh(db_lesson)
-    return db_lesson
+    def write(session):
+        check_student(session, current_user.id, lesson.student_id)
+        db_lesson = Lesson(**lesson.dict(), user_id=current_user.id)
+        check_overlap(session, current_user.id, db_lesson)
+        session.add(db_lesson)
+        return db_lesson
+
+    return await run_write(db, write)
+
+@router.patch("/batch", response_model=BatchResult)
+async def batch_update_lessons(
+    batch: LessonBatchUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    changes = batch.changes.dict(exclude_unset=True)
+    if changes.get("student_id") is not None:
+        check_student(db, current_user.id, changes["student_id"])
+    # end_date пересчитывается, затем пересечения проверяются как при изменении одного занятия
+    after_update = refresh_end_dates if {"date", "duration"} & changes.keys() else None
+    before_update = None
+    if COUNTER_FIELDS & changes.keys():
+        def before_update(session, ids, seq):
+            counters_before_update(session, ids, seq, changes)
+    validate = None
+    if SCHEDULE_FIELDS & changes.keys():
+        def validate(session, ids):
+            check_batch_overlap(session, current_user.id, ids)
+    return await batch_update(
+        db, Lesson, current_user.id, batch.ids, batch.filter, changes, after_update, before_update, validate
+    )
+
+@router.delete("/batch", response_model=BatchResult)
+async def batch_delete_lessons(
+    batch: LessonBatchDelete,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return await batch_delete(db, Lesson, current_user.id, batch.ids, batch.filter, counters_before_delete)
+
+@router.get("/batch", response_model=Dict[int, LessonResponse])
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
+async def read_lessons_batch(
+    ids: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Занятия по списку id ("1,2,3"): {id: занятие}."""
+    lessons = get_owned_many(db, Lesson, current_user.id, parse_ids(ids))
+    return {lesson.id: lesson for lesson in lessons}
+
+@router.get("/by-students", response_model=Dict[int, List[LessonResponse]])
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
+async def read_lessons_by_students(
+    student_ids: str,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Занятия учеников из списка: {student_id: [занятия по дате]}, для каждого запрошенного id."""
+    ids = parse_ids(student_ids, "student_ids")
+    result: Dict[int, list] = {student_id: [] for student_id in ids}
+    source = archive_source(Lesson, start_date)
+    for lesson in lessons_by_students(db, source, current_user.id, ids, start_date, end_date):
+        result[lesson.student_id].append(lesson)
+    return result
+
+@router.get("/free-slots", response_model=List[FreeSlot])
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
+async def read_free_slots(
+    start: datetime,
+    end: datetime,
+    duration: int = Query(60, gt=0),
+    working_hours: str = settings.WORKING_HOURS,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Свободные промежутки не короче duration минут в рабочие часы."""
+    start, end = naive_utc(start), naive_utc(end)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if end - start > timedelta(days=settings.FREE_SLOTS_MAX_DAYS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range must not exceed {settings.FREE_SLOTS_MAX_DAYS} days"
+        )
+    try:
+        hours = parse_working_hours(working_hours)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    busy = [(item.date, item.end_date) for item in busy_lessons(db, current_user.id, start, end)]
+    slots = free_slots(busy, start, end, timedelta(minutes=duration), hours)
+    return [FreeSlot(start=slot_start, end=slot_end) for slot_start, slot_end in slots]
 
 @router.get("/{lesson_id}", response_model=LessonResponse)
-@cache(expire=CACHE_CONFIG["expire"])
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
 async def read_lesson(
     lesson_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    lesson = db.query(Lesson).filter(
-        Lesson.id == lesson_id,
-        Lesson.user_id == current_user.id
-    ).first()
+    lesson = get_owned(db, Lesson, current_user.id, lesson_id)
     if lesson is None:
         raise HTTPException(status_code=404, detail="Lesson not found")
     return lesson
@@ -56,19 +198,21 @@ async def update_lesson(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_lesson = db.query(Lesson).filter(
-        Lesson.id == lesson_id,
-        Lesson.user_id == current_user.id
-    ).first()
-    if db_lesson is None:
-        raise HTTPException(status_code=404, detail="Lesson not found")
-    
-    for key, value in lesson.dict(exclude_unset=True).items():
-        setattr(db_lesson, key, value)
-    
-    db.commit()
-    db.refresh(db_lesson)
-    return db_lesson
+    def write(session):
+        db_lesson = get_owned(session, Lesson, current_user.id, lesson_id)
+        if db_lesson is None:
+            raise HTTPException(status_code=404, detail="Lesson not found")
+
+        changes = lesson.dict(exclude_unset=True)
+        if changes.get("student_id") is not None:
+            check_student(session, current_user.id, changes["student_id"])
+        for key, value in changes.items():
+            setattr(db_lesson, key, value)
+        if SCHEDULE_FIELDS & changes.keys():
+            check_overlap(session, current_user.id, db_lesson)
+        return db_lesson
+
+    return await run_write(db, write)
 
 @router.delete("/{lesson_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_lesson(
@@ -76,43 +220,40 @@ async def delete_lesson(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    lesson = db.query(Lesson).filter(
-        Lesson.id == lesson_id,
-        Lesson.user_id == current_user.id
-    ).first()
-    if lesson is None:
-        raise HTTPException(status_code=404, detail="Lesson not found")
-    
-    db.delete(lesson)
-    db.commit()
+    def write(session):
+        lesson = get_owned(session, Lesson, current_user.id, lesson_id)
+        if lesson is None:
+            raise HTTPException(status_code=404, detail="Lesson not found")
+        session.delete(lesson)
+
+    await run_write(db, write)
     return None
 
 @router.get("/student/{student_id}", response_model=List[LessonResponse])
-@cache(expire=CACHE_CONFIG["expire"])
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
 async def read_lessons_by_student(
     student_id: int,
     skip: int = 0,
     limit: int = 100,
+    fields: str = None,
+    include: str = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    lessons = db.query(Lesson).filter(
-        Lesson.student_id == student_id,
-        Lesson.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
-    return lessons
+    params = {"student_id": student_id, "user_id": current_user.id, "skip": skip, "limit": limit}
+    return list_rows(db, LESSONS_BY_STUDENT, params, Lesson, LessonResponse, fields, include, LESSON_INCLUDES)
 
 @router.get("/date/{date}", response_model=List[LessonResponse])
-@cache(expire=CACHE_CONFIG["expire"])
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
 async def read_lessons_by_date(
     date: datetime,
     skip: int = 0,
     limit: int = 100,
+    fields: str = None,
+    include: str = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    lessons = db.query(Lesson).filter(
-        Lesson.date == date,
-        Lesson.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
-    return lessons 
\ No newline at end of file
+    source = archive_source(Lesson, date)
+    params = {"date": date, "user_id": current_user.id, "skip": skip, "limit": limit}
+    return list_rows(db, lessons_on_date(source), params, source, LessonResponse, fields, include, LESSON_INCLUDES) 
\ No newline at end of file
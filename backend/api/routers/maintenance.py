@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from api.deps import get_current_admin, get_db
+from api.routers.jobs import enqueue
+from config import settings
+from models import User
+from schemas.job import JobResponse
+from schemas.maintenance import MaintenanceStatus
+from services.maintenance import database_files, file_stats, last_report, scheduler
+
+router = APIRouter()
+
+
+def collect_status() -> MaintenanceStatus:
+    return MaintenanceStatus(
+        enabled=settings.DB_MAINTENANCE_ENABLED,
+        next_run=scheduler.next_run(),
+        databases=[file_stats(path) for path in database_files()],
+        last_run=last_report(),
+    )
+
+
+@router.get("/", response_model=MaintenanceStatus)
+async def read_maintenance_status(current_user: User = Depends(get_current_admin)):
+    """Размер и фрагментация файлов базы, время следующего и отчёт последнего обслуживания."""
+    return await run_in_threadpool(collect_status)
+
+
+@router.post("/run", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def run_maintenance_now(
+    convert_auto_vacuum: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """Запускает обслуживание задачей database_maintenance, результат - отчёт в JSON.
+
+    convert_auto_vacuum=true переводит старые базы в auto_vacuum=INCREMENTAL
+    полным VACUUM (файл переписывается целиком, записи на это время ждут).
+    """
+    return enqueue(db, current_user, "database_maintenance", {"convert_auto_vacuum": convert_auto_vacuum})
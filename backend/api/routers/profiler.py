@@ -0,0 +1,43 @@
+import asyncio
+from typing import Dict, List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from api.deps import get_current_admin
+from config import settings
+from models import User
+from schemas.profiler import ProfileEntry, ProfileToken
+from services.profiler import PROFILE_HEADER, create_profile_token, profiler
+
+router = APIRouter()
+
+
+@router.get("/", response_model=Dict[str, List[ProfileEntry]])
+async def read_profiles(
+    limit: int = Query(5, gt=0, le=100),
+    current_user: User = Depends(get_current_admin)
+):
+    """Самые медленные сохранённые профили по каждому маршруту."""
+    # Описания читаются из PROFILER_DIR - не в цикле событий
+    return await asyncio.to_thread(profiler.slowest_by_route, limit)
+
+
+@router.post("/token", response_model=ProfileToken)
+async def create_token(current_user: User = Depends(get_current_admin)):
+    """Токен для заголовка X-Profile: запрос с ним профилируется всегда."""
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=400, detail="Profiler is disabled (PROFILER_ENABLED)")
+    return ProfileToken(
+        header=PROFILE_HEADER,
+        token=create_profile_token(current_user.username),
+        expires_in_minutes=settings.PROFILER_TOKEN_MINUTES,
+    )
+
+
+@router.get("/{name}")
+async def download_profile(name: str, current_user: User = Depends(get_current_admin)):
+    path = profiler.path_for(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
@@ -1,18 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from fastapi_cache.decorator import cache
 
-from api.deps import get_current_user, get_db
+from api.deps import get_current_user, get_db, get_write_db
+from api.statements import data_version
 from models import User, RentSettings
+from models.sync import stamp_change
 from schemas.rent_settings import RentSettingsCreate, RentSettingsResponse
+from services.response_cache import cache_response
+from services.write_queue import run_write
 from api_config import CACHE_CONFIG, API_PATHS
 
 router = APIRouter()
 
 @router.get(API_PATHS["rent_settings"]["base"], response_model=RentSettingsResponse)
-@cache(expire=CACHE_CONFIG["expire"])
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
 async def get_rent_settings(
-    db: Session = Depends(get_db),
+    # При первом обращении создаются настройки по умолчанию
+    db: Session = Depends(get_write_db),
     current_user: User = Depends(get_current_user)
 ):
     settings = db.query(RentSettings).filter(RentSettings.user_id == current_user.id).first()
@@ -34,18 +38,19 @@ async def create_rent_settings(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    existing_settings = db.query(RentSettings).filter(RentSettings.user_id == current_user.id).first()
-    if existing_settings:
-        # Обновляем существующие настройки
-        for key, value in settings.dict().items():
-            setattr(existing_settings, key, value)
-        db.commit()
-        db.refresh(existing_settings)
-        return existing_settings
-    
-    # Создаем новые настройки
-    db_settings = RentSettings(**settings.dict(), user_id=current_user.id)
-    db.add(db_settings)
-    db.commit()
-    db.refresh(db_settings)
-    return db_settings 
\ No newline at end of file
+    def write(session):
+        # Настройки не входят в синхронизацию, но должны менять версию данных для кэша
+        stamp_change(session, current_user.id, "rent_settings")
+        existing_settings = session.query(RentSettings).filter(RentSettings.user_id == current_user.id).first()
+        if existing_settings:
+            # Обновляем существующие настройки
+            for key, value in settings.dict().items():
+                setattr(existing_settings, key, value)
+            return existing_settings
+
+        # Создаем новые настройки
+        db_settings = RentSettings(**settings.dict(), user_id=current_user.id)
+        session.add(db_settings)
+        return db_settings
+
+    return await run_write(db, write) 
\ No newline at end of file
@@ -1,25 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
-from fastapi_cache.decorator import cache
+from typing import Dict, List
 
 from api.deps import get_current_user, get_db
 from models import User, Student
 from schemas.student import StudentCreate, StudentUpdate, StudentResponse
+from schemas.subscription import SubscriptionResponse
+from api.batch import parse_ids
+from api.fieldsets import list_rows
+from api.statements import STUDENTS_BY_USER, data_version, get_owned, get_owned_many
+from services.response_cache import cache_response
+from services.write_queue import run_write
 from api_config import CACHE_CONFIG
 
 router = APIRouter()
 
+# Связи для include=
+STUDENT_INCLUDES = {"subscriptions": SubscriptionResponse}
+
 @router.get("/", response_model=List[StudentResponse])
-@cache(expire=CACHE_CONFIG["expire"])
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
 async def read_students(
     skip: int = 0,
     limit: int = 100,
+    fields: str = None,
+    include: str = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    students = db.query(Student).filter(Student.user_id == current_user.id).offset(skip).limit(limit).all()
-    return students
+    params = {"user_id": current_user.id, "skip": skip, "limit": limit}
+    return list_rows(db, STUDENTS_BY_USER, params, Student, StudentResponse, fields, include, STUDENT_INCLUDES)
 
 @router.post("/", response_model=StudentResponse, status_code=status.HTTP_201_CREATED)
 async def create_student(
@@ -27,23 +37,32 @@ async def create_student(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_student = Student(**student.dict(), user_id=current_user.id)
-    db.add(db_student)
-    db.commit()
-    db.refresh(db_student)
-    return db_student
+    def write(session):
+        db_student = Student(**student.dict(), user_id=current_user.id)
+        session.add(db_student)
+        return db_student
+
+    return await run_write(db, write)
+
+@router.get("/batch", response_model=Dict[int, StudentResponse])
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
+async def read_students_batch(
+    ids: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Ученики по списку id ("1,2,3"): {id: ученик}, чужие и несуществующие пропускаются."""
+    students = get_owned_many(db, Student, current_user.id, parse_ids(ids))
+    return {student.id: student for student in students}
 
 @router.get("/{student_id}", response_model=StudentResponse)
-@cache(expire=CACHE_CONFIG["expire"])
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
 async def read_student(
     student_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    student = db.query(Student).filter(
-        Student.id == student_id,
-        Student.user_id == current_user.id
-    ).first()
+    student = get_owned(db, Student, current_user.id, student_id)
     if student is None:
         raise HTTPException(status_code=404, detail="Student not found")
     return student
@@ -55,19 +74,16 @@ async def update_student(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_student = db.query(Student).filter(
-        Student.id == student_id,
-        Student.user_id == current_user.id
-    ).first()
-    if db_student is None:
-        raise HTTPException(status_code=404, detail="Student not found")
-    
-    for key, value in student.dict(exclude_unset=True).items():
-        setattr(db_student, key, value)
-    
-    db.commit()
-    db.refresh(db_student)
-    return db_student
+    def write(session):
+        db_student = get_owned(session, Student, current_user.id, student_id)
+        if db_student is None:
+            raise HTTPException(status_code=404, detail="Student not found")
+
+        for key, value in student.dict(exclude_unset=True).items():
+            setattr(db_student, key, value)
+        return db_student
+
+    return await run_write(db, write)
 
 @router.delete("/{student_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_student(
@@ -75,13 +91,11 @@ async def delete_student(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    student = db.query(Student).filter(
-        Student.id == student_id,
-        Student.user_id == current_user.id
-    ).first()
-    if student is None:
-        raise HTTPException(status_code=404, detail="Student not found")
-    
-    db.delete(student)
-    db.commit()
+    def write(session):
+        student = get_owned(session, Student, current_user.id, student_id)
+        if student is None:
+            raise HTTPException(status_code=404, detail="Student not found")
+        session.delete(student)
+
+    await run_write(db, write)
     return None 
\ No newline at end of file
@@ -1,25 +1,37 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
-from fastapi_cache.decorator import cache
+from typing import Dict, List
 
 from api.deps import get_current_user, get_db
 from models import User, Subscription
+from schemas.student import StudentResponse
 from schemas.subscription import SubscriptionCreate, SubscriptionUpdate, SubscriptionResponse
+from api.batch import parse_ids
+from api.fieldsets import list_rows
+from api.statements import SUBSCRIPTIONS_BY_USER, data_version, get_owned_many
+from services.response_cache import cache_response
+from services.write_queue import run_write
 from api_config import CACHE_CONFIG
 
 router = APIRouter()
 
+# Связи для include=
+SUBSCRIPTION_INCLUDES = {"student": StudentResponse}
+
 @router.get("/", response_model=List[SubscriptionResponse])
-@cache(expire=CACHE_CONFIG["expire"])
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
 async def read_subscriptions(
     skip: int = 0,
     limit: int = 100,
+    fields: str = None,
+    include: str = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    subscriptions = db.query(Subscription).filter(Subscription.user_id == current_user.id).offset(skip).limit(limit).all()
-    return subscriptions
+    params = {"user_id": current_user.id, "skip": skip, "limit": limit}
+    return list_rows(
+        db, SUBSCRIPTIONS_BY_USER, params, Subscription, SubscriptionResponse, fields, include, SUBSCRIPTION_INCLUDES
+    )
 
 @router.post("/", response_model=SubscriptionResponse, status_code=status.HTTP_201_CREATED)
 async def create_subscription(
@@ -27,14 +39,40 @@ async def create_subscription(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_subscription = Subscription(**subscription.dict(), user_id=current_user.id)
-    db.add(db_subscription)
-    db.commit()
-    db.refresh(db_subscription)
-    return db_subscription
+    def write(session):
+        db_subscription = Subscription(**subscription.dict(), user_id=current_user.id)
+        session.add(db_subscription)
+        return db_subscription
+
+    return await run_write(db, write)
+
+@router.get("/batch", response_model=Dict[int, SubscriptionResponse])
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
+async def read_subscriptions_batch(
+    ids: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Абонементы по списку id ("1,2,3"): {id: абонемент}."""
+    subscriptions = get_owned_many(db, Subscription, current_user.id, parse_ids(ids))
+    return {subscription.id: subscription for subscription in subscriptions}
+
+@router.get("/by-students", response_model=Dict[int, List[SubscriptionResponse]])
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
+async def read_subscriptions_by_students(
+    student_ids: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Абонементы учеников из списка: {student_id: [абонементы]}."""
+    ids = parse_ids(student_ids, "student_ids")
+    result: Dict[int, list] = {student_id: [] for student_id in ids}
+    for subscription in get_owned_many(db, Subscription, current_user.id, ids, "student_id"):
+        result[subscription.student_id].append(subscription)
+    return result
 
 @router.get("/{subscription_id}", response_model=SubscriptionResponse)
-@cache(expire=CACHE_CONFIG["expire"])
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
 async def read_subscription(
     subscription_id: int,
     db: Session = Depends(get_db),
@@ -55,19 +93,19 @@ async def update_subscription(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_subscription = db.query(Subscription).filter(
-        Subscription.id == subscription_id,
-        Subscription.user_id == current_user.id
-    ).first()
-    if db_subscription is None:
-        raise HTTPException(status_code=404, detail="Subscription not found")
-    
-    for key, value in subscription.dict(exclude_unset=True).items():
-        setattr(db_subscription, key, value)
-    
-    db.commit()
-    db.refresh(db_subscription)
-    return db_subscription
+    def write(session):
+        db_subscription = session.query(Subscription).filter(
+            Subscription.id == subscription_id,
+            Subscription.user_id == current_user.id
+        ).first()
+        if db_subscription is None:
+            raise HTTPException(status_code=404, detail="Subscription not found")
+
+        for key, value in subscription.dict(exclude_unset=True).items():
+            setattr(db_subscription, key, value)
+        return db_subscription
+
+    return await run_write(db, write)
 
 @router.delete("/{subscription_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_subscription(
@@ -75,13 +113,14 @@ async def delete_subscription(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    subscription = db.query(Subscription).filter(
-        Subscription.id == subscription_id,
-        Subscription.user_id == current_user.id
-    ).first()
-    if subscription is None:
-        raise HTTPException(status_code=404, detail="Subscription not found")
-    
-    db.delete(subscription)
-    db.commit()
+    def write(session):
+        subscription = session.query(Subscription).filter(
+            Subscription.id == subscription_id,
+            Subscription.user_id == current_user.id
+        ).first()
+        if subscription is None:
+            raise HTTPException(status_code=404, detail="Subscription not found")
+        session.delete(subscription)
+
+    await run_write(db, write)
     return None 
\ No newline at end of file
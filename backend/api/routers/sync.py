@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from api.deps import get_current_user, get_db
+from models import User, Student, Lesson, Subscription, Expense, Income, Tombstone
+from schemas.sync import SyncResponse
+from api.statements import data_version
+from services.response_cache import cache_response
+from api_config import CACHE_CONFIG
+
+router = APIRouter()
+
+SYNC_MODELS = {
+    "students": Student,
+    "lessons": Lesson,
+    "subscriptions": Subscription,
+    "expenses": Expense,
+    "incomes": Income,
+}
+
+@router.get("/", response_model=SyncResponse)
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
+async def sync_changes(
+    since: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Строки, изменённые после since, и id удалённых.
+
+    since=0 (или since больше текущего номера, например после импорта базы) -
+    полная выгрузка.
+    """
+    # Номер читаем первым: всё, что закоммитят позже, клиент получит в следующий раз
+    seq = db.query(User.change_seq).filter(User.id == current_user.id).scalar()
+    full = since == 0 or since > seq
+
+    response = {"seq": seq, "full": full, "deleted": {}}
+    for name, model in SYNC_MODELS.items():
+        query = db.query(model).filter(model.user_id == current_user.id)
+        if not full:
+            query = query.filter(model.change_seq > since, model.change_seq <= seq)
+        response[name] = query.all()
+
+    if not full:
+        tombstones = db.query(Tombstone.entity, Tombstone.entity_id).filter(
+            Tombstone.user_id == current_user.id,
+            Tombstone.change_seq > since,
+            Tombstone.change_seq <= seq
+        ).all()
+        for entity, entity_id in tombstones:
+            response["deleted"].setdefault(entity, []).append(entity_id)
+    return response
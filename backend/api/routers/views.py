@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from api.deps import get_current_user, get_db
+from models import User, Expense, Income
+from schemas.views import FinanceView, CalendarView
+from api.statements import (
+    LESSONS_BY_USER, STUDENTS_BY_USER, SUBSCRIPTIONS_BY_USER, USER_CHANGE_SEQ, data_version, ledger_rows
+)
+from services.response_cache import cache_response
+from api_config import CACHE_CONFIG
+
+router = APIRouter()
+
+# Сколько записей отдают списки по умолчанию (limit=100)
+LIST_LIMIT = 100
+
+
+@router.get("/finance", response_model=FinanceView)
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
+async def read_finance_view(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Данные страницы финансов одним запросом: /expenses/, /incomes/ (skip/limit),
+    /subscriptions/ и /students/."""
+    # Версию читаем первой, как в /sync: данные не старше неё
+    version = db.scalar(USER_CHANGE_SEQ, {"user_id": current_user.id})
+    page = {"user_id": current_user.id, "skip": 0, "limit": LIST_LIMIT}
+    return {
+        "version": version,
+        "expenses": ledger_rows(db, Expense, current_user.id, skip, limit),
+        "incomes": ledger_rows(db, Income, current_user.id, skip, limit),
+        "subscriptions": db.scalars(SUBSCRIPTIONS_BY_USER, page).all(),
+        "students": db.scalars(STUDENTS_BY_USER, page).all(),
+    }
+
+
+@router.get("/calendar", response_model=CalendarView)
+@cache_response(expire=CACHE_CONFIG["expire"], version=data_version)
+async def read_calendar_view(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Данные календаря одним запросом: /students/ и /lessons/ (skip/limit)."""
+    version = db.scalar(USER_CHANGE_SEQ, {"user_id": current_user.id})
+    return {
+        "version": version,
+        "students": db.scalars(STUDENTS_BY_USER, {"user_id": current_user.id, "skip": 0, "limit": LIST_LIMIT}).all(),
+        "lessons": db.scalars(LESSONS_BY_USER, {"user_id": current_user.id, "skip": skip, "limit": limit}).all(),
+    }
@@ -0,0 +1,185 @@
+"""Заранее построенные запросы для горячих путей роутеров.
+
+db.query(...).filter(...) на каждый запрос заново строит выражение и
+вычисляет его ключ для кэша скомпилированного SQL. Здесь select()
+строится один раз с bindparam вместо значений: при выполнении меняются
+только параметры, ключ кэша запомнен в самом объекте, а SQL берётся из
+кэша engine (DB_QUERY_CACHE_SIZE) без компиляции.
+
+Запросы с необязательными фильтрами строятся по одному на набор
+фильтров и источник (основная таблица или представление с архивом).
+"""
+from functools import lru_cache
+from typing import List, Optional
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.orm import Session
+
+from api.batch import chunked
+from models import Lesson, Student, Subscription, User
+
+USER_BY_USERNAME = select(User).where(User.username == bindparam("username")).limit(1)
+
+# Растёт при любом изменении данных пользователя - общая версия его коллекций
+USER_CHANGE_SEQ = select(User.change_seq).where(User.id == bindparam("user_id"))
+
+STUDENTS_BY_USER = (
+    select(Student)
+    .where(Student.user_id == bindparam("user_id"))
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+)
+
+LESSONS_BY_USER = (
+    select(Lesson)
+    .where(Lesson.user_id == bindparam("user_id"))
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+)
+
+SUBSCRIPTIONS_BY_USER = (
+    select(Subscription)
+    .where(Subscription.user_id == bindparam("user_id"))
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+)
+
+LESSONS_BY_STUDENT = (
+    select(Lesson)
+    .where(Lesson.student_id == bindparam("student_id"), Lesson.user_id == bindparam("user_id"))
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+)
+
+
+@lru_cache(maxsize=None)
+def owned_by_id(model):
+    """Строка model по id, принадлежащая пользователю."""
+    return select(model).where(model.id == bindparam("id"), model.user_id == bindparam("user_id"))
+
+
+@lru_cache(maxsize=None)
+def owned_by_ids(model, column: str):
+    """Строки model пользователя, у которых column входит в список ids.
+
+    expanding-параметр: SQL с нужным числом "?" строится при выполнении,
+    но выражение и ключ кэша остаются общими для любых списков.
+    """
+    return select(model).where(
+        getattr(model, column).in_(bindparam("ids", expanding=True)), model.user_id == bindparam("user_id")
+    )
+
+
+@lru_cache(maxsize=None)
+def lessons_of_students(source, with_start: bool, with_end: bool):
+    return (
+        select(source)
+        .where(source.student_id.in_(bindparam("ids", expanding=True)), *_date_conditions(source, with_start, with_end))
+        .order_by(source.date)
+    )
+
+
+@lru_cache(maxsize=None)
+def lessons_on_date(source):
+    return (
+        select(source)
+        .where(source.date == bindparam("date"), source.user_id == bindparam("user_id"))
+        .offset(bindparam("skip"))
+        .limit(bindparam("limit"))
+    )
+
+
+def _date_conditions(source, with_start: bool, with_end: bool) -> list:
+    conditions = [source.user_id == bindparam("user_id")]
+    if with_start:
+        conditions.append(source.date >= bindparam("start_date"))
+    if with_end:
+        conditions.append(source.date <= bindparam("end_date"))
+    return conditions
+
+
+@lru_cache(maxsize=None)
+def _ledger_rows(source, with_start: bool, with_end: bool, with_category: bool):
+    conditions = _date_conditions(source, with_start, with_end)
+    if with_category:
+        conditions.append(source.category == bindparam("category"))
+    return select(source).where(*conditions).offset(bindparam("skip")).limit(bindparam("limit"))
+
+
+@lru_cache(maxsize=None)
+def _ledger_total(source, with_start: bool, with_end: bool):
+    return select(func.sum(source.amount)).where(*_date_conditions(source, with_start, with_end))
+
+
+@lru_cache(maxsize=None)
+def _ledger_by_category(source, with_start: bool, with_end: bool):
+    return (
+        select(source.category, func.sum(source.amount).label("total"))
+        .where(*_date_conditions(source, with_start, with_end))
+        .group_by(source.category)
+    )
+
+
+def _date_params(user_id: int, start_date, end_date) -> dict:
+    params = {"user_id": user_id}
+    if start_date:
+        params["start_date"] = start_date
+    if end_date:
+        params["end_date"] = end_date
+    return params
+
+
+def data_version(kwargs) -> int:
+    """Версия данных пользователя для cache_response(version=...).
+
+    Ключ кэша меняется с любой записью пользователя, сброс кэша не нужен.
+    """
+    return kwargs["db"].scalar(USER_CHANGE_SEQ, {"user_id": kwargs["current_user"].id})
+
+
+def get_owned(db: Session, model, user_id: int, object_id: int):
+    return db.scalars(owned_by_id(model), {"id": object_id, "user_id": user_id}).first()
+
+
+def get_owned_many(db: Session, model, user_id: int, ids: List[int], column: str = "id") -> list:
+    """Строки пользователя по списку значений column - один IN-запрос на часть списка."""
+    rows = []
+    for chunk in chunked(ids):
+        rows.extend(db.scalars(owned_by_ids(model, column), {"ids": chunk, "user_id": user_id}).all())
+    return rows
+
+
+def lessons_by_students(db: Session, source, user_id: int, student_ids: List[int],
+                        start_date=None, end_date=None) -> list:
+    """Занятия учеников из списка по дате, с необязательным диапазоном."""
+    stmt = lessons_of_students(source, bool(start_date), bool(end_date))
+    params = _date_params(user_id, start_date, end_date)
+    rows = []
+    for chunk in chunked(student_ids):
+        rows.extend(db.scalars(stmt, {**params, "ids": chunk}).all())
+    return rows
+
+
+def ledger_query(source, user_id: int, skip: int, limit: int,
+                 start_date=None, end_date=None, category: Optional[str] = None):
+    """(запрос, параметры) расходов или доходов с необязательными фильтрами по дате и категории."""
+    stmt = _ledger_rows(source, bool(start_date), bool(end_date), bool(category))
+    params = {**_date_params(user_id, start_date, end_date), "skip": skip, "limit": limit}
+    if category:
+        params["category"] = category
+    return stmt, params
+
+
+def ledger_rows(db: Session, source, user_id: int, skip: int, limit: int,
+                start_date=None, end_date=None, category: Optional[str] = None) -> list:
+    stmt, params = ledger_query(source, user_id, skip, limit, start_date, end_date, category)
+    return db.scalars(stmt, params).all()
+
+
+def ledger_totals(db: Session, source, user_id: int, start_date=None, end_date=None):
+    """(сумма, [(категория, сумма)]) за период."""
+    with_start, with_end = bool(start_date), bool(end_date)
+    params = _date_params(user_id, start_date, end_date)
+    total = db.execute(_ledger_total(source, with_start, with_end), params).scalar() or 0
+    by_category: List = db.execute(_ledger_by_category(source, with_start, with_end), params).all()
+    return total, by_category
@@ -6,6 +6,8 @@ from fastapi_cache import FastAPICache
 from fastapi_cache.backends.inmemory import InMemoryBackend
 from fastapi_cache.decorator import cache
 from datetime import timedelta
+from services.singleflight import build_cache_key, user_key_prefix
+from services.response_cache import response_cache
 
 # Настройки API
 API_V1_STR = "/api"
@@ -30,16 +32,21 @@ API_PATHS = {
     "lessons": {
         "base": "/lessons/",
         "by_id": "/lessons/{lesson_id}",
+        "batch": "/lessons/batch",
+        "by_students": "/lessons/by-students",
         "by_date": "/lessons/by-date/{date}",
         "by_student": "/lessons/by-student/{student_id}"
     },
     "students": {
         "base": "/students/",
-        "by_id": "/students/{student_id}"
+        "by_id": "/students/{student_id}",
+        "batch": "/students/batch"
     },
     "subscriptions": {
         "base": "/subscriptions/",
         "by_id": "/subscriptions/{subscription_id}",
+        "batch": "/subscriptions/batch",
+        "by_students": "/subscriptions/by-students",
         "by_student": "/subscriptions/by-student/{student_id}"
     },
     "expenses": {
@@ -55,6 +62,32 @@ API_PATHS = {
     },
     "rent_settings": {
         "base": "/rent-settings/"
+    },
+    "jobs": {
+        "base": "/jobs/",
+        "by_id": "/jobs/{job_id}",
+        "import": "/jobs/import",
+        "cancel": "/jobs/{job_id}/cancel",
+        "result": "/jobs/{job_id}/result"
+    },
+    "sync": {
+        "base": "/sync/"
+    },
+    "events": {
+        "base": "/events/"
+    },
+    "profiler": {
+        "base": "/profiler/",
+        "token": "/profiler/token",
+        "by_name": "/profiler/{name}"
+    },
+    "maintenance": {
+        "base": "/maintenance/",
+        "run": "/maintenance/run"
+    },
+    "views": {
+        "finance": "/views/finance",
+        "calendar": "/views/calendar"
     }
 }
 
@@ -77,7 +110,8 @@ SECURITY_CONFIG = {
 # Настройки кэширования
 CACHE_CONFIG = {
     "backend": InMemoryBackend(),
-    "expire": 300  # 5 минут
+    "expire": 300,  # 5 минут
+    "stale": settings.CACHE_STALE_SECONDS  # stale-while-revalidate, 0 - выключено
 }
 
 # Настройки пагинации
@@ -86,6 +120,16 @@ PAGINATION_CONFIG = {
     "max_page_size": 100
 }
 
+# Ключ кэша: пользователь + эндпоинт + параметры запроса.
+# Стандартный key_builder включает repr сессии БД, и ключи не совпадают
+def user_key_builder(func, namespace="", request=None, response=None, args=None, kwargs=None):
+    return f"{FastAPICache.get_prefix()}:{build_cache_key(func, kwargs or {})}"
+
+# Сброс кэшированных ответов пользователя после изменения его данных
+async def invalidate_user_cache(user_id: int):
+    await FastAPICache.clear(namespace=user_key_prefix(user_id))
+    response_cache.clear(user_key_prefix(user_id))
+
 # Инициализация кэша
 async def init_cache():
-    FastAPICache.init(CACHE_CONFIG["backend"], prefix="vocal-crm-cache") 
\ No newline at end of file
+    FastAPICache.init(CACHE_CONFIG["backend"], prefix="vocal-crm-cache", key_builder=user_key_builder) 
\ No newline at end of file
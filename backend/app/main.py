@@ -115,24 +115,15 @@ async def change_password(
 @app.post("/students/", response_model=schemas.Student)
 def create_student(student: schemas.StudentCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
     try:
-        logger.info(f"Received student data: {student.dict()}")
-        logger.info(f"Data types: first_name={type(student.first_name)}, last_name={type(student.last_name)}, phone={type(student.phone)}, total_lessons={type(student.total_lessons)}, remaining_lessons={type(student.remaining_lessons)}")
-        
         student_data = student.dict()
         student_data["user_id"] = current_user.id
         db_student = models.Student(**student_data)
-        logger.info("Created student model")
         db.add(db_student)
-        logger.info("Added student to session")
         db.commit()
-        logger.info("Committed transaction")
         db.refresh(db_student)
-        logger.info(f"Student created successfully with ID: {db_student.id}")
         return db_student
     except Exception as e:
-        logger.error(f"Error creating student: {str(e)}")
-        logger.error(f"Error type: {type(e)}")
-        logger.error(f"Error details: {e.__dict__}")
+        logger.exception("Error creating student")
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -200,8 +191,16 @@ def create_lesson(lesson: schemas.LessonCreate, current_user: models.User = Depe
         if not student:
             raise HTTPException(status_code=404, detail="Student not found")
         
-        # Проверяем наличие оставшихся занятий
-        if student.remaining_lessons <= 0:
+        # Списываем занятие атомарно: при параллельных запросах проверка и
+        # уменьшение в Python пропускали списание ниже нуля
+        decremented = db.query(models.Student).filter(
+            models.Student.id == student.id,
+            models.Student.remaining_lessons > 0
+        ).update(
+            {models.Student.remaining_lessons: models.Student.remaining_lessons - 1},
+            synchronize_session=False
+        )
+        if not decremented:
             raise HTTPException(status_code=400, detail="No remaining lessons")
         
         # Создаем занятие
@@ -210,9 +209,6 @@ def create_lesson(lesson: schemas.LessonCreate, current_user: models.User = Depe
         db_lesson = models.Lesson(**lesson_data)
         db.add(db_lesson)
         
-        # Обновляем количество оставшихся занятий
-        student.remaining_lessons -= 1
-        
         db.commit()
         db.refresh(db_lesson)
         return db_lesson
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""Сравнение db.query(...) и заранее построенных запросов (api/statements.py).
+
+Выполняет горячие запросы роутеров тремя способами на in-memory базе:
+  query       - db.query(...).filter(...) как раньше;
+  statement   - заранее построенный select() с bindparam;
+  no-cache    - тот же statement при query_cache_size=0 (компиляция на каждый вызов).
+Для каждого печатает время на вызов и число компиляций SQL
+(промахов кэша engine) после прогрева.
+
+Запуск: python bench_statements.py [число повторов]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine.default import CACHE_HIT
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from models import Expense, Lesson, Student, User
+from api.statements import LESSONS_BY_USER, USER_BY_USERNAME, get_owned, ledger_rows
+
+USER_ID = 1
+
+
+def make_session(query_cache_size: int):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+        query_cache_size=query_cache_size,
+    )
+    Base.metadata.create_all(engine)
+    compiles = {"count": 0}
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def count_compiles(conn, cursor, statement, parameters, context, executemany):
+        if context.compiled is not None and context.cache_hit is not CACHE_HIT:
+            compiles["count"] += 1
+
+    db = sessionmaker(bind=engine, autoflush=False)()
+    db.add(User(id=USER_ID, username="bench", hashed_password="x"))
+    db.add_all(Student(id=i, name=f"student {i}", user_id=USER_ID) for i in range(1, 21))
+    start = datetime(2024, 1, 1, 9)
+    db.add_all(
+        Lesson(date=start + timedelta(hours=3 * i), duration=60, student_id=i % 20 + 1, user_id=USER_ID)
+        for i in range(100)
+    )
+    db.add_all(
+        Expense(date=start + timedelta(days=i), amount=i, category="rent", user_id=USER_ID)
+        for i in range(100)
+    )
+    db.commit()
+    return db, compiles
+
+
+def query_style(db):
+    db.query(User).filter(User.username == "bench").first()
+    db.query(Lesson).filter(Lesson.user_id == USER_ID).offset(0).limit(100).all()
+    db.query(Lesson).filter(Lesson.id == 5, Lesson.user_id == USER_ID).first()
+    db.query(Expense).filter(
+        Expense.user_id == USER_ID, Expense.date >= datetime(2024, 1, 10), Expense.category == "rent"
+    ).offset(0).limit(100).all()
+
+
+def statement_style(db):
+    db.scalars(USER_BY_USERNAME, {"username": "bench"}).first()
+    db.scalars(LESSONS_BY_USER, {"user_id": USER_ID, "skip": 0, "limit": 100}).all()
+    get_owned(db, Lesson, USER_ID, 5)
+    ledger_rows(db, Expense, USER_ID, 0, 100, start_date=datetime(2024, 1, 10), category="rent")
+
+
+def run(name: str, fn, query_cache_size: int, repeat: int):
+    db, compiles = make_session(query_cache_size)
+    fn(db)  # прогрев: первая компиляция и загрузка в кэш
+    db.expunge_all()
+    compiles["count"] = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(db)
+        # Как в запросе: объекты не переиспользуются между вызовами
+        db.expunge_all()
+    elapsed = time.perf_counter() - started
+    db.close()
+    print(f"{name:<10} {elapsed / repeat * 1e6:>10.1f} мкс/повтор   компиляций: {compiles['count']}")
+    return elapsed
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"Повторов: {repeat}, 4 SQL-запроса на повтор")
+    query_time = run("query", query_style, 500, repeat)
+    statement_time = run("statement", statement_style, 500, repeat)
+    run("no-cache", statement_style, 0, repeat)
+    print(f"Ускорение statement относительно query: {query_time / statement_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""Проверка планов запросов роутеров.
+
+Вызывает каждый GET-эндпоинт из api/routers на пустой in-memory базе,
+перехватывает все выполненные SQL-запросы и прогоняет их через
+EXPLAIN QUERY PLAN. Если хотя бы один запрос читает таблицу полным
+сканированием (SCAN <таблица> без индекса), скрипт завершается с кодом 1.
+
+Запуск: python check_query_plans.py
+"""
+import asyncio
+import inspect
+import re
+import sys
+from datetime import date, datetime
+
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from models import User, Student
+
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+SKIP_PARAMS = {"db", "current_user", "request", "response"}
+
+SAMPLE_VALUES = {
+    int: 1,
+    str: "test",
+    datetime: datetime(2024, 1, 1),
+    date: date(2024, 1, 1),
+}
+
+# Параметры-строки с особым форматом
+SAMPLE_BY_NAME = {
+    "ids": "1,2",
+    "student_ids": "1,2",
+    "fields": "id",
+    # У учеников include=student нет - для них проверяется только запрос без include
+    "include": "student",
+}
+
+
+def collect_routes():
+    from main import app
+
+    seen = set()
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or "GET" not in route.methods:
+            continue
+        if route.endpoint in seen:
+            continue
+        if "db" not in inspect.signature(route.endpoint).parameters:
+            # Эндпоинт без сессии базы (например, /profiler/) запросов не выполняет
+            continue
+        seen.add(route.endpoint)
+        yield route
+
+
+def build_kwargs(endpoint, fill_optional: bool) -> dict:
+    kwargs = {}
+    for name, param in inspect.signature(endpoint).parameters.items():
+        if name in SKIP_PARAMS:
+            continue
+        required = param.default is inspect.Parameter.empty
+        if name in SAMPLE_BY_NAME and (required or fill_optional):
+            kwargs[name] = SAMPLE_BY_NAME[name]
+        elif required or fill_optional:
+            kwargs[name] = SAMPLE_VALUES.get(param.annotation, 1)
+        elif isinstance(param.default, (int, str, float, type(None))):
+            kwargs[name] = param.default
+        else:
+            # Query(...)/Depends(...) - FastAPI подставил бы значение по умолчанию
+            kwargs[name] = getattr(param.default, "default", None)
+    return kwargs
+
+
+def explain(connection, statement, parameters):
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def main() -> int:
+    FastAPICache.init(InMemoryBackend(), prefix="query-plans", enable=False)
+
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+
+    captured = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            captured.append((statement, parameters))
+
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    user = User(id=1, username="planner", hashed_password="-")
+    db.add(user)
+    db.add(Student(id=1, name="Test", user_id=1))
+    db.commit()
+    captured.clear()
+
+    failures = []
+    checked = 0
+    for route in collect_routes():
+        for fill_optional in (False, True):
+            captured.clear()
+            kwargs = build_kwargs(route.endpoint, fill_optional)
+            try:
+                result = route.endpoint(db=db, current_user=user, **kwargs)
+                if inspect.isawaitable(result):
+                    asyncio.run(result)
+            except HTTPException:
+                pass
+            db.rollback()
+
+            with engine.connect() as connection:
+                for statement, parameters in captured:
+                    checked += 1
+                    plan = explain(connection, statement, parameters)
+                    scans = [line for line in plan if FULL_SCAN.match(line)]
+                    if scans:
+                        failures.append((route.path, route.name, statement, plan))
+
+    db.close()
+
+    for path, name, statement, plan in failures:
+        print(f"FULL SCAN: {name} ({path})")
+        print(f"  {' '.join(statement.split())}")
+        for line in plan:
+            print(f"    {line}")
+
+    print(f"Проверено запросов: {checked}, с полным сканированием: {len(failures)}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
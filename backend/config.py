@@ -15,7 +15,17 @@ class Settings(BaseSettings):
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
-    
+
+    # Настройки production-сервера (serve.py)
+    WORKERS: int = int(os.getenv("WORKERS", "0"))  # 0 - по числу CPU
+    MAX_WORKERS: int = int(os.getenv("MAX_WORKERS", "8"))
+    KEEP_ALIVE: int = int(os.getenv("KEEP_ALIVE", "30"))  # в секундах
+    BACKLOG: int = int(os.getenv("BACKLOG", "2048"))
+    LIMIT_CONCURRENCY: int = int(os.getenv("LIMIT_CONCURRENCY", "1000"))  # 0 - без ограничения
+    GRACEFUL_TIMEOUT: int = int(os.getenv("GRACEFUL_TIMEOUT", "30"))  # в секундах
+    # Access-лог uvicorn; по умолчанию выключен - строку на запрос пишет services/log_pipeline.py
+    ACCESS_LOG: bool = os.getenv("ACCESS_LOG", "False").lower() == "true"
+
     # Настройки CORS
     CORS_ORIGINS: List[str] = [
         "http://localhost:3000",  # React development server
@@ -34,12 +44,100 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    ADMIN_USERNAMES: str = os.getenv("ADMIN_USERNAMES", "admin")  # через запятую
     
     # Настройки базы данных
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./vocal_schedule.db")
+    # Пул соединений для PostgreSQL и других серверных СУБД
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # в секундах
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # в секундах
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+    # Пул для файловой SQLite: queue - держать соединения открытыми, null - открывать на запрос
+    DB_SQLITE_POOL: str = os.getenv("DB_SQLITE_POOL", "queue")
+    DB_SQLITE_WAL: bool = os.getenv("DB_SQLITE_WAL", "True").lower() == "true"
+    # Пул потока-писателя при WRITE_QUEUE_ENABLED; сессии запросов берут соединения из DB_POOL_*
+    DB_WRITE_POOL_SIZE: int = int(os.getenv("DB_WRITE_POOL_SIZE", "1"))
+    DB_WRITE_MAX_OVERFLOW: int = int(os.getenv("DB_WRITE_MAX_OVERFLOW", "0"))
+    # Кэш скомпилированного SQL на engine (число запросов), 0 - выключен
+    DB_QUERY_CACHE_SIZE: int = int(os.getenv("DB_QUERY_CACHE_SIZE", "500"))
+    # Архив старых занятий и операций (services/archive.py), только для файловой SQLite
+    ARCHIVE_ENABLED: bool = os.getenv("ARCHIVE_ENABLED", "False").lower() == "true"
+    ARCHIVE_DATABASE_PATH: str = os.getenv("ARCHIVE_DATABASE_PATH", "./vocal_schedule_archive.db")
+    ARCHIVE_HORIZON_DAYS: int = int(os.getenv("ARCHIVE_HORIZON_DAYS", "365"))
+    # Отдельный файл SQLite на каждого пользователя (services/shards.py)
+    SHARDING_ENABLED: bool = os.getenv("SHARDING_ENABLED", "False").lower() == "true"
+    SHARD_DIR: str = os.getenv("SHARD_DIR", "./shards")
+    SHARD_MAX_OPEN_ENGINES: int = int(os.getenv("SHARD_MAX_OPEN_ENGINES", "64"))
+    # Запись через поток-писатель с групповым коммитом (services/write_queue.py)
+    WRITE_QUEUE_ENABLED: bool = os.getenv("WRITE_QUEUE_ENABLED", "False").lower() == "true"
+    WRITE_QUEUE_MAX_BATCH: int = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "100"))
+    WRITE_QUEUE_MAX_DELAY_MS: int = int(os.getenv("WRITE_QUEUE_MAX_DELAY_MS", "5"))
     
     # Настройки кэширования
     CACHE_EXPIRE_MINUTES: int = int(os.getenv("CACHE_EXPIRE_MINUTES", "5"))
+    CACHE_STALE_SECONDS: int = int(os.getenv("CACHE_STALE_SECONDS", "0"))
+    # Готовые сжатые ответы (services/response_cache.py); br и zstd - если установлены brotli/zstandard
+    RESPONSE_CACHE_MAX_MB: int = int(os.getenv("RESPONSE_CACHE_MAX_MB", "64"))
+    RESPONSE_CACHE_GZIP_LEVEL: int = int(os.getenv("RESPONSE_CACHE_GZIP_LEVEL", "9"))
+    RESPONSE_CACHE_BROTLI_QUALITY: int = int(os.getenv("RESPONSE_CACHE_BROTLI_QUALITY", "6"))
+    RESPONSE_CACHE_ZSTD_LEVEL: int = int(os.getenv("RESPONSE_CACHE_ZSTD_LEVEL", "9"))
+
+    # Настройки фоновых задач
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_QUEUE_SIZE: int = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+    JOB_RESULTS_DIR: str = os.getenv("JOB_RESULTS_DIR", "job_results")
+
+    # Обслуживание SQLite (services/maintenance.py)
+    DB_MAINTENANCE_ENABLED: bool = os.getenv("DB_MAINTENANCE_ENABLED", "True").lower() == "true"
+    DB_MAINTENANCE_TIMES: str = os.getenv("DB_MAINTENANCE_TIMES", "04:00")  # местное время, через запятую
+    DB_MAINTENANCE_VACUUM_PAGES: int = int(os.getenv("DB_MAINTENANCE_VACUUM_PAGES", "0"))  # 0 - все свободные
+    DB_MAINTENANCE_ANALYSIS_LIMIT: int = int(os.getenv("DB_MAINTENANCE_ANALYSIS_LIMIT", "1000"))  # 0 - без ограничения
+    DB_MAINTENANCE_BUSY_TIMEOUT: int = int(os.getenv("DB_MAINTENANCE_BUSY_TIMEOUT", "30"))  # в секундах
+
+    # Непрерывное резервное копирование передачей WAL (services/backup.py)
+    BACKUP_ENABLED: bool = os.getenv("BACKUP_ENABLED", "False").lower() == "true"
+    BACKUP_DIR: str = os.getenv("BACKUP_DIR", "./backups")  # локальный или смонтированный каталог
+    BACKUP_INTERVAL_SECONDS: float = float(os.getenv("BACKUP_INTERVAL_SECONDS", "1"))
+    BACKUP_SNAPSHOT_HOURS: float = float(os.getenv("BACKUP_SNAPSHOT_HOURS", "24"))
+    BACKUP_RETENTION_HOURS: float = float(os.getenv("BACKUP_RETENTION_HOURS", "168"))
+    BACKUP_CHECKPOINT_PAGES: int = int(os.getenv("BACKUP_CHECKPOINT_PAGES", "1000"))
+
+    # Настройки расписания
+    WORKING_HOURS: str = os.getenv("WORKING_HOURS", "09:00-21:00")  # для /lessons/free-slots
+    FREE_SLOTS_MAX_DAYS: int = int(os.getenv("FREE_SLOTS_MAX_DAYS", "62"))
+
+    # Выборка по списку id (/students/batch, /lessons/by-students)
+    MULTI_GET_MAX_IDS: int = int(os.getenv("MULTI_GET_MAX_IDS", "1000"))
+
+    # Логирование (services/log_pipeline.py)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")  # json | text
+    LOG_FILE: str = os.getenv("LOG_FILE", "")  # пусто - stderr
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_SAMPLING: str = os.getenv("LOG_SAMPLING", "")  # "access=0.1,services.events=0.5"
+
+    # Профилирование запросов (services/profiler.py)
+    PROFILER_ENABLED: bool = os.getenv("PROFILER_ENABLED", "False").lower() == "true"
+    PROFILER_SAMPLE_RATE: float = float(os.getenv("PROFILER_SAMPLE_RATE", "0"))  # доля запросов, 0..1
+    PROFILER_DIR: str = os.getenv("PROFILER_DIR", "profiles")
+    PROFILER_MAX_FILES: int = int(os.getenv("PROFILER_MAX_FILES", "100"))
+    PROFILER_TOKEN_MINUTES: int = int(os.getenv("PROFILER_TOKEN_MINUTES", "10"))
+
+    # Трассировка запросов (services/tracing.py)
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "False").lower() == "true"
+    TRACE_SLOW_MS: float = float(os.getenv("TRACE_SLOW_MS", "500"))  # медленнее - сохраняются всегда
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0"))  # доля остальных, 0..1
+    TRACE_FILE: str = os.getenv("TRACE_FILE", "traces/trace.json")
+    TRACE_FILE_MAX_MB: int = int(os.getenv("TRACE_FILE_MAX_MB", "50"))
+    TRACE_FILE_BACKUPS: int = int(os.getenv("TRACE_FILE_BACKUPS", "5"))
+
+    # Настройки потока событий (GET /events)
+    SSE_QUEUE_SIZE: int = int(os.getenv("SSE_QUEUE_SIZE", "100"))  # событий на подписчика
+    SSE_HEARTBEAT_SECONDS: int = int(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+    # Как часто воркер проверяет изменения, сделанные в других воркерах (0 - не проверять)
+    SSE_POLL_INTERVAL_MS: int = int(os.getenv("SSE_POLL_INTERVAL_MS", "500"))
     
     class Config:
         case_sensitive = True
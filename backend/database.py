@@ -1,14 +1,87 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, StaticPool
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./vocal_schedule.db"
+from config import settings
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+
+
+def is_memory_sqlite(url) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL, readonly: bool = False, writer: bool = False, **overrides):
+    """Создаёт engine с настройками пула под диалект DATABASE_URL.
+
+    readonly=True - пул читателей: соединения SQLite открываются с
+    PRAGMA query_only и не могут ничего записать. writer=True - пул потока-писателя
+    services/write_queue.py размером DB_WRITE_POOL_SIZE/DB_WRITE_MAX_OVERFLOW.
+    """
+    url = make_url(url)
+    sqlite = url.get_backend_name() == "sqlite"
+    if sqlite:
+        options = {"connect_args": {"check_same_thread": False}}
+        if is_memory_sqlite(url):
+            # In-memory база живёт в одном соединении - делим его между потоками
+            options["poolclass"] = StaticPool
+        elif settings.DB_SQLITE_POOL == "null":
+            options["poolclass"] = NullPool
+        elif writer:
+            options["pool_size"] = settings.DB_WRITE_POOL_SIZE
+            options["max_overflow"] = settings.DB_WRITE_MAX_OVERFLOW
+    else:
+        options = {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        }
+        if writer:
+            options["pool_size"] = settings.DB_WRITE_POOL_SIZE
+            options["max_overflow"] = settings.DB_WRITE_MAX_OVERFLOW
+    options["query_cache_size"] = settings.DB_QUERY_CACHE_SIZE
+    options.update(overrides)
+    db_engine = create_engine(url, **options)
+
+    if sqlite and not is_memory_sqlite(url):
+        @event.listens_for(db_engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            if settings.DB_SQLITE_WAL:
+                # В WAL читатели не блокируют писателя и наоборот
+                cursor.execute("PRAGMA journal_mode=WAL")
+                if settings.BACKUP_ENABLED:
+                    # Checkpoint делает репликатор (services/backup.py), иначе кадры WAL теряются
+                    cursor.execute("PRAGMA wal_autocheckpoint=0")
+            if not readonly:
+                # Действует для новых файлов; существующие переводит services/maintenance.py
+                cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            if settings.ARCHIVE_ENABLED and not settings.SHARDING_ENABLED:
+                from services.archive import attach_archive
+                attach_archive(dbapi_connection)
+            if readonly:
+                cursor.execute("PRAGMA query_only=ON")
+            cursor.close()
+
+    return db_engine
+
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Свой пул у потока-писателя services/write_queue.py: сессии запросов держат
+# соединения engine, пока ждут очередь, и писатель не должен их ждать
+writer_engine = engine if is_memory_sqlite(SQLALCHEMY_DATABASE_URL) else create_db_engine(writer=True)
+
+# Для in-memory базы отдельного пула читателей быть не может - соединение одно
+read_engine = engine if is_memory_sqlite(SQLALCHEMY_DATABASE_URL) else create_db_engine(readonly=True)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 Base = declarative_base()
 
 # Dependency
@@ -17,4 +90,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
@@ -2,20 +2,32 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+import asyncio
 import logging
 from config import settings
 from api_config import (
     CORS_CONFIG, API_V1_STR, API_TITLE, 
-    API_DESCRIPTION, API_VERSION, init_cache
+    API_DESCRIPTION, API_VERSION, init_cache, invalidate_user_cache
 )
 from api.routers import (
     auth_router, students_router, lessons_router,
     subscriptions_router, expenses_router, incomes_router,
-    rent_settings_router, finance_router
+    rent_settings_router, finance_router, jobs_router, sync_router,
+    events_router, profiler_router, maintenance_router, views_router
 )
+from services.jobs import runner
+from services.write_queue import write_queue
+from services.shards import shard_router
+from services.events import broker, poller
+from services.response_cache import MIN_COMPRESS_SIZE
+from services.profiler import profiler
+from services.log_pipeline import log_requests, pipeline
+from services.tracing import exporter, trace_requests
+from services.maintenance import scheduler as maintenance_scheduler
+from services.backup import replicator
 
-# Настройка логгера
-logging.basicConfig(level=logging.INFO)
+# Настройка логгера: записи пишет фоновый поток (services/log_pipeline.py)
+pipeline.setup()
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
@@ -34,30 +46,86 @@ async def add_no_cache_header(request: Request, call_next):
     response.headers["Expires"] = "0"
     return response
 
+# Освобождаем память от ответов пользователя после успешных изменяющих запросов.
+# Корректность от этого не зависит: сбрасывается только кэш этого воркера, а
+# устаревшие записи в остальных не находятся - ключ включает версию данных
+@app.middleware("http")
+async def invalidate_cache_on_write(request: Request, call_next):
+    response = await call_next(request)
+    user_id = getattr(request.state, "user_id", None)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and user_id is not None and response.status_code < 400:
+        await invalidate_user_cache(user_id)
+    return response
+
+# Профилирование выборочных запросов и запросов с X-Profile
+if settings.PROFILER_ENABLED:
+    app.middleware("http")(profiler)
+
+# Трассы запросов; внутри log_requests, чтобы в трассе был request_id
+if settings.TRACING_ENABLED:
+    app.middleware("http")(trace_requests)
+
+# Request id и access-лог - внешний слой, чтобы учесть время всех остальных
+app.middleware("http")(log_requests)
+
 # Настройка CORS
 app.add_middleware(
     CORSMiddleware,
     **CORS_CONFIG
 )
 
-# Добавляем GZip сжатие
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+# Добавляем GZip сжатие (кэшированные ответы приходят уже сжатыми и не пережимаются)
+app.add_middleware(GZipMiddleware, minimum_size=MIN_COMPRESS_SIZE)
 
 # Инициализация кэша
 @app.on_event("startup")
 async def startup_event():
     await init_cache()
+    if settings.TRACING_ENABLED:
+        exporter.start()
+    broker.bind(asyncio.get_running_loop())
+    poller.start()
+    if settings.WRITE_QUEUE_ENABLED:
+        write_queue.start()
+    await runner.start()
+    maintenance_scheduler.start()
+    if settings.BACKUP_ENABLED:
+        replicator.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await poller.stop()
+    await maintenance_scheduler.stop()
+    await runner.stop()
+    write_queue.stop()
+    replicator.stop()
+    shard_router.dispose_all()
+    exporter.stop()
+    pipeline.stop()
 
 # Включаем роутеры
+# Роутеры ресурсов объявляют пути относительно своего префикса ("/", "/{id}").
+# finance_router подключается раньше expenses/incomes: его /expenses/ и
+# /incomes/ используются фронтендом, а отдельные роутеры добавляют GET по id.
 app.include_router(auth_router, prefix=API_V1_STR)
-app.include_router(students_router, prefix=API_V1_STR)
-app.include_router(lessons_router, prefix=API_V1_STR)
-app.include_router(subscriptions_router, prefix=API_V1_STR)
-app.include_router(expenses_router, prefix=API_V1_STR)
-app.include_router(incomes_router, prefix=API_V1_STR)
-app.include_router(rent_settings_router, prefix=API_V1_STR)
+app.include_router(students_router, prefix=f"{API_V1_STR}/students")
+app.include_router(lessons_router, prefix=f"{API_V1_STR}/lessons")
+app.include_router(subscriptions_router, prefix=f"{API_V1_STR}/subscriptions")
 app.include_router(finance_router, prefix=API_V1_STR)
+app.include_router(expenses_router, prefix=f"{API_V1_STR}/expenses")
+app.include_router(incomes_router, prefix=f"{API_V1_STR}/incomes")
+app.include_router(rent_settings_router, prefix=API_V1_STR)
+app.include_router(jobs_router, prefix=f"{API_V1_STR}/jobs")
+app.include_router(sync_router, prefix=f"{API_V1_STR}/sync")
+app.include_router(events_router, prefix=f"{API_V1_STR}/events")
+app.include_router(profiler_router, prefix=f"{API_V1_STR}/profiler")
+app.include_router(maintenance_router, prefix=f"{API_V1_STR}/maintenance")
+app.include_router(views_router, prefix=f"{API_V1_STR}/views")
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+    if settings.DEBUG:
+        import uvicorn
+        uvicorn.run("main:app", host=settings.HOST, port=settings.PORT, reload=True)
+    else:
+        import serve
+        serve.main() 
\ No newline at end of file
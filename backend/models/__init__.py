@@ -4,4 +4,7 @@ from .student import Student
 from .subscription import Subscription
 from .expense import Expense
 from .income import Income
-from .rent_settings import RentSettings 
\ No newline at end of file
+from .rent_settings import RentSettings
+from .job import Job
+from .sync import Tombstone
+from .tenant import TenantShard
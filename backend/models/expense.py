@@ -1,9 +1,17 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Integer
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Integer, Index
 from sqlalchemy.orm import relationship
 from database import Base
+from .sync import SyncMixin
 
-class Expense(Base):
+class Expense(SyncMixin, Base):
     __tablename__ = "expenses"
+    # Фильтры /expenses/ и группировка в /summary/ идут по user_id + category + date
+    __table_args__ = (
+        Index("ix_expenses_user_id_date", "user_id", "date"),
+        Index("ix_expenses_user_id_category_date", "user_id", "category", "date"),
+        Index("ix_expenses_user_id_change_seq", "user_id", "change_seq"),
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(DateTime, nullable=False)
@@ -1,9 +1,16 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Integer
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Integer, Index
 from sqlalchemy.orm import relationship
 from database import Base
+from .sync import SyncMixin
 
-class Income(Base):
+class Income(SyncMixin, Base):
     __tablename__ = "incomes"
+    __table_args__ = (
+        Index("ix_incomes_user_id_date", "user_id", "date"),
+        Index("ix_incomes_user_id_category_date", "user_id", "category", "date"),
+        Index("ix_incomes_user_id_change_seq", "user_id", "change_seq"),
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(DateTime, nullable=False)
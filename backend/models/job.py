@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, DateTime, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from database import Base
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_user_id_created_at", "user_id", "created_at"),
+        Index("ix_jobs_status", "status"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    type = Column(String, nullable=False)
+    # queued -> running -> succeeded | failed | cancelled; cancelling - ждём остановки
+    status = Column(String, nullable=False, default="queued")
+    progress = Column(Float, nullable=False, default=0)
+    params = Column(Text, nullable=True)  # JSON
+    result_path = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    owner = Column(String, nullable=True)  # host:pid процесса, выполняющего задачу
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    # Внешние ключи
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    # Связи
+    user = relationship("User", back_populates="jobs")
@@ -1,13 +1,30 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index, event, func, inspect, select, update
+from sqlalchemy.orm import relationship, Session, object_session
 from database import Base
+from .student import Student
+from .sync import SyncMixin, record_change
 
-class Lesson(Base):
+class Lesson(SyncMixin, Base):
     __tablename__ = "lessons"
+    # Списки фильтруются по user_id и диапазону дат, по ученику - через student_id
+    __table_args__ = (
+        Index("ix_lessons_user_id_date", "user_id", "date"),
+        Index("ix_lessons_student_id_date", "student_id", "date"),
+        Index("ix_lessons_user_id_change_seq", "user_id", "change_seq"),
+        # MAX(duration) ограничивает снизу диапазон дат при поиске пересечений
+        Index("ix_lessons_user_id_duration", "user_id", "duration"),
+        # id не выдаются повторно: старые строки уходят в архив (services/archive.py)
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(DateTime, nullable=False)
     duration = Column(Integer, nullable=False)  # в минутах
+    end_date = Column(DateTime, nullable=True)  # date + duration, выставляется автоматически
     is_completed = Column(Boolean, default=False)
     is_cancelled = Column(Boolean, default=False)
     notes = Column(String, nullable=True)
@@ -18,4 +35,108 @@ class Lesson(Base):
     
     # Связи
     user = relationship("User", back_populates="lessons")
-    student = relationship("Student", back_populates="lessons") 
\ No newline at end of file
+    student = relationship("Student", back_populates="lessons")
+
+
+def lesson_end(start: datetime, duration: int) -> datetime:
+    return start + timedelta(minutes=duration)
+
+
+@event.listens_for(Lesson, "before_insert")
+@event.listens_for(Lesson, "before_update")
+def _set_end_date(mapper, connection, target):
+    target.end_date = lesson_end(target.date, target.duration)
+
+
+def refresh_end_dates(session: Session, ids: Iterable[int]):
+    """Пересчитывает end_date после массового UPDATE date/duration."""
+    rows = session.query(Lesson.id, Lesson.date, Lesson.duration).filter(Lesson.id.in_(list(ids))).all()
+    if rows:
+        session.execute(
+            update(Lesson),
+            [{"id": row.id, "end_date": lesson_end(row.date, row.duration)} for row in rows],
+        )
+
+
+# Состояние занятия -> счётчик ученика. Отменённое занятие считается
+# отменённым, даже если отмечено проведённым
+COUNTER_FIELDS = {"student_id", "is_completed", "is_cancelled"}
+
+
+def lesson_counter(is_completed: Optional[bool], is_cancelled: Optional[bool]) -> str:
+    if is_cancelled:
+        return "lessons_cancelled"
+    if is_completed:
+        return "lessons_completed"
+    return "lessons_scheduled"
+
+
+def shift_counters(connection, deltas: Dict[Tuple[int, str], int], seq: Optional[int] = None):
+    """UPDATE students SET счётчик = счётчик + delta - атомарно, без чтения в Python.
+
+    seq - номер изменения занятий: ученик с новыми счётчиками тоже попадает
+    в дельта-синхронизацию.
+    """
+    by_student: Dict[int, Dict[str, int]] = {}
+    for (student_id, counter), delta in deltas.items():
+        if delta and student_id is not None:
+            by_student.setdefault(student_id, {})[counter] = delta
+    for student_id, counters in by_student.items():
+        values = {counter: getattr(Student, counter) + delta for counter, delta in counters.items()}
+        if seq is not None:
+            values["change_seq"] = seq
+        connection.execute(update(Student).where(Student.id == student_id).values(values))
+
+
+@event.listens_for(Lesson, "after_insert")
+def _count_inserted(mapper, connection, target):
+    shift_counters(connection, {(target.student_id, lesson_counter(target.is_completed, target.is_cancelled)): 1}, target.change_seq)
+    record_change(object_session(target), target.user_id, target.change_seq, Student.__tablename__)
+
+
+@event.listens_for(Lesson, "after_delete")
+def _count_deleted(mapper, connection, target):
+    shift_counters(connection, {(target.student_id, lesson_counter(target.is_completed, target.is_cancelled)): -1}, target.change_seq)
+    record_change(object_session(target), target.user_id, target.change_seq, Student.__tablename__)
+
+
+@event.listens_for(Lesson, "after_update")
+def _count_updated(mapper, connection, target):
+    state = inspect(target)
+
+    def previous(name):
+        history = state.attrs[name].history
+        return history.deleted[0] if history.deleted else getattr(target, name)
+
+    old = (previous("student_id"), lesson_counter(previous("is_completed"), previous("is_cancelled")))
+    new = (target.student_id, lesson_counter(target.is_completed, target.is_cancelled))
+    if old != new:
+        shift_counters(connection, {old: -1, new: 1}, target.change_seq)
+        record_change(object_session(target), target.user_id, target.change_seq, Student.__tablename__)
+
+
+def _counter_groups(session: Session, ids: Iterable[int]):
+    return session.execute(
+        select(Lesson.student_id, Lesson.is_completed, Lesson.is_cancelled, func.count())
+        .where(Lesson.id.in_(list(ids)))
+        .group_by(Lesson.student_id, Lesson.is_completed, Lesson.is_cancelled)
+    ).all()
+
+
+def counters_before_update(session: Session, ids: Iterable[int], seq: int, changes: dict):
+    """Сдвигает счётчики перед массовым UPDATE занятий (он идёт мимо событий ORM)."""
+    deltas: Counter = Counter()
+    for student_id, is_completed, is_cancelled, count in _counter_groups(session, ids):
+        deltas[(student_id, lesson_counter(is_completed, is_cancelled))] -= count
+        new_counter = lesson_counter(
+            changes.get("is_completed", is_completed), changes.get("is_cancelled", is_cancelled)
+        )
+        deltas[(changes.get("student_id", student_id), new_counter)] += count
+    shift_counters(session.connection(), deltas, seq)
+
+
+def counters_before_delete(session: Session, ids: Iterable[int], seq: int):
+    deltas: Counter = Counter()
+    for student_id, is_completed, is_cancelled, count in _counter_groups(session, ids):
+        deltas[(student_id, lesson_counter(is_completed, is_cancelled))] -= count
+    shift_counters(session.connection(), deltas, seq)
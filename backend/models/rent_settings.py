@@ -1,9 +1,12 @@
-from sqlalchemy import Column, Integer, ForeignKey, Integer
+from sqlalchemy import Column, Integer, ForeignKey, Integer, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
 class RentSettings(Base):
     __tablename__ = "rent_settings"
+    __table_args__ = (
+        Index("ix_rent_settings_user_id", "user_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     amount = Column(Integer, nullable=False)
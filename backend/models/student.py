@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Integer
+from sqlalchemy import Column, Integer, String, ForeignKey, Integer, Index
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from database import Base
+from .sync import SyncMixin
 
-class Student(Base):
+class Student(SyncMixin, Base):
     __tablename__ = "students"
+    __table_args__ = (
+        Index("ix_students_user_id_name", "user_id", "name"),
+        Index("ix_students_user_id_change_seq", "user_id", "change_seq"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -11,6 +17,10 @@ class Student(Base):
     phone = Column(String, nullable=True)
     notes = Column(String, nullable=True)
     remaining_lessons = Column(Integer, default=0)
+    # Счётчики занятий по состоянию, ведутся при записи занятий (models/lesson.py)
+    lessons_scheduled = Column(Integer, nullable=False, default=0, server_default="0")
+    lessons_completed = Column(Integer, nullable=False, default=0, server_default="0")
+    lessons_cancelled = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Внешние ключи
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -18,4 +28,14 @@ class Student(Base):
     # Связи
     user = relationship("User", back_populates="students")
     lessons = relationship("Lesson", back_populates="student")
-    subscriptions = relationship("Subscription", back_populates="student") 
\ No newline at end of file
+    subscriptions = relationship("Subscription", back_populates="student")
+
+    @hybrid_property
+    def lessons_total(self) -> int:
+        return (self.lessons_scheduled or 0) + (self.lessons_completed or 0) + (self.lessons_cancelled or 0)
+
+    # В запросах (fields=lessons_total) - та же сумма колонок
+    @lessons_total.inplace.expression
+    @classmethod
+    def _lessons_total_expression(cls):
+        return cls.lessons_scheduled + cls.lessons_completed + cls.lessons_cancelled 
\ No newline at end of file
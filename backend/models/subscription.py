@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Integer
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Integer, Index
 from sqlalchemy.orm import relationship
 from database import Base
+from .sync import SyncMixin
 
-class Subscription(Base):
+class Subscription(SyncMixin, Base):
     __tablename__ = "subscriptions"
+    __table_args__ = (
+        Index("ix_subscriptions_user_id_start_date", "user_id", "start_date"),
+        Index("ix_subscriptions_student_id", "student_id"),
+        Index("ix_subscriptions_user_id_change_seq", "user_id", "change_seq"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     start_date = Column(DateTime, nullable=False)
@@ -0,0 +1,109 @@
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, event, insert, select, update
+from sqlalchemy.orm import Session
+
+from database import Base
+from .user import User
+
+
+class SyncMixin:
+    """Поля для дельта-синхронизации (GET /sync).
+
+    change_seq - номер изменения из счётчика пользователя (users.change_seq),
+    присваивается автоматически при каждом flush.
+    """
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_seq = Column(Integer, nullable=False, default=0)
+
+
+class Tombstone(Base):
+    """Запись об удалённой строке, чтобы клиент мог убрать её у себя."""
+
+    __tablename__ = "sync_tombstones"
+    __table_args__ = (
+        Index("ix_sync_tombstones_user_id_change_seq", "user_id", "change_seq"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)  # имя таблицы
+    entity_id = Column(Integer, nullable=False)
+    change_seq = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+    # Внешние ключи
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+
+def next_change_seq(session: Session, user_id: int) -> int:
+    """Увеличивает счётчик изменений пользователя и возвращает новое значение.
+
+    UPDATE блокирует строку пользователя до конца транзакции, поэтому номера
+    выдаются в порядке коммитов.
+    """
+    connection = session.connection()
+    connection.execute(
+        update(User).where(User.id == user_id).values(change_seq=User.change_seq + 1)
+    )
+    return connection.execute(select(User.change_seq).where(User.id == user_id)).scalar_one()
+
+
+def stamp_change(session: Session, user_id: int, entity: str) -> int:
+    """Выдаёт номер изменения для массовых операций, идущих мимо событий ORM."""
+    seq = next_change_seq(session, user_id)
+    record_change(session, user_id, seq, entity)
+    return seq
+
+
+def record_change(session: Session, user_id: int, seq: int, entity: str):
+    # Изменения транзакции; после коммита их рассылает services/events.py
+    changes = session.info.setdefault("sync_changes", {})
+    last_seq, entities = changes.get(user_id, (0, set()))
+    entities.add(entity)
+    changes[user_id] = (max(last_seq, seq), entities)
+
+
+def add_tombstones(session: Session, entity: str, user_id: int, ids: Iterable[int], seq: int):
+    rows = [
+        {"entity": entity, "entity_id": entity_id, "user_id": user_id,
+         "change_seq": seq, "deleted_at": datetime.utcnow()}
+        for entity_id in ids
+    ]
+    if rows:
+        session.connection().execute(insert(Tombstone), rows)
+
+
+@event.listens_for(Session, "before_flush")
+def _track_changes(session, flush_context, instances):
+    # Все изменения пользователя в одном flush получают общий номер
+    seqs = {}
+
+    new_users = {obj.id: obj for obj in session.new if isinstance(obj, User)}
+
+    def seq_for(user_id):
+        if user_id not in seqs:
+            if user_id in new_users:
+                # Пользователь создаётся в этом же flush - строки для UPDATE ещё нет
+                new_users[user_id].change_seq = (new_users[user_id].change_seq or 0) + 1
+                seqs[user_id] = new_users[user_id].change_seq
+            else:
+                seqs[user_id] = next_change_seq(session, user_id)
+        return seqs[user_id]
+
+    for obj in session.new:
+        if isinstance(obj, SyncMixin) and obj.user_id is not None:
+            obj.change_seq = seq_for(obj.user_id)
+            record_change(session, obj.user_id, obj.change_seq, obj.__tablename__)
+    for obj in session.dirty:
+        if isinstance(obj, SyncMixin) and session.is_modified(obj, include_collections=False):
+            obj.change_seq = seq_for(obj.user_id)
+            record_change(session, obj.user_id, obj.change_seq, obj.__tablename__)
+    for obj in session.deleted:
+        if isinstance(obj, SyncMixin):
+            seq = seq_for(obj.user_id)
+            # Номер удаления нужен after_delete (счётчики занятий в models/lesson.py)
+            obj.change_seq = seq
+            add_tombstones(session, obj.__tablename__, obj.user_id, [obj.id], seq)
+            record_change(session, obj.user_id, seq, obj.__tablename__)
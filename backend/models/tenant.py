@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from datetime import datetime
+from database import Base
+
+class TenantShard(Base):
+    """Каталог шардов: файл базы пользователя (при SHARDING_ENABLED).
+
+    Таблица живёт только в основной базе вместе с users и jobs.
+    """
+    __tablename__ = "tenant_shards"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    path = Column(String, nullable=False, unique=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -11,6 +11,8 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
+    # Счётчик изменений для дельта-синхронизации (models/sync.py)
+    change_seq = Column(Integer, nullable=False, default=0)
 
     # Связи
     students = relationship("Student", back_populates="user")
@@ -19,6 +21,7 @@ class User(Base):
     expenses = relationship("Expense", back_populates="user")
     incomes = relationship("Income", back_populates="user")
     rent_settings = relationship("RentSettings", back_populates="user")
+    jobs = relationship("Job", back_populates="user")
 
     def verify_password(self, plain_password: str) -> bool:
         return pwd_context.verify(plain_password, self.hashed_password) 
\ No newline at end of file
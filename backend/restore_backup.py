@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Восстановление базы из непрерывной резервной копии (BACKUP_ENABLED).
+
+Берёт последнее поколение со снимком не позже указанного времени,
+распаковывает снимок и применяет сегменты WAL, скопированные до этого
+времени. Точность - BACKUP_INTERVAL_SECONDS: сегмент попадает в копию
+не сразу после фиксации транзакции, а при следующем опросе WAL.
+
+Восстановленный файл пишется рядом, рабочая база не трогается: сервер
+нужно остановить и заменить файл (вместе с -wal и -shm) вручную.
+
+Запуск:
+    python restore_backup.py list
+    python restore_backup.py restore vocal_schedule restored.db [--time "2024-05-01 18:30"]
+Время без часового пояса считается местным.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+from config import settings
+from services.backup import backup_names, list_generations, restore
+
+
+def format_ms(value: int) -> str:
+    return datetime.fromtimestamp(value / 1000).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def parse_time(value: str) -> int:
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.astimezone()
+    return int(moment.timestamp() * 1000)
+
+
+def show_backups():
+    names = backup_names()
+    if not names:
+        print(f"В {settings.BACKUP_DIR} нет резервных копий")
+    for name in names:
+        print(name)
+        for generation in list_generations(name):
+            last = max((segment[2] for segment in generation.segments), default=generation.snapshot_at)
+            size = sum(os.path.getsize(segment[3]) for segment in generation.segments)
+            print(
+                f"  {generation.name}: снимок {format_ms(generation.snapshot_at)}, "
+                f"сегментов WAL {len(generation.segments)} ({size // 1024} КБ), "
+                f"восстановление до {format_ms(last)}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Резервные копии базы")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="поколения и доступный диапазон времени")
+    restore_parser = commands.add_parser("restore", help="восстановить базу в файл")
+    restore_parser.add_argument("name", help="имя базы из list, например vocal_schedule")
+    restore_parser.add_argument("output", help="файл восстановленной базы")
+    restore_parser.add_argument("--time", help="момент восстановления (ISO), по умолчанию последний")
+    restore_parser.add_argument("--force", action="store_true", help="перезаписать output")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        show_backups()
+        return
+
+    if os.path.exists(args.output) and not args.force:
+        sys.exit(f"{args.output} уже существует (--force для перезаписи)")
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(args.output + suffix):
+            os.remove(args.output + suffix)
+    try:
+        generation, restored_at = restore(args.name, args.output, parse_time(args.time) if args.time else None)
+    except ValueError as e:
+        sys.exit(str(e))
+
+    connection = sqlite3.connect(args.output)
+    try:
+        integrity = connection.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        connection.close()
+    print(f"Поколение {generation.name}, состояние на {format_ms(restored_at)}: {args.output}")
+    print(f"Проверка целостности: {integrity}")
+    if integrity != "ok":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,36 @@
 from .user import User, UserCreate, UserUpdate
-from .lesson import LessonCreate, LessonUpdate, LessonResponse
+from .lesson import LessonCreate, LessonUpdate, LessonResponse, LessonFilter, LessonBatchChanges, LessonBatchUpdate, LessonBatchDelete, FreeSlot
 from .student import StudentCreate, StudentUpdate, StudentResponse
 from .subscription import SubscriptionCreate, SubscriptionUpdate, SubscriptionResponse
-from .expense import ExpenseCreate, ExpenseUpdate, ExpenseResponse
-from .income import IncomeCreate, IncomeUpdate, IncomeResponse
+from .expense import ExpenseCreate, ExpenseUpdate, ExpenseResponse, ExpenseFilter, ExpenseBatchChanges, ExpenseBatchUpdate, ExpenseBatchDelete
+from .income import IncomeCreate, IncomeUpdate, IncomeResponse, IncomeFilter, IncomeBatchChanges, IncomeBatchUpdate, IncomeBatchDelete
 from .rent_settings import RentSettingsCreate, RentSettingsResponse
 from .finance import FinanceSummary
+from .batch import BatchItemResult, BatchResult
+from .job import JobCreate, JobResponse
+from .sync import SyncResponse
+from .views import FinanceView, CalendarView
+from .profiler import ProfileEntry, ProfileToken
+from .maintenance import DatabaseFileStats, MaintenanceStatus
 from .token import Token, TokenData
 
 __all__ = [
     "User", "UserCreate", "UserUpdate",
     "LessonCreate", "LessonUpdate", "LessonResponse",
+    "LessonFilter", "LessonBatchChanges", "LessonBatchUpdate", "LessonBatchDelete", "FreeSlot",
     "StudentCreate", "StudentUpdate", "StudentResponse",
     "SubscriptionCreate", "SubscriptionUpdate", "SubscriptionResponse",
     "ExpenseCreate", "ExpenseUpdate", "ExpenseResponse",
+    "ExpenseFilter", "ExpenseBatchChanges", "ExpenseBatchUpdate", "ExpenseBatchDelete",
     "IncomeCreate", "IncomeUpdate", "IncomeResponse",
+    "IncomeFilter", "IncomeBatchChanges", "IncomeBatchUpdate", "IncomeBatchDelete",
     "RentSettingsCreate", "RentSettingsResponse",
     "FinanceSummary",
+    "BatchItemResult", "BatchResult",
+    "JobCreate", "JobResponse",
+    "SyncResponse",
+    "FinanceView", "CalendarView",
+    "ProfileEntry", "ProfileToken",
+    "DatabaseFileStats", "MaintenanceStatus",
     "Token", "TokenData"
 ] 
\ No newline at end of file
@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+from typing import List
+
+class BatchItemResult(BaseModel):
+    id: int
+    status: str  # updated | deleted | not_found
+
+class BatchResult(BaseModel):
+    matched: int
+    results: List[BatchItemResult]
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class ExpenseBase(BaseModel):
     date: datetime
@@ -22,4 +22,25 @@ class ExpenseResponse(ExpenseBase):
     user_id: int
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class ExpenseFilter(BaseModel):
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    category: Optional[str] = None
+
+class ExpenseBatchChanges(BaseModel):
+    # null в NOT NULL столбцах - 422, а не ошибка базы; description можно очистить
+    date: datetime = None
+    amount: int = None
+    category: str = None
+    description: Optional[str] = None
+
+class ExpenseBatchUpdate(BaseModel):
+    ids: Optional[List[int]] = None
+    filter: Optional[ExpenseFilter] = None
+    changes: ExpenseBatchChanges
+
+class ExpenseBatchDelete(BaseModel):
+    ids: Optional[List[int]] = None
+    filter: Optional[ExpenseFilter] = None
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class IncomeBase(BaseModel):
     date: datetime
@@ -22,4 +22,25 @@ class IncomeResponse(IncomeBase):
     user_id: int
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class IncomeFilter(BaseModel):
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    category: Optional[str] = None
+
+class IncomeBatchChanges(BaseModel):
+    # null в NOT NULL столбцах - 422, а не ошибка базы; description можно очистить
+    date: datetime = None
+    amount: int = None
+    category: str = None
+    description: Optional[str] = None
+
+class IncomeBatchUpdate(BaseModel):
+    ids: Optional[List[int]] = None
+    filter: Optional[IncomeFilter] = None
+    changes: IncomeBatchChanges
+
+class IncomeBatchDelete(BaseModel):
+    ids: Optional[List[int]] = None
+    filter: Optional[IncomeFilter] = None
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class LessonBase(BaseModel):
     date: datetime
@@ -26,4 +26,33 @@ class LessonResponse(LessonBase):
     user_id: int
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class LessonFilter(BaseModel):
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    student_id: Optional[int] = None
+    is_completed: Optional[bool] = None
+    is_cancelled: Optional[bool] = None
+
+class LessonBatchChanges(BaseModel):
+    # null в NOT NULL столбцах - 422, а не ошибка базы; notes можно очистить
+    date: datetime = None
+    duration: int = None
+    notes: Optional[str] = None
+    is_completed: bool = None
+    is_cancelled: bool = None
+    student_id: int = None
+
+class LessonBatchUpdate(BaseModel):
+    ids: Optional[List[int]] = None
+    filter: Optional[LessonFilter] = None
+    changes: LessonBatchChanges
+
+class LessonBatchDelete(BaseModel):
+    ids: Optional[List[int]] = None
+    filter: Optional[LessonFilter] = None
+
+class FreeSlot(BaseModel):
+    start: datetime
+    end: datetime
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+class DatabaseFileStats(BaseModel):
+    path: str
+    size_bytes: int
+    wal_bytes: int
+    page_size: int
+    page_count: int
+    freelist_count: int
+    free_bytes: int
+    fragmentation: float
+    auto_vacuum: str
+    journal_mode: str
+    has_statistics: bool
+
+class MaintenanceStatus(BaseModel):
+    enabled: bool
+    next_run: Optional[datetime] = None
+    databases: List[DatabaseFileStats]
+    # Отчёт последнего запуска: шаги и метрики до/после по каждому файлу
+    last_run: Optional[Dict[str, Any]] = None
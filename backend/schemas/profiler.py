@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from datetime import datetime
+
+class ProfileEntry(BaseModel):
+    name: str
+    method: str
+    route: str
+    path: str
+    status_code: int
+    duration_ms: float
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ProfileToken(BaseModel):
+    header: str
+    token: str
+    expires_in_minutes: int
@@ -21,6 +21,11 @@ class StudentUpdate(BaseModel):
 class StudentResponse(StudentBase):
     id: int
     user_id: int
+    # Ведутся при записи занятий, без COUNT на каждого ученика
+    lessons_total: int = 0
+    lessons_scheduled: int = 0
+    lessons_completed: int = 0
+    lessons_cancelled: int = 0
 
     class Config:
         from_attributes = True 
\ No newline at end of file
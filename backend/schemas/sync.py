@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import Dict, List
+
+from .student import StudentResponse
+from .lesson import LessonResponse
+from .subscription import SubscriptionResponse
+from .expense import ExpenseResponse
+from .income import IncomeResponse
+
+class SyncResponse(BaseModel):
+    # Передаётся в следующий запрос как since
+    seq: int
+    # True - это полная выгрузка, локальные данные клиента нужно заменить
+    full: bool
+    students: List[StudentResponse] = []
+    lessons: List[LessonResponse] = []
+    subscriptions: List[SubscriptionResponse] = []
+    expenses: List[ExpenseResponse] = []
+    incomes: List[IncomeResponse] = []
+    # Имя таблицы -> id удалённых строк
+    deleted: Dict[str, List[int]] = {}
@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import List
+
+from .student import StudentResponse
+from .lesson import LessonResponse
+from .subscription import SubscriptionResponse
+from .expense import ExpenseResponse
+from .income import IncomeResponse
+
+class FinanceView(BaseModel):
+    # Номер изменения, на котором собраны данные - since для /sync
+    version: int
+    expenses: List[ExpenseResponse]
+    incomes: List[IncomeResponse]
+    subscriptions: List[SubscriptionResponse]
+    students: List[StudentResponse]
+
+class CalendarView(BaseModel):
+    version: int
+    students: List[StudentResponse]
+    lessons: List[LessonResponse]
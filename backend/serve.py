@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Production-запуск API.
+
+Приложение импортируется один раз в мастер-процессе, после чего воркеры
+создаются через fork и разделяют загруженный код copy-on-write. Мастер
+следит за воркерами, перезапускает упавшие и по SIGTERM даёт им дообработать
+текущие запросы (graceful drain).
+
+Запуск: python serve.py
+"""
+import gc
+import importlib.util
+import logging
+import os
+import signal
+import sys
+import time
+
+import uvicorn
+
+from config import settings
+
+logger = logging.getLogger("serve")
+
+
+def detect_workers() -> int:
+    if settings.WORKERS > 0:
+        return settings.WORKERS
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # sched_getaffinity есть не на всех платформах (Windows, macOS)
+        cpus = os.cpu_count() or 1
+    return max(1, min(cpus, settings.MAX_WORKERS))
+
+
+def pick_loop() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def pick_http() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def server_options() -> dict:
+    return {
+        "host": settings.HOST,
+        "port": settings.PORT,
+        "loop": pick_loop(),
+        "http": pick_http(),
+        "timeout_keep_alive": settings.KEEP_ALIVE,
+        "backlog": settings.BACKLOG,
+        "limit_concurrency": settings.LIMIT_CONCURRENCY or None,
+        "timeout_graceful_shutdown": settings.GRACEFUL_TIMEOUT,
+        "access_log": settings.ACCESS_LOG,
+        # Логирование настраивает main.py (services/log_pipeline.py), записи uvicorn идут туда же
+        "log_config": None,
+        "proxy_headers": True,
+    }
+
+
+class Arbiter:
+    """Мастер-процесс pre-fork модели: держит сокет и управляет воркерами."""
+
+    def __init__(self, config: uvicorn.Config, workers: int):
+        self.config = config
+        self.workers = workers
+        self.children = {}
+        self.should_exit = False
+        self.sock = None
+
+    def handle_exit(self, sig, frame):
+        self.should_exit = True
+
+    def spawn(self):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+        # Дочерний процесс: обработчики сигналов установит uvicorn.Server
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            uvicorn.Server(self.config).run(sockets=[self.sock])
+        except Exception:
+            logger.exception("Воркер %s завершился с ошибкой", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+
+    def reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            if self.children.pop(pid, None) is not None and not self.should_exit:
+                logger.warning("Воркер %s остановлен (status=%s), перезапускаем", pid, status)
+
+    def run(self):
+        self.sock = self.config.bind_socket()
+        signal.signal(signal.SIGTERM, self.handle_exit)
+        signal.signal(signal.SIGINT, self.handle_exit)
+
+        # Всё, что загружено до fork, переносим в постоянное поколение GC,
+        # чтобы сборщик мусора в воркерах не трогал эти страницы памяти
+        gc.freeze()
+        for _ in range(self.workers):
+            self.spawn()
+        logger.info("Запущено воркеров: %s (pid мастера %s)", self.workers, os.getpid())
+
+        while not self.should_exit:
+            self.reap()
+            while len(self.children) < self.workers and not self.should_exit:
+                self.spawn()
+            time.sleep(0.5)
+
+        self.stop()
+
+    def stop(self):
+        logger.info("Останавливаем воркеры, ожидаем завершения запросов")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+
+        deadline = time.monotonic() + settings.GRACEFUL_TIMEOUT + 5
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+
+        for pid in list(self.children):
+            logger.warning("Воркер %s не завершился вовремя, SIGKILL", pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.reap()
+        self.sock.close()
+
+
+def main():
+    workers = detect_workers()
+    options = server_options()
+
+    if workers == 1 or not hasattr(os, "fork"):
+        # Windows не поддерживает fork: воркеры запускаются через spawn и
+        # импортируют приложение каждый самостоятельно
+        uvicorn.run("main:app", workers=workers, **options)
+        return
+
+    from main import app
+
+    config = uvicorn.Config(app, workers=workers, **options)
+    Arbiter(config, workers).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Архив старых занятий, расходов и доходов.
+
+Строки старше ARCHIVE_HORIZON_DAYS переносятся задачей archive в отдельную
+SQLite-базу ARCHIVE_DATABASE_PATH, которая подключается к каждому
+соединению через ATTACH DATABASE ... AS archive. Для каждой таблицы
+создаётся временное представление <таблица>_all = основная UNION ALL архив.
+Запросы с диапазоном дат, начинающимся раньше горизонта, читают
+представление (archive_source), остальные - только "горячие" таблицы.
+
+Запуск вручную: python -m services.archive
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import Column, Index, MetaData, Table
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import aliased
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from config import settings
+from database import Base, SessionLocal, engine, is_memory_sqlite
+from services.jobs import job_type
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SCHEMA = "archive"
+# Таблица -> колонки индексов архива (те же запросы, что и к основным таблицам)
+ARCHIVED_TABLES = {
+    "lessons": [("user_id", "date")],
+    "expenses": [("user_id", "date"), ("user_id", "category", "date")],
+    "incomes": [("user_id", "date"), ("user_id", "category", "date")],
+}
+
+_views_metadata = MetaData()
+# Одна сущность на модель: заранее построенные запросы (api/statements.py) кэшируются по ней
+_archive_entities = {}
+
+
+def archive_enabled() -> bool:
+    # Один архив на все шарды смешал бы id разных баз - с шардированием архив выключен
+    return settings.ARCHIVE_ENABLED and not settings.SHARDING_ENABLED and not is_memory_sqlite(engine.url)
+
+
+def archive_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(days=settings.ARCHIVE_HORIZON_DAYS)
+
+
+def _plain_columns(table: Table):
+    # Без внешних ключей: users/students в архивной базе нет
+    return [Column(column.name, column.type, primary_key=column.primary_key) for column in table.columns]
+
+
+def _archive_ddl(name: str):
+    table = Table(name, MetaData(), *_plain_columns(Base.metadata.tables[name]), schema=ARCHIVE_SCHEMA)
+    statements = [CreateTable(table, if_not_exists=True)]
+    for columns in ARCHIVED_TABLES[name]:
+        index = Index(f"ix_{name}_{'_'.join(columns)}", *(table.c[column] for column in columns))
+        statements.append(CreateIndex(index, if_not_exists=True))
+    return [str(statement.compile(dialect=sqlite.dialect())) for statement in statements]
+
+
+def attach_archive(dbapi_connection):
+    """Подключает архив к новому соединению SQLite (вызывается из database.py)."""
+    import models  # noqa: F401 - таблицы должны быть в Base.metadata
+
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (settings.ARCHIVE_DATABASE_PATH,))
+        for name in ARCHIVED_TABLES:
+            for statement in _archive_ddl(name):
+                cursor.execute(statement)
+            # Колонки, добавленные миграциями после создания архива
+            archived = {row[1] for row in cursor.execute(f"PRAGMA {ARCHIVE_SCHEMA}.table_info({name})")}
+            for column in Base.metadata.tables[name].columns:
+                if column.name not in archived:
+                    column_type = column.type.compile(dialect=sqlite.dialect())
+                    cursor.execute(f"ALTER TABLE {ARCHIVE_SCHEMA}.{name} ADD COLUMN {column.name} {column_type}")
+
+            columns = ", ".join(column.name for column in Base.metadata.tables[name].columns)
+            # Строка, уже скопированная в архив, но ещё не удалённая из основной
+            # таблицы (сбой посреди переноса), не должна появиться дважды
+            cursor.execute(
+                f"CREATE TEMP VIEW IF NOT EXISTS {name}_all AS "
+                f"SELECT {columns} FROM main.{name} "
+                f"UNION ALL SELECT {columns} FROM {ARCHIVE_SCHEMA}.{name} AS a "
+                f"WHERE NOT EXISTS (SELECT 1 FROM main.{name} AS m WHERE m.id = a.id)"
+            )
+    finally:
+        cursor.close()
+
+
+def _union_table(model) -> Table:
+    name = f"{model.__tablename__}_all"
+    if name not in _views_metadata.tables:
+        Table(name, _views_metadata, *_plain_columns(model.__table__))
+    return _views_metadata.tables[name]
+
+
+def archive_source(model, start_date: Optional[datetime]):
+    """Сущность для запроса с диапазоном от start_date.
+
+    Диапазон, начинающийся раньше горизонта, читается из <таблица>_all;
+    без start_date и для недавних дат - только основная таблица.
+    """
+    if start_date is None or not archive_enabled() or start_date >= archive_cutoff():
+        return model
+    if model not in _archive_entities:
+        _archive_entities[model] = aliased(model, _union_table(model), adapt_on_names=True)
+    return _archive_entities[model]
+
+
+def _check_autoincrement(connection, name: str):
+    sql = connection.exec_driver_sql(
+        "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).scalar()
+    if "AUTOINCREMENT" not in (sql or "").upper():
+        # Без AUTOINCREMENT SQLite выдаёт id удалённой строки заново, и он совпадёт с архивным
+        raise RuntimeError(f"Table {name} has no AUTOINCREMENT, run 'alembic upgrade head' before archiving")
+
+
+def archive_rows(cutoff: datetime, progress=None) -> dict:
+    """Переносит строки с date < cutoff в архив. Возвращает число строк по таблицам.
+
+    Каждая таблица переносится своей транзакцией. Строка, которую прерванный
+    запуск уже скопировал в архив без изменений, пропускается; другая строка
+    с тем же id в архиве - ошибка, архив ничем не перезаписывается.
+    """
+    # Формат, в котором SQLAlchemy хранит DateTime в SQLite
+    cutoff_value = cutoff.strftime("%Y-%m-%d %H:%M:%S.%f")
+    moved = {}
+    for step, name in enumerate(ARCHIVED_TABLES, start=1):
+        names = [column.name for column in Base.metadata.tables[name].columns]
+        columns = ", ".join(names)
+        same_row = " AND ".join(f"a.{column} IS m.{column}" for column in names)
+        session = SessionLocal()
+        try:
+            connection = session.connection()
+            _check_autoincrement(connection, name)
+            conflicts = connection.exec_driver_sql(
+                f"SELECT m.id FROM main.{name} AS m JOIN {ARCHIVE_SCHEMA}.{name} AS a ON a.id = m.id "
+                f"WHERE m.date < ? AND NOT ({same_row}) LIMIT 10",
+                (cutoff_value,),
+            ).scalars().all()
+            if conflicts:
+                raise RuntimeError(f"Archive table {name} already has different rows with ids {conflicts}")
+            connection.exec_driver_sql(
+                f"INSERT INTO {ARCHIVE_SCHEMA}.{name} ({columns}) "
+                f"SELECT {columns} FROM main.{name} AS m WHERE m.date < ? "
+                f"AND NOT EXISTS (SELECT 1 FROM {ARCHIVE_SCHEMA}.{name} AS a WHERE a.id = m.id)",
+                (cutoff_value,),
+            )
+            result = connection.exec_driver_sql(f"DELETE FROM main.{name} WHERE date < ?", (cutoff_value,))
+            session.commit()
+            moved[name] = result.rowcount
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        if progress is not None:
+            progress(step / len(ARCHIVED_TABLES))
+    return moved
+
+
+@job_type("archive", limit=1, admin_only=True)
+def archive_job(ctx, params):
+    if not archive_enabled():
+        raise RuntimeError("Archive is disabled (ARCHIVE_ENABLED) or the database is not a SQLite file")
+    moved = archive_rows(archive_cutoff(), progress=ctx.progress)
+    logger.info("Перенесено в архив: %s", moved)
+    return None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if not archive_enabled():
+        raise SystemExit("Архив выключен: задайте ARCHIVE_ENABLED=True для файловой SQLite")
+    print(archive_rows(archive_cutoff()))
@@ -0,0 +1,444 @@
+"""Непрерывное резервное копирование SQLite передачей WAL (BACKUP_ENABLED).
+
+Для каждого файла базы (основная, архив, шарды) в BACKUP_DIR/<имя>/
+хранятся поколения: снимок базы и следующие за ним сегменты WAL.
+
+  <поколение>/generation.json       время снимка
+  <поколение>/snapshot.db.gz        копия базы (backup API)
+  <поколение>/wal/<индекс>-<смещение>-<мс>.wal.gz
+
+Раз в BACKUP_INTERVAL_SECONDS новые кадры WAL, завершённые фиксацией
+транзакции, копируются в сегмент - объём копирования пропорционален
+изменениям, а не размеру базы. Кадры проверяются по salt и контрольным
+суммам заголовков, как это делает сам SQLite при восстановлении.
+
+Checkpoint делает только репликатор (database.py отключает
+wal_autocheckpoint): под блокировкой записи он докопирует WAL и
+выполняет PASSIVE checkpoint. После него писатель начинает WAL заново с
+новым salt - это новый индекс того же поколения. Если WAL начался
+заново без нашего checkpoint (его сделал другой процесс или база
+закрывалась последним соединением), часть кадров могла не попасть в
+копию - тогда начинается новое поколение со свежим снимком. Новое
+поколение начинается и раз в BACKUP_SNAPSHOT_HOURS; поколения старше
+BACKUP_RETENTION_HOURS удаляются.
+
+Восстановление на момент времени - restore_backup.py.
+"""
+import gzip
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from services.maintenance import database_files
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: serve.py не форкает воркеры, блокировка между процессами не нужна
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+WAL_HEADER_SIZE = 32
+FRAME_HEADER_SIZE = 24
+WAL_MAGIC = (0x377F0682, 0x377F0683)
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def wal_checksum(data: bytes, s1: int, s2: int, big_endian: bool) -> Tuple[int, int]:
+    """Контрольная сумма WAL SQLite (продолжается от s1, s2)."""
+    words = struct.unpack(f"{'>' if big_endian else '<'}{len(data) // 4}I", data)
+    for first, second in zip(words[0::2], words[1::2]):
+        s1 = (s1 + first + s2) & 0xFFFFFFFF
+        s2 = (s2 + second + s1) & 0xFFFFFFFF
+    return s1, s2
+
+
+@dataclass
+class WalHeader:
+    raw: bytes
+    page_size: int
+    salt: str
+    checksum: Tuple[int, int]
+    big_endian: bool
+
+
+def read_wal_header(path: str) -> Optional[WalHeader]:
+    try:
+        with open(path + "-wal", "rb") as f:
+            raw = f.read(WAL_HEADER_SIZE)
+    except FileNotFoundError:
+        return None
+    if len(raw) < WAL_HEADER_SIZE:
+        return None
+    magic, _, page_size = struct.unpack(">III", raw[:12])
+    if magic not in WAL_MAGIC:
+        return None
+    big_endian = bool(magic & 1)
+    checksum = struct.unpack(">II", raw[24:32])
+    # Заголовок, который ещё дописывается, не проходит проверку
+    if wal_checksum(raw[:24], 0, 0, big_endian) != checksum:
+        return None
+    return WalHeader(raw, page_size, raw[16:24].hex(), checksum, big_endian)
+
+
+def committed_frames(path: str, header: WalHeader, offset: int, checksum: Tuple[int, int]):
+    """Кадры WAL от offset до последнего кадра с фиксацией транзакции.
+
+    Возвращает (байты кадров, новое смещение, контрольная сумма на нём).
+    """
+    frame_size = FRAME_HEADER_SIZE + header.page_size
+    salt = bytes.fromhex(header.salt)
+    data = bytearray()
+    committed, committed_checksum = 0, checksum
+    with open(path + "-wal", "rb") as f:
+        f.seek(max(offset, WAL_HEADER_SIZE))
+        while True:
+            frame = f.read(frame_size)
+            # Неполный кадр, кадр прошлого WAL (другой salt) или недописанный кадр
+            if len(frame) < frame_size or frame[8:16] != salt:
+                break
+            checksum = wal_checksum(frame[:8], *checksum, header.big_endian)
+            checksum = wal_checksum(frame[FRAME_HEADER_SIZE:], *checksum, header.big_endian)
+            if checksum != struct.unpack(">II", frame[16:24]):
+                break
+            data += frame
+            # Ненулевой размер базы в заголовке - последний кадр транзакции
+            if struct.unpack(">I", frame[4:8])[0]:
+                committed, committed_checksum = len(data), checksum
+    return bytes(data[:committed]), max(offset, WAL_HEADER_SIZE) + committed, committed_checksum
+
+
+def _write_atomic(path: str, data: bytes):
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+class DatabaseReplica:
+    """Репликация одного файла SQLite в BACKUP_DIR/<имя>."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.root = os.path.join(settings.BACKUP_DIR, self.name)
+        self.position: Optional[dict] = self._load_position()
+        # Пока соединение открыто, закрытие другого не будет последним и
+        # не сделает checkpoint с удалением WAL мимо репликатора
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=settings.DB_MAINTENANCE_BUSY_TIMEOUT, isolation_level=None)
+        conn.execute("PRAGMA wal_autocheckpoint=0")
+        return conn
+
+    def _load_position(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.root, "position.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_position(self):
+        _write_atomic(os.path.join(self.root, "position.json"), json.dumps(self.position).encode())
+
+    def generation_dir(self, generation: str) -> str:
+        return os.path.join(self.root, generation)
+
+    @contextmanager
+    def _writes_locked(self):
+        """Блокировка записи: пока она взята, WAL не растёт."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        finally:
+            self._conn.execute("ROLLBACK")
+
+    def sync(self):
+        if self._conn is None:
+            self._conn = self._connect()
+        position = self.position
+        if position is None or not os.path.isdir(self.generation_dir(position["generation"])):
+            self.start_generation("new")
+            return
+        if not self._advance(read_wal_header(self.path)):
+            self.start_generation("wal restarted")
+            return
+        frame_size = FRAME_HEADER_SIZE + (position["page_size"] or 0)
+        wal_full = position["offset"] >= WAL_HEADER_SIZE + settings.BACKUP_CHECKPOINT_PAGES * frame_size
+        if position["page_size"] and wal_full and not position["expect_restart"]:
+            self.checkpoint()
+        if _now_ms() - position["snapshot_at"] >= settings.BACKUP_SNAPSHOT_HOURS * 3600 * 1000:
+            self.start_generation("scheduled")
+
+    def _advance(self, header: Optional[WalHeader]) -> bool:
+        """Копирует новые кадры; False - WAL начался заново без нашего checkpoint."""
+        position = self.position
+        if header is None:
+            # WAL пуст или удалён: ждём первую запись
+            return True
+        if header.salt != position["salt"]:
+            if not position["expect_restart"]:
+                return False
+            position.update(
+                index=position["index"] + 1, offset=0, salt=header.salt,
+                checksum=list(header.checksum), page_size=header.page_size, expect_restart=False,
+            )
+        data, offset, checksum = committed_frames(self.path, header, position["offset"], tuple(position["checksum"]))
+        if not data:
+            return True
+        if position["offset"] == 0:
+            # Первый сегмент индекса начинается с заголовка WAL: по нему SQLite проверяет кадры
+            data = header.raw + data
+        name = f"{position['index']:06d}-{position['offset']:012d}-{_now_ms():013d}.wal.gz"
+        _write_atomic(
+            os.path.join(self.generation_dir(position["generation"]), "wal", name), gzip.compress(data)
+        )
+        # Кадры после нашего checkpoint - WAL продолжается, новый его начало уже не ожидается
+        position.update(offset=offset, checksum=list(checksum), expect_restart=False)
+        self._save_position()
+        return True
+
+    def checkpoint(self):
+        with self._writes_locked():
+            if not self._advance(read_wal_header(self.path)):
+                return
+            checkpointer = self._connect()
+            try:
+                busy, wal_frames, checkpointed = checkpointer.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+            finally:
+                checkpointer.close()
+            # Весь WAL перенесён в базу - следующая запись начнёт WAL заново
+            if not busy and wal_frames == checkpointed:
+                self.position["expect_restart"] = True
+                self._save_position()
+
+    def start_generation(self, reason: str):
+        with self._writes_locked():
+            header = read_wal_header(self.path)
+            if self.position is not None and os.path.isdir(self.generation_dir(self.position["generation"])):
+                # Хвост старого поколения, если WAL тот же
+                if header is not None and header.salt == self.position["salt"]:
+                    self._advance(header)
+
+            snapshot_at = _now_ms()
+            generation = datetime.fromtimestamp(snapshot_at / 1000, timezone.utc).strftime("%Y%m%dT%H%M%S%f")[:-3] + "Z"
+            directory = self.generation_dir(generation)
+            os.makedirs(os.path.join(directory, "wal"), exist_ok=True)
+            self._snapshot(os.path.join(directory, "snapshot.db.gz"))
+            _write_atomic(os.path.join(directory, "generation.json"), json.dumps({"snapshot_at": snapshot_at}).encode())
+
+            # Снимок содержит весь текущий WAL, поэтому первым сегментом идёт
+            # WAL целиком: его кадры с этим снимком согласованы
+            self.position = {
+                "generation": generation,
+                "snapshot_at": snapshot_at,
+                "index": 0,
+                "offset": 0,
+                "salt": header.salt if header else None,
+                "checksum": list(header.checksum) if header else [0, 0],
+                "page_size": header.page_size if header else None,
+                # WAL ещё нет: его появление - начало первого индекса
+                "expect_restart": header is None,
+            }
+            if header is not None:
+                self._advance(header)
+            self._save_position()
+        logger.info("Резервная копия %s: новое поколение %s (%s)", self.name, generation, reason)
+        self.prune()
+
+    def _snapshot(self, target: str):
+        temporary = target + ".db"
+        source = self._connect()
+        destination = sqlite3.connect(temporary)
+        try:
+            source.backup(destination)
+        finally:
+            destination.close()
+            source.close()
+        with open(temporary, "rb") as raw, gzip.open(target + ".tmp", "wb") as packed:
+            shutil.copyfileobj(raw, packed)
+        os.replace(target + ".tmp", target)
+        os.remove(temporary)
+
+    def prune(self):
+        generations = list_generations(self.name)
+        horizon = _now_ms() - settings.BACKUP_RETENTION_HOURS * 3600 * 1000
+        # Поколение нужно, пока следующий снимок моложе горизонта
+        for current, following in zip(generations, generations[1:]):
+            if following.snapshot_at < horizon:
+                shutil.rmtree(current.directory, ignore_errors=True)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class BackupReplicator:
+    """Фоновый поток репликации. В serve.py реплицирует один воркер."""
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._replicas: Dict[str, DatabaseReplica] = {}
+        self._lock_file = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(settings.BACKUP_DIR, exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="backup", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=settings.DB_MAINTENANCE_BUSY_TIMEOUT)
+        self._thread = None
+
+    def _acquire(self) -> bool:
+        if self._lock_file is not None:
+            return True
+        lock_file = open(os.path.join(settings.BACKUP_DIR, "replicator.lock"), "w")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+        self._lock_file = lock_file
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Блокировку держит один воркер; если он завершится, её возьмёт другой
+            if self._acquire():
+                self.sync_all()
+            self._stop.wait(settings.BACKUP_INTERVAL_SECONDS)
+        if self._lock_file is not None:
+            self.sync_all()
+            for replica in self._replicas.values():
+                replica.close()
+            self._replicas.clear()
+            self._lock_file.close()
+            self._lock_file = None
+
+    def sync_all(self):
+        for path in database_files():
+            replica = self._replicas.get(path)
+            if replica is None:
+                replica = self._replicas[path] = DatabaseReplica(path)
+            try:
+                replica.sync()
+            except (OSError, sqlite3.Error):
+                logger.exception("Резервное копирование %s завершилось с ошибкой", path)
+
+
+replicator = BackupReplicator()
+
+
+@dataclass
+class Generation:
+    name: str
+    directory: str
+    snapshot_at: int
+    segments: List[Tuple[int, int, int, str]]  # (индекс, смещение, мс, путь)
+
+
+def list_generations(name: str) -> List[Generation]:
+    root = os.path.join(settings.BACKUP_DIR, name)
+    generations = []
+    if not os.path.isdir(root):
+        return generations
+    for entry in sorted(os.listdir(root)):
+        directory = os.path.join(root, entry)
+        try:
+            with open(os.path.join(directory, "generation.json"), encoding="utf-8") as f:
+                snapshot_at = json.load(f)["snapshot_at"]
+        except (OSError, ValueError, KeyError):
+            continue
+        segments = []
+        wal_dir = os.path.join(directory, "wal")
+        for segment in sorted(os.listdir(wal_dir)):
+            if segment.endswith(".wal.gz"):
+                index, offset, created = segment[:-len(".wal.gz")].split("-")
+                segments.append((int(index), int(offset), int(created), os.path.join(wal_dir, segment)))
+        generations.append(Generation(entry, directory, snapshot_at, segments))
+    return generations
+
+
+def backup_names() -> List[str]:
+    if not os.path.isdir(settings.BACKUP_DIR):
+        return []
+    return sorted(
+        entry for entry in os.listdir(settings.BACKUP_DIR)
+        if os.path.isdir(os.path.join(settings.BACKUP_DIR, entry))
+    )
+
+
+def restore(name: str, output: str, target_ms: Optional[int] = None) -> Tuple[Generation, int]:
+    """Восстанавливает базу name в файл output на момент target_ms (None - последний).
+
+    Возвращает поколение и время последнего применённого сегмента.
+    """
+    target_ms = target_ms if target_ms is not None else _now_ms()
+    candidates = [generation for generation in list_generations(name) if generation.snapshot_at <= target_ms]
+    if not candidates:
+        raise ValueError(f"No backup of {name} at or before the requested time")
+    generation = candidates[-1]
+
+    with gzip.open(os.path.join(generation.directory, "snapshot.db.gz"), "rb") as packed, open(output, "wb") as raw:
+        shutil.copyfileobj(packed, raw)
+    restored_at = generation.snapshot_at
+
+    indexes: Dict[int, List[Tuple[int, int, str]]] = {}
+    for index, offset, created, path in generation.segments:
+        indexes.setdefault(index, []).append((offset, created, path))
+    for index in sorted(indexes):
+        wal = bytearray()
+        complete = True
+        for offset, created, path in indexes[index]:
+            if created > target_ms or offset != len(wal):
+                complete = False
+                break
+            with gzip.open(path, "rb") as f:
+                wal += f.read()
+            restored_at = created
+        if wal:
+            _apply_wal(output, bytes(wal))
+        # Следующий индекс опирается на весь предыдущий WAL
+        if not complete:
+            break
+    return generation, restored_at
+
+
+def _apply_wal(output: str, wal: bytes):
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(output + suffix):
+            os.remove(output + suffix)
+    with open(output + "-wal", "wb") as f:
+        f.write(wal)
+    # SQLite сам проверит кадры и перенесёт зафиксированные в базу
+    conn = sqlite3.connect(output, isolation_level=None)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    finally:
+        conn.close()
@@ -0,0 +1,110 @@
+import os
+import sqlite3
+
+from database import engine, Base, SessionLocal
+from services.jobs import job_type
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+# Таблицы, которые не переносятся при импорте
+LOCAL_TABLES = {"jobs"}
+
+
+def sqlite_path() -> str:
+    if engine.url.get_backend_name() != "sqlite" or not engine.url.database:
+        raise RuntimeError("Database export/import is only supported for SQLite files")
+    return engine.url.database
+
+
+def _backup(source_path: str, target_path: str):
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        # Копируем за один шаг: при пошаговом копировании любая запись в
+        # базу (в том числе прогресс задачи) перезапускает backup
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+@job_type("export_database", limit=1, admin_only=True)
+def export_database(ctx, params):
+    path = os.path.join(ctx.results_dir, "vocal_schedule_backup.db")
+    _backup(sqlite_path(), path)
+    return path
+
+
+@job_type("import_database", limit=1, admin_only=True)
+def import_database(ctx, params):
+    upload_path = params["upload_path"]
+    try:
+        with open(upload_path, "rb") as f:
+            if f.read(len(SQLITE_HEADER)) != SQLITE_HEADER:
+                raise ValueError("Файл должен быть SQLite базой данных (.db)")
+
+        incoming = sqlite3.connect(upload_path)
+        try:
+            if incoming.execute("PRAGMA integrity_check").fetchone()[0] != "ok":
+                raise ValueError("Файл базы данных повреждён")
+        finally:
+            incoming.close()
+        ctx.progress(0.2)
+
+        # Копия текущей базы остаётся результатом задачи - из неё можно откатиться
+        backup_path = os.path.join(ctx.results_dir, "vocal_schedule_before_import.db")
+        _backup(sqlite_path(), backup_path)
+        ctx.progress(0.5)
+        ctx.check_cancelled()
+
+        _replace_tables(sqlite_path(), upload_path)
+        # Счётчики в загруженной базе могут быть от старой версии или сбиты
+        from services.lesson_counters import repair_counters
+        session = SessionLocal()
+        try:
+            repair_counters(session)
+            session.commit()
+        finally:
+            session.close()
+        return backup_path
+    finally:
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+
+
+def _replace_tables(live_path: str, upload_path: str):
+    """Заменяет данные таблиц приложения одной транзакцией.
+
+    Таблица jobs остаётся локальной, иначе статус самой задачи импорта
+    пропал бы вместе со старой базой. Номера изменений (change_seq)
+    загруженной базы сдвигаются выше прежнего максимума: версия данных в
+    ключах кэша и курсоры /sync и /events не должны вернуться к уже
+    выданным значениям.
+    """
+    conn = sqlite3.connect(live_path)
+    try:
+        conn.execute("ATTACH DATABASE ? AS incoming", (upload_path,))
+        incoming_tables = {
+            row[0] for row in conn.execute("SELECT name FROM incoming.sqlite_master WHERE type = 'table'")
+        }
+        conn.execute("BEGIN IMMEDIATE")
+        seq_offset = conn.execute("SELECT COALESCE(MAX(change_seq), 0) + 1 FROM main.users").fetchone()[0]
+        for table in Base.metadata.sorted_tables:
+            if table.name in LOCAL_TABLES:
+                continue
+            conn.execute(f'DELETE FROM main."{table.name}"')
+            if table.name not in incoming_tables:
+                continue
+            main_columns = [row[1] for row in conn.execute(f'PRAGMA main.table_info("{table.name}")')]
+            incoming_columns = {row[1] for row in conn.execute(f'PRAGMA incoming.table_info("{table.name}")')}
+            columns = ", ".join(f'"{c}"' for c in main_columns if c in incoming_columns)
+            conn.execute(
+                f'INSERT INTO main."{table.name}" ({columns}) SELECT {columns} FROM incoming."{table.name}"'
+            )
+            if "change_seq" in table.c:
+                conn.execute(f'UPDATE main."{table.name}" SET change_seq = change_seq + ?', (seq_offset,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
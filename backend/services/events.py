@@ -0,0 +1,193 @@
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import ReadSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    def __init__(self, user_id: int, queue_size: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=queue_size)
+        # Выставляется, когда клиент не успевает читать и его отключили
+        self.dropped = asyncio.Event()
+
+
+class EventBroker:
+    """Pub/sub изменений внутри процесса.
+
+    У каждого подписчика своя ограниченная очередь. Если клиент не успевает
+    её разбирать, он отключается: после переподключения он догоняет
+    пропущенное через GET /sync. Коммиты своего процесса приходят сразу из
+    after_commit, коммиты других воркеров - через ChangePoller; событие с уже
+    отправленным seq второй раз не рассылается.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[Subscriber]] = {}
+        # Последний разосланный seq по пользователям с подписчиками
+        self._last_seq: Dict[int, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    def subscribe(self, user_id: int) -> Subscriber:
+        subscriber = Subscriber(user_id, self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self._subscribers.get(subscriber.user_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._subscribers[subscriber.user_id]
+            self._last_seq.pop(subscriber.user_id, None)
+
+    def subscribed_users(self) -> Dict[int, Optional[int]]:
+        """{user_id: последний разосланный seq или None} для пользователей с подписчиками."""
+        return {user_id: self._last_seq.get(user_id) for user_id in self._subscribers}
+
+    def remember_seq(self, user_id: int, seq: int):
+        if user_id in self._subscribers:
+            self._last_seq[user_id] = max(seq, self._last_seq.get(user_id, 0))
+
+    def publish(self, user_id: int, payload: dict):
+        """Рассылает событие подписчикам пользователя. Вызывается из цикла событий."""
+        if user_id not in self._subscribers or payload["seq"] <= self._last_seq.get(user_id, 0):
+            return
+        self._last_seq[user_id] = payload["seq"]
+        for subscriber in list(self._subscribers.get(user_id, ())):
+            try:
+                subscriber.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                logger.info("Подписчик пользователя %s не успевает читать события, отключаем", user_id)
+                self.unsubscribe(subscriber)
+                subscriber.dropped.set()
+
+    def publish_threadsafe(self, user_id: int, payload: dict):
+        # Коммиты происходят и в потоках (пул FastAPI, поток-писатель, задачи)
+        if self._loop is None or self._loop.is_closed() or user_id not in self._subscribers:
+            return
+        self._loop.call_soon_threadsafe(self.publish, user_id, payload)
+
+
+def _read_session(user_id: int) -> Session:
+    if settings.SHARDING_ENABLED:
+        # Счётчик change_seq ведётся в копии users в базе пользователя
+        from services.shards import ShardedSession
+        return ShardedSession(lambda: user_id, readonly=True)
+    return ReadSessionLocal()
+
+
+def _changed_entities(session: Session, user_id: int, since: int) -> List[str]:
+    from models import Expense, Income, Lesson, Student, Subscription
+    from models.sync import Tombstone
+
+    entities = {
+        model.__tablename__
+        for model in (Student, Lesson, Subscription, Expense, Income)
+        if session.scalar(
+            select(model.id).where(model.user_id == user_id, model.change_seq > since).limit(1)
+        ) is not None
+    }
+    entities.update(session.scalars(
+        select(Tombstone.entity).where(Tombstone.user_id == user_id, Tombstone.change_seq > since).distinct()
+    ))
+    return sorted(entities)
+
+
+def poll_changes(known: Dict[int, Optional[int]]) -> Dict[int, Tuple[int, List[str]]]:
+    """Текущий users.change_seq и таблицы, изменённые после известного seq.
+
+    Для пользователя без известного seq (подписался только что) таблицы
+    не ищутся - его seq становится точкой отсчёта.
+    """
+    from models import User
+
+    result = {}
+    for user_id, since in known.items():
+        session = _read_session(user_id)
+        try:
+            seq = session.scalar(select(User.change_seq).where(User.id == user_id))
+            if seq is None:
+                continue
+            changed = since is not None and seq > since
+            result[user_id] = (seq, _changed_entities(session, user_id, since) if changed else [])
+        finally:
+            session.close()
+    return result
+
+
+class ChangePoller:
+    """Опрашивает users.change_seq пользователей с подписчиками в этом процессе.
+
+    after_commit видит только коммиты своего процесса, а воркеров serve.py
+    несколько: изменения, сделанные в другом воркере, приходят отсюда с
+    задержкой до SSE_POLL_INTERVAL_MS.
+    """
+
+    def __init__(self, broker: EventBroker, interval: float):
+        self.broker = broker
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            known = self.broker.subscribed_users()
+            if not known:
+                continue
+            try:
+                changes = await asyncio.to_thread(poll_changes, known)
+            except Exception:
+                logger.exception("Не удалось опросить изменения для подписчиков")
+                continue
+            for user_id, (seq, entities) in changes.items():
+                if known[user_id] is None:
+                    self.broker.remember_seq(user_id, seq)
+                else:
+                    self.broker.publish(user_id, {"seq": seq, "entities": entities})
+
+
+broker = EventBroker(queue_size=settings.SSE_QUEUE_SIZE)
+poller = ChangePoller(broker, interval=settings.SSE_POLL_INTERVAL_MS / 1000)
+
+
+def format_sse(payload: dict, event_name: str = "change") -> str:
+    return f"event: {event_name}\nid: {payload['seq']}\ndata: {json.dumps(payload)}\n\n"
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session):
+    # sync_changes заполняет models/sync.py при flush
+    changes = session.info.pop("sync_changes", None)
+    if not changes:
+        return
+    for user_id, (seq, entities) in changes.items():
+        broker.publish_threadsafe(user_id, {"seq": seq, "entities": sorted(entities)})
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("sync_changes", None)
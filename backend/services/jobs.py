@@ -0,0 +1,295 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import aliased
+
+from config import settings
+from database import SessionLocal
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+ACTIVE_STATUSES = ("running", "cancelling")
+
+# Задача, упёршаяся в лимит типа, остаётся в очереди и пробует снова через столько секунд
+CLAIM_RETRY_SECONDS = 1.0
+
+# _claim_job: задача захвачена другим процессом или отменена / лимит типа занят
+CLAIM_GONE = None
+CLAIM_BUSY = "busy"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobRejected(Exception):
+    pass
+
+
+@dataclass
+class JobType:
+    name: str
+    handler: Callable[["JobContext", Dict[str, Any]], Optional[str]]
+    limit: int = 1
+    admin_only: bool = False
+
+
+JOB_TYPES: Dict[str, JobType] = {}
+
+
+def job_type(name: str, limit: int = 1, admin_only: bool = False):
+    """Регистрирует обработчик задачи.
+
+    Обработчик выполняется в потоке пула, получает JobContext и параметры
+    задачи и возвращает путь к файлу результата (или None).
+    """
+
+    def wrapper(handler):
+        JOB_TYPES[name] = JobType(name, handler, limit, admin_only)
+        return handler
+
+    return wrapper
+
+
+def _update_job(job_id: int, **values) -> int:
+    db = SessionLocal()
+    try:
+        updated = db.query(Job).filter(Job.id == job_id).update(values, synchronize_session=False)
+        db.commit()
+        return updated
+    finally:
+        db.close()
+
+
+class JobContext:
+    def __init__(self, job_id: int, user_id: int, cancel_event: threading.Event):
+        self.job_id = job_id
+        self.user_id = user_id
+        self._cancel_event = cancel_event
+
+    @property
+    def results_dir(self) -> str:
+        path = os.path.join(settings.JOB_RESULTS_DIR, str(self.job_id))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def progress(self, value: float):
+        """Сохраняет прогресс (0..1) и заодно проверяет отмену из другого процесса."""
+        self.check_cancelled()
+        db = SessionLocal()
+        try:
+            db.query(Job).filter(Job.id == self.job_id).update(
+                {"progress": min(max(value, 0.0), 1.0)}, synchronize_session=False
+            )
+            db.commit()
+            status = db.query(Job.status).filter(Job.id == self.job_id).scalar()
+        finally:
+            db.close()
+        if status == "cancelling":
+            self._cancel_event.set()
+            raise JobCancelled()
+
+
+class JobRunner:
+    """Пул фоновых задач процесса.
+
+    Общее число одновременно выполняемых задач процесса ограничено
+    JOB_WORKERS, число задач одного типа - лимитом из job_type() на все
+    воркеры сервера: он проверяется при захвате задачи в таблице jobs.
+    Состояние хранится там же, поэтому статус виден из любого воркера.
+    """
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._type_slots: Dict[str, asyncio.Semaphore] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._cancel_events: Dict[int, threading.Event] = {}
+
+    async def start(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.JOB_WORKERS, thread_name_prefix="job"
+        )
+        self._slots = asyncio.Semaphore(settings.JOB_WORKERS)
+        self._recover()
+
+    async def stop(self):
+        for event in self._cancel_events.values():
+            event.set()
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def create(self, db, user_id: int, type_name: str, params: Dict[str, Any]) -> Job:
+        if type_name not in JOB_TYPES:
+            raise JobRejected(f"Unknown job type: {type_name}")
+        if len(self._tasks) >= settings.JOB_QUEUE_SIZE:
+            raise JobRejected("Job queue is full")
+        job = Job(type=type_name, status="queued", params=json.dumps(params), user_id=user_id)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        self._schedule(job.id, type_name)
+        return job
+
+    def cancel(self, db, job: Job) -> Job:
+        # Задача в очереди ещё не захвачена ни одним процессом - отменяем сразу
+        cancelled = db.query(Job).filter(Job.id == job.id, Job.status == "queued").update(
+            {"status": "cancelled", "finished_at": datetime.utcnow()}, synchronize_session=False
+        )
+        if cancelled:
+            task = self._tasks.get(job.id)
+            if task is not None:
+                task.cancel()
+        else:
+            # Выполняющаяся задача останавливается сама при проверке отмены
+            db.query(Job).filter(Job.id == job.id, Job.status == "running").update(
+                {"status": "cancelling"}, synchronize_session=False
+            )
+            event = self._cancel_events.get(job.id)
+            if event is not None:
+                event.set()
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def _schedule(self, job_id: int, type_name: str):
+        task = asyncio.ensure_future(self._run(job_id, type_name))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    def _type_slot(self, type_name: str) -> asyncio.Semaphore:
+        if type_name not in self._type_slots:
+            self._type_slots[type_name] = asyncio.Semaphore(JOB_TYPES[type_name].limit)
+        return self._type_slots[type_name]
+
+    async def _run(self, job_id: int, type_name: str):
+        async with self._type_slot(type_name):
+            while True:
+                async with self._slots:
+                    # Захватываем задачу атомарно: её могли отменить или забрать
+                    # другим воркером сервера, пока она стояла в очереди
+                    claimed = await asyncio.to_thread(_claim_job, job_id, type_name)
+                    if claimed is CLAIM_GONE:
+                        return
+                    if claimed is not CLAIM_BUSY:
+                        await self._run_claimed(job_id, type_name, *claimed)
+                        return
+                # Лимит типа занят задачами других воркеров - общий слот отдаём, пока ждём
+                await asyncio.sleep(CLAIM_RETRY_SECONDS)
+
+    async def _run_claimed(self, job_id: int, type_name: str, user_id: int, params: Dict[str, Any]):
+        event = threading.Event()
+        self._cancel_events[job_id] = event
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(
+                self._executor, _execute, job_id, user_id, type_name, params, event
+            )
+        finally:
+            self._cancel_events.pop(job_id, None)
+
+    def _recover(self):
+        """Подхватывает задачи, оставшиеся после перезапуска."""
+        db = SessionLocal()
+        try:
+            for job in db.query(Job).filter(Job.status.in_(ACTIVE_STATUSES)).all():
+                if not _owner_alive(job.owner):
+                    job.status = "failed"
+                    job.error = "Interrupted by server restart"
+                    job.finished_at = datetime.utcnow()
+            db.commit()
+            queued = db.query(Job.id, Job.type).filter(Job.status == "queued").all()
+        finally:
+            db.close()
+        for job_id, type_name in queued:
+            if type_name in JOB_TYPES:
+                self._schedule(job_id, type_name)
+
+
+def _claim_job(job_id: int, type_name: str):
+    """queued -> running, если задач этого типа выполняется меньше лимита.
+
+    Проверка и захват - один UPDATE: в SQLite записи идут по одной, в
+    PostgreSQL захваты одного типа упорядочивает advisory-блокировка до
+    конца транзакции (иначе два UPDATE не видят друг друга).
+    """
+    db = SessionLocal()
+    try:
+        if db.bind.dialect.name == "postgresql":
+            db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": zlib.crc32(f"jobs:{type_name}".encode())})
+        active = aliased(Job)
+        running = select(func.count(active.id)).where(
+            active.type == type_name, active.status.in_(ACTIVE_STATUSES)
+        ).scalar_subquery()
+        claimed = db.query(Job).filter(
+            Job.id == job_id, Job.status == "queued", running < JOB_TYPES[type_name].limit
+        ).update(
+            {"status": "running", "owner": _owner(), "started_at": datetime.utcnow()},
+            synchronize_session=False,
+        )
+        db.commit()
+        job = db.query(Job.user_id, Job.params, Job.status).filter(Job.id == job_id).one_or_none()
+        if job is None or (not claimed and job.status != "queued"):
+            return CLAIM_GONE
+        if not claimed:
+            return CLAIM_BUSY
+        return job.user_id, json.loads(job.params or "{}")
+    finally:
+        db.close()
+
+
+def _execute(job_id: int, user_id: int, type_name: str, params: Dict[str, Any], event: threading.Event):
+    ctx = JobContext(job_id, user_id, event)
+    try:
+        result_path = JOB_TYPES[type_name].handler(ctx, params)
+    except JobCancelled:
+        _update_job(job_id, status="cancelled", finished_at=datetime.utcnow())
+    except Exception as e:
+        logger.exception("Задача %s (%s) завершилась с ошибкой", job_id, type_name)
+        _update_job(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+    else:
+        _update_job(
+            job_id, status="succeeded", progress=1.0,
+            result_path=result_path, finished_at=datetime.utcnow()
+        )
+
+
+def _owner() -> str:
+    # Вычисляется при захвате задачи: после fork у воркеров свой pid
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    if not owner or ":" not in owner:
+        return False
+    host, pid = owner.rsplit(":", 1)
+    if host != socket.gethostname() or int(pid) == os.getpid():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+runner = JobRunner()
@@ -0,0 +1,108 @@
+"""Проверка и исправление счётчиков занятий учеников.
+
+Счётчики lessons_scheduled/completed/cancelled ведутся при записи занятий
+(models/lesson.py). Записи мимо приложения (ручной SQL, импорт базы)
+могут их сбить - задача lesson_counters сравнивает их с подсчётом по
+занятиям, включая архив, и с {"repair": true} исправляет.
+"""
+import json
+import logging
+import os
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import and_, false, func, select, true, update
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models import Lesson, Student
+from services.archive import archive_source
+from services.jobs import job_type
+from services.shards import iter_shards, open_session
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("lessons_scheduled", "lessons_completed", "lessons_cancelled")
+
+
+def _counter_condition(source, counter: str):
+    # NULL в флагах считается False, как в models.lesson.lesson_counter
+    cancelled = func.coalesce(source.is_cancelled, false())
+    completed = func.coalesce(source.is_completed, false())
+    if counter == "lessons_cancelled":
+        return cancelled == true()
+    if counter == "lessons_completed":
+        return and_(cancelled == false(), completed == true())
+    return and_(cancelled == false(), completed == false())
+
+
+def actual_count(counter: str):
+    """Подзапрос: число занятий ученика (с архивом) для счётчика counter."""
+    source = archive_source(Lesson, datetime.min)
+    return (
+        select(func.count())
+        .select_from(source)
+        .where(source.student_id == Student.id, _counter_condition(source, counter))
+        .scalar_subquery()
+    )
+
+
+def find_mismatches(session: Session) -> List[dict]:
+    columns = [getattr(Student, counter) for counter in COUNTERS]
+    rows = session.execute(
+        select(Student.id, *columns, *(actual_count(counter) for counter in COUNTERS))
+    ).all()
+    mismatches = []
+    for row in rows:
+        for position, counter in enumerate(COUNTERS):
+            stored, actual = row[1 + position], row[1 + len(COUNTERS) + position]
+            if stored != actual:
+                mismatches.append({"student_id": row[0], "counter": counter, "stored": stored, "actual": actual})
+    return mismatches
+
+
+def repair_counters(session: Session, student_ids=None) -> int:
+    """Пересчитывает счётчики одним UPDATE на группу учеников (все - если ids не заданы)."""
+    statement = update(Student).values({counter: actual_count(counter) for counter in COUNTERS})
+    if student_ids is not None:
+        ids = list(student_ids)
+        if not ids:
+            return 0
+        statement = statement.where(Student.id.in_(ids))
+    return session.execute(statement, execution_options={"synchronize_session": False}).rowcount
+
+
+def _sessions():
+    if settings.SHARDING_ENABLED:
+        for user_id, _ in iter_shards():
+            yield open_session(user_id)
+    else:
+        yield SessionLocal()
+
+
+@job_type("lesson_counters", limit=1, admin_only=True)
+def lesson_counters_job(ctx, params):
+    repair = bool(params.get("repair"))
+    report = {"repair": repair, "mismatches": []}
+    for session in _sessions():
+        try:
+            mismatches = find_mismatches(session)
+            if repair and mismatches:
+                repair_counters(session, {item["student_id"] for item in mismatches})
+                session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        report["mismatches"].extend(mismatches)
+        ctx.check_cancelled()
+    if report["mismatches"]:
+        logger.warning(
+            "Расхождений счётчиков занятий: %s%s", len(report["mismatches"]), " (исправлено)" if repair else ""
+        )
+    path = os.path.join(ctx.results_dir, "lesson_counters.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
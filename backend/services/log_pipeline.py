@@ -0,0 +1,205 @@
+"""Логирование без задержек в обработчиках.
+
+Записи кладутся в очередь (QueueHandler), форматирует и пишет их
+фоновый поток (QueueListener): JSON-строка на запись с request_id,
+user_id и, для access-лога, маршрутом, статусом и длительностью.
+Контекст запроса берётся из contextvars в момент вызова логгера.
+
+LOG_SAMPLING задаёт долю сохраняемых записей для шумных логгеров:
+"access=0.1,services.events=0.5". WARNING и выше не отбрасываются.
+Если очередь переполнена, запись отбрасывается, а не ждёт.
+"""
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from fastapi import Request
+
+from config import settings
+from services.routes import route_for
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+user_id_var: ContextVar[Optional[int]] = ContextVar("user_id", default=None)
+
+access_logger = logging.getLogger("access")
+
+# Поля access-лога, передаваемые через extra
+ACCESS_FIELDS = ("method", "route", "path", "status", "duration_ms")
+
+
+def parse_sampling(value: str) -> Dict[str, float]:
+    """"access=0.1,services.events=0.5" -> {"access": 0.1, "services.events": 0.5}."""
+    rates = {}
+    for item in value.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+class ContextFilter(logging.Filter):
+    """Добавляет к записи контекст запроса. Работает в потоке, который логирует."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Поля из extra (access-лог) не перезаписываем
+        record.__dict__.setdefault("request_id", request_id_var.get())
+        record.__dict__.setdefault("user_id", user_id_var.get())
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def rate_for(self, name: str) -> float:
+        # Самое длинное совпадение: "services.events" важнее "services"
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in ("request_id", "user_id") + ACCESS_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                data[key] = value
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler, который при полной очереди отбрасывает запись."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Сообщение и трассировку собираем здесь: аргументы и объект
+        # исключения могут измениться, пока запись ждёт в очереди
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    def __init__(self):
+        self.handler: Optional[DroppingQueueHandler] = None
+        self.listener: Optional[QueueListener] = None
+        self.output: Optional[logging.Handler] = None
+
+    def setup(self):
+        if self.handler is not None:
+            return
+        if settings.LOG_FILE:
+            self.output = logging.FileHandler(settings.LOG_FILE, encoding="utf-8")
+        else:
+            self.output = logging.StreamHandler(sys.stderr)
+        if settings.LOG_FORMAT == "json":
+            self.output.setFormatter(JsonFormatter())
+        else:
+            self.output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+        self.handler = DroppingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+        self.handler.addFilter(SamplingFilter(parse_sampling(settings.LOG_SAMPLING)))
+        self.handler.addFilter(ContextFilter())
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(settings.LOG_LEVEL.upper())
+        self._start_listener()
+        # Поток-слушатель не переживает fork (serve.py) - запускаем новый в воркере
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _start_listener(self):
+        self.listener = QueueListener(self.handler.queue, self.output, respect_handler_level=True)
+        self.listener.start()
+
+    def _after_fork(self):
+        self.handler.queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        self.handler.dropped = 0
+        self._start_listener()
+
+    def stop(self):
+        if self.listener is None:
+            return
+        self.listener.stop()
+        self.listener = None
+        if self.handler.dropped:
+            self.output.handle(logging.makeLogRecord({
+                "name": __name__, "levelno": logging.WARNING, "levelname": "WARNING",
+                "msg": "Log queue overflow, dropped records: %s", "args": (self.handler.dropped,),
+            }))
+
+
+pipeline = LogPipeline()
+
+
+async def log_requests(request: Request, call_next):
+    """Middleware: request id для всех записей запроса и строка access-лога."""
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    request_id_var.set(request_id)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        route = route_for(request)
+        access_logger.info(
+            "%s %s %s",
+            request.method,
+            request.url.path,
+            status,
+            extra={
+                "method": request.method,
+                "route": route.path if route is not None else None,
+                "path": request.url.path,
+                "status": status,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "user_id": getattr(request.state, "user_id", None),
+            },
+        )
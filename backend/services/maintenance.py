@@ -0,0 +1,264 @@
+"""Обслуживание файлов SQLite (DB_MAINTENANCE_ENABLED).
+
+В часы DB_MAINTENANCE_TIMES (местное время, когда нагрузки нет) для
+основной базы, архива и шардов выполняется:
+  - ANALYZE, если статистики ещё нет, иначе PRAGMA optimize - планировщику
+    нужна статистика sqlite_stat1 для выбора индексов;
+  - incremental_vacuum - возврат свободных страниц после удалений. Базы,
+    созданные до включения auto_vacuum=INCREMENTAL (database.py), переводятся
+    в этот режим полным VACUUM только при ручном запуске с
+    convert_auto_vacuum=true: он переписывает весь файл и держит запись;
+  - wal_checkpoint(TRUNCATE) - перенос WAL в базу и обрезка файла WAL
+    (при BACKUP_ENABLED его делает services/backup.py).
+
+Тот же набор запускается вручную задачей database_maintenance
+(POST /maintenance/run). Воркеры serve.py планируют запуск каждый сам,
+поэтому запуск берёт файловую блокировку, а плановый пропускается, если
+за этот слот обслуживание уже выполнено. Отчёт последнего запуска
+хранится в JOB_RESULTS_DIR/maintenance.json.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from database import engine, is_memory_sqlite
+from services.archive import archive_enabled
+from services.jobs import job_type
+from services.shards import iter_shards
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: serve.py не форкает воркеры, блокировка между процессами не нужна
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+
+class MaintenanceBusy(Exception):
+    pass
+
+
+def parse_times(value: str) -> List[Tuple[int, int]]:
+    """"04:00,13:30" -> [(4, 0), (13, 30)]."""
+    times = []
+    for item in value.split(","):
+        if item.strip():
+            hours, minutes = item.strip().split(":")
+            times.append((int(hours), int(minutes)))
+    return sorted(times)
+
+
+def next_slot(now: datetime, times: List[Tuple[int, int]]) -> Optional[datetime]:
+    if not times:
+        return None
+    for days in (0, 1):
+        day = now + timedelta(days=days)
+        for hours, minutes in times:
+            slot = day.replace(hour=hours, minute=minutes, second=0, microsecond=0)
+            if slot > now:
+                return slot
+    return None
+
+
+def database_files() -> List[str]:
+    """Файлы SQLite, которые обслуживаются: основная база, архив, шарды."""
+    if engine.url.get_backend_name() != "sqlite" or is_memory_sqlite(engine.url):
+        return []
+    files = [engine.url.database]
+    if archive_enabled() and os.path.exists(settings.ARCHIVE_DATABASE_PATH):
+        files.append(settings.ARCHIVE_DATABASE_PATH)
+    if settings.SHARDING_ENABLED:
+        files.extend(path for _, path in iter_shards() if os.path.exists(path))
+    return files
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    # isolation_level=None - без неявных транзакций: VACUUM в транзакции не выполняется
+    conn = sqlite3.connect(path, timeout=settings.DB_MAINTENANCE_BUSY_TIMEOUT, isolation_level=None)
+    if settings.BACKUP_ENABLED:
+        conn.execute("PRAGMA wal_autocheckpoint=0")
+    return conn
+
+
+def _pragma(conn: sqlite3.Connection, name: str):
+    return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+
+def file_stats(path: str) -> Dict[str, Any]:
+    conn = _connect(path)
+    try:
+        page_size = _pragma(conn, "page_size")
+        page_count = _pragma(conn, "page_count")
+        freelist_count = _pragma(conn, "freelist_count")
+        has_statistics = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+        ).fetchone() is not None
+        return {
+            "path": path,
+            "size_bytes": os.path.getsize(path),
+            "wal_bytes": os.path.getsize(path + "-wal") if os.path.exists(path + "-wal") else 0,
+            "page_size": page_size,
+            "page_count": page_count,
+            "freelist_count": freelist_count,
+            "free_bytes": freelist_count * page_size,
+            # Доля пустых страниц: столько файла вернёт incremental_vacuum
+            "fragmentation": round(freelist_count / page_count, 4) if page_count else 0.0,
+            "auto_vacuum": AUTO_VACUUM_MODES.get(_pragma(conn, "auto_vacuum"), "unknown"),
+            "journal_mode": _pragma(conn, "journal_mode"),
+            "has_statistics": has_statistics,
+        }
+    finally:
+        conn.close()
+
+
+def maintain_file(path: str, convert_auto_vacuum: bool = False) -> Dict[str, Any]:
+    before = file_stats(path)
+    steps: Dict[str, Any] = {}
+    conn = _connect(path)
+    try:
+        started = time.perf_counter()
+        if before["has_statistics"]:
+            conn.execute("PRAGMA optimize")
+            steps["analyze"] = "optimize"
+        else:
+            if settings.DB_MAINTENANCE_ANALYSIS_LIMIT:
+                conn.execute(f"PRAGMA analysis_limit={int(settings.DB_MAINTENANCE_ANALYSIS_LIMIT)}")
+            conn.execute("ANALYZE")
+            steps["analyze"] = "analyze"
+        steps["analyze_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+        started = time.perf_counter()
+        if before["auto_vacuum"] != "incremental" and convert_auto_vacuum:
+            # Режим auto_vacuum меняется только вместе с полной перестройкой файла
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            steps["vacuum"] = "full"
+        elif before["auto_vacuum"] != "incremental":
+            # Без auto_vacuum=INCREMENTAL incremental_vacuum ничего не освобождает
+            steps["vacuum"] = "skipped"
+        else:
+            pages = int(settings.DB_MAINTENANCE_VACUUM_PAGES)
+            # По странице на шаг: execute() делает один шаг, executescript() - до конца
+            conn.executescript(f"PRAGMA incremental_vacuum({pages});" if pages else "PRAGMA incremental_vacuum;")
+            steps["vacuum"] = "incremental"
+        steps["vacuum_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+        if before["journal_mode"] == "wal" and settings.BACKUP_ENABLED:
+            # WAL переносит в базу репликатор, когда кадры уже скопированы
+            steps["checkpoint"] = "backup"
+        elif before["journal_mode"] == "wal":
+            started = time.perf_counter()
+            busy, wal_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            # busy=1 - checkpoint не дождался читателей, WAL не обрезан
+            steps["checkpoint"] = {"busy": bool(busy), "wal_pages": wal_pages, "checkpointed": checkpointed}
+            steps["checkpoint_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    finally:
+        conn.close()
+    return {"path": path, "steps": steps, "before": before, "after": file_stats(path)}
+
+
+def report_path() -> str:
+    return os.path.join(settings.JOB_RESULTS_DIR, "maintenance.json")
+
+
+def last_report() -> Optional[Dict[str, Any]]:
+    try:
+        with open(report_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def maintenance_lock():
+    os.makedirs(settings.JOB_RESULTS_DIR, exist_ok=True)
+    with open(report_path() + ".lock", "w") as lock_file:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                raise MaintenanceBusy("Database maintenance is already running")
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def run_maintenance(trigger: str, slot: Optional[datetime] = None, progress=None,
+                    convert_auto_vacuum: bool = False) -> Optional[Dict[str, Any]]:
+    """Обслуживает все файлы и сохраняет отчёт.
+
+    Для планового запуска (slot задан) возвращает None, если этот слот
+    уже обслужил другой воркер. Плановый запуск полный VACUUM не делает.
+    """
+    with maintenance_lock():
+        previous = last_report()
+        if slot is not None and previous and previous.get("started_at", "") >= slot.isoformat():
+            return None
+        report: Dict[str, Any] = {"trigger": trigger, "started_at": datetime.now().isoformat(), "databases": []}
+        files = database_files()
+        for index, path in enumerate(files):
+            try:
+                report["databases"].append(maintain_file(path, convert_auto_vacuum))
+            except sqlite3.Error as e:
+                logger.exception("Обслуживание %s завершилось с ошибкой", path)
+                report["databases"].append({"path": path, "error": str(e)})
+            if progress is not None:
+                progress((index + 1) / len(files))
+        report["finished_at"] = datetime.now().isoformat()
+        with open(report_path() + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(report_path() + ".tmp", report_path())
+    logger.info("Обслуживание базы (%s): файлов %s", trigger, len(report["databases"]))
+    return report
+
+
+@job_type("database_maintenance", limit=1, admin_only=True)
+def database_maintenance(ctx, params):
+    run_maintenance("manual", progress=ctx.progress, convert_auto_vacuum=bool(params.get("convert_auto_vacuum")))
+    return report_path()
+
+
+class MaintenanceScheduler:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def next_run(self) -> Optional[datetime]:
+        if not settings.DB_MAINTENANCE_ENABLED:
+            return None
+        return next_slot(datetime.now(), parse_times(settings.DB_MAINTENANCE_TIMES))
+
+    def start(self):
+        if self._task is None and self.next_run() is not None and database_files():
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            slot = self.next_run()
+            await asyncio.sleep(max(0.0, (slot - datetime.now()).total_seconds()))
+            try:
+                await asyncio.to_thread(run_maintenance, "schedule", slot)
+            except MaintenanceBusy:
+                pass
+            except Exception:
+                logger.exception("Плановое обслуживание базы завершилось с ошибкой")
+
+
+scheduler = MaintenanceScheduler()
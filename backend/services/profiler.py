@@ -0,0 +1,194 @@
+"""Профилирование отдельных запросов (PROFILER_ENABLED).
+
+Middleware профилирует cProfile долю PROFILER_SAMPLE_RATE запросов и
+каждый запрос с заголовком X-Profile, содержащим токен от
+POST /profiler/token (выдаётся администратору). Результат сохраняется
+в PROFILER_DIR как .pstats (открывается snakeviz, pstats и т.п.) рядом
+с .json-описанием запроса, в каталоге хранится не больше
+PROFILER_MAX_FILES профилей. Имя файла возвращается в заголовке
+X-Profile-Id. Список и скачивание строятся по каталогу, поэтому видны
+профили всех воркеров и переживают перезапуск.
+
+cProfile работает на весь поток, а цикл событий один, поэтому
+одновременно профилируется только один запрос, и в профиль попадают
+корутины других запросов, выполнявшиеся в это время.
+"""
+import asyncio
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from jose import JWTError, jwt
+from starlette.responses import Response
+
+from api_config import SECURITY_CONFIG
+from config import settings
+from services.routes import route_for
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_SCOPE = "profile"
+PROFILE_SUFFIX = ".pstats"
+META_SUFFIX = ".json"
+
+
+@dataclass
+class ProfileRecord:
+    name: str
+    method: str
+    route: str
+    path: str
+    status_code: int
+    duration_ms: float
+    created_at: datetime
+
+    def to_json(self) -> str:
+        return json.dumps({**asdict(self), "created_at": self.created_at.isoformat()})
+
+    @classmethod
+    def from_json(cls, text: str) -> "ProfileRecord":
+        data = json.loads(text)
+        data["created_at"] = datetime.fromisoformat(data["created_at"])
+        return cls(**data)
+
+
+def create_profile_token(username: str) -> str:
+    # Без "sub": токен не подходит для входа через get_current_user
+    expires = datetime.utcnow() + timedelta(minutes=settings.PROFILER_TOKEN_MINUTES)
+    return jwt.encode(
+        {"scope": PROFILE_SCOPE, "issued_by": username, "exp": expires},
+        SECURITY_CONFIG["secret_key"],
+        algorithm=SECURITY_CONFIG["algorithm"],
+    )
+
+
+def valid_profile_token(token: str) -> bool:
+    try:
+        payload = jwt.decode(token, SECURITY_CONFIG["secret_key"], algorithms=[SECURITY_CONFIG["algorithm"]])
+    except JWTError:
+        return False
+    return payload.get("scope") == PROFILE_SCOPE
+
+
+class RequestProfiler:
+    def __init__(self, directory: str, max_files: int, sample_rate: float):
+        self.directory = directory
+        self.max_files = max_files
+        self.sample_rate = sample_rate
+        self._lock = asyncio.Lock()
+
+    def wanted(self, request: Request) -> Optional[str]:
+        """Причина профилировать запрос: "header", "sample" или None."""
+        token = request.headers.get(PROFILE_HEADER)
+        if token and valid_profile_token(token):
+            return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, request: Request, call_next) -> Response:
+        reason = self.wanted(request)
+        # Выборочные запросы не ждут, пока профилируется другой
+        if reason is None or (reason == "sample" and self._lock.locked()):
+            return await call_next(request)
+
+        async with self._lock:
+            profile = cProfile.Profile()
+            started = time.perf_counter()
+            profile.enable()
+            try:
+                response = await call_next(request)
+            finally:
+                profile.disable()
+            duration_ms = (time.perf_counter() - started) * 1000
+
+        route = route_for(request)
+        record = ProfileRecord(
+            # pid в имени: воркеры пишут в один каталог
+            name=f"{int(time.time() * 1000)}-{os.getpid()}-{request.method}-{int(duration_ms)}ms{PROFILE_SUFFIX}",
+            method=request.method,
+            route=route.path if route is not None else request.url.path,
+            path=request.url.path,
+            status_code=response.status_code,
+            duration_ms=round(duration_ms, 2),
+            created_at=datetime.utcnow(),
+        )
+        try:
+            await asyncio.to_thread(self._save, profile, record)
+        except OSError:
+            logger.exception("Не удалось сохранить профиль %s", record.name)
+            return response
+        response.headers["X-Profile-Id"] = record.name
+        return response
+
+    def _save(self, profile: cProfile.Profile, record: ProfileRecord):
+        os.makedirs(self.directory, exist_ok=True)
+        pstats.Stats(profile).dump_stats(os.path.join(self.directory, record.name))
+        # Описание пишется последним и атомарно: в списке только целиком сохранённые профили
+        meta_path = self._meta_path(record.name)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as file:
+            file.write(record.to_json())
+        os.replace(meta_path + ".tmp", meta_path)
+        self._prune()
+
+    def _meta_path(self, name: str) -> str:
+        return os.path.join(self.directory, name[:-len(PROFILE_SUFFIX)] + META_SUFFIX)
+
+    def _prune(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(PROFILE_SUFFIX))
+        # Имена начинаются с времени в мс - старые идут первыми
+        for name in names[:max(0, len(names) - self.max_files)]:
+            # Тот же файл может удалять другой воркер
+            for path in (self._meta_path(name), os.path.join(self.directory, name)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def records(self) -> List[ProfileRecord]:
+        if not os.path.isdir(self.directory):
+            return []
+        records = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(META_SUFFIX):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as file:
+                    records.append(ProfileRecord.from_json(file.read()))
+            except (OSError, ValueError, TypeError, KeyError):
+                # Удалён при очистке или повреждён
+                continue
+        return records
+
+    def path_for(self, name: str) -> Optional[str]:
+        # Отдаём только профили, сохранённые middleware, и только из PROFILER_DIR
+        if os.path.basename(name) != name or not name.endswith(PROFILE_SUFFIX):
+            return None
+        path = os.path.join(self.directory, name)
+        if os.path.exists(path) and os.path.exists(self._meta_path(name)):
+            return path
+        return None
+
+    def slowest_by_route(self, limit: int) -> Dict[str, List[ProfileRecord]]:
+        routes: Dict[str, List[ProfileRecord]] = {}
+        for record in self.records():
+            routes.setdefault(f"{record.method} {record.route}", []).append(record)
+        return {
+            route: sorted(records, key=lambda item: item.duration_ms, reverse=True)[:limit]
+            for route, records in sorted(routes.items())
+        }
+
+profiler = RequestProfiler(
+    directory=settings.PROFILER_DIR,
+    max_files=settings.PROFILER_MAX_FILES,
+    sample_rate=settings.PROFILER_SAMPLE_RATE,
+)
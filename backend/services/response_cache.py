@@ -0,0 +1,315 @@
+import asyncio
+import gzip
+import hashlib
+import importlib.util
+import inspect
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+from starlette.responses import Response
+
+from config import settings
+from services.routes import route_for
+from services.shards import open_session
+from services.singleflight import build_cache_key, flight
+from services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Меньшие ответы не сжимаются - тот же порог, что у GZipMiddleware в main.py
+MIN_COMPRESS_SIZE = 1000
+
+# brotli, zstandard и msgpack - необязательные зависимости
+brotli = importlib.import_module("brotli") if importlib.util.find_spec("brotli") else None
+zstandard = importlib.import_module("zstandard") if importlib.util.find_spec("zstandard") else None
+msgpack = importlib.import_module("msgpack") if importlib.util.find_spec("msgpack") else None
+
+# Формат ответа -> Content-Type
+FORMATS = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+    "msgpack-columnar": "application/msgpack; layout=columnar",
+}
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+@dataclass
+class CachedBody:
+    """Готовый ответ: JSON-байты и их сжатые варианты."""
+
+    variants: Dict[str, bytes]
+    etag: str
+    media_type: str = FORMATS["json"]
+    stored_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def size(self) -> int:
+        return sum(len(body) for body in self.variants.values())
+
+
+class SparseList(list):
+    """Записи с частью полей или со связями (api/fieldsets.py) - сериализуются без response_model."""
+
+
+def encode_variants(body: bytes) -> Dict[str, bytes]:
+    variants = {"identity": body}
+    if len(body) < MIN_COMPRESS_SIZE:
+        return variants
+    variants["gzip"] = gzip.compress(body, compresslevel=settings.RESPONSE_CACHE_GZIP_LEVEL)
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=settings.RESPONSE_CACHE_BROTLI_QUALITY)
+    if zstandard is not None:
+        variants["zstd"] = zstandard.ZstdCompressor(level=settings.RESPONSE_CACHE_ZSTD_LEVEL).compress(body)
+    return variants
+
+
+# Порядок предпочтения при равных q в Accept-Encoding
+ENCODING_PREFERENCE = ("br", "zstd", "gzip", "identity")
+
+
+def choose_encoding(accept_encoding: Optional[str], available) -> str:
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+
+    best, best_q = "identity", 0.0
+    for name in ENCODING_PREFERENCE:
+        if name not in available or name == "identity":
+            continue
+        q = accepted.get(name, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def choose_format(accept: Optional[str]) -> str:
+    """Формат ответа по Accept: MessagePack, если клиент предпочитает его JSON.
+
+    application/msgpack;layout=columnar - списки записей в виде массива на поле.
+    """
+    if msgpack is None:
+        return "json"
+    json_q, packed_q, layout = 0.0, 0.0, ""
+    for item in (accept or "").split(","):
+        media, *params = [part.strip() for part in item.split(";")]
+        media = media.lower()
+        options = {}
+        for param in params:
+            name, _, value = param.partition("=")
+            options[name.strip().lower()] = value.strip()
+        try:
+            q = float(options.get("q", "1"))
+        except ValueError:
+            q = 0.0
+        if media in MSGPACK_TYPES and q > packed_q:
+            packed_q, layout = q, options.get("layout", "")
+        elif media in ("application/json", "application/*", "*/*"):
+            json_q = max(json_q, q)
+    if packed_q > 0 and packed_q >= json_q:
+        return "msgpack-columnar" if layout == "columnar" else "msgpack"
+    return "json"
+
+
+def columnar(content: Any) -> Any:
+    """Непустой список записей -> {поле: [значения]}; в словарях - для каждого значения."""
+    if isinstance(content, list) and content and all(isinstance(row, dict) for row in content):
+        keys = list(dict.fromkeys(key for row in content for key in row))
+        return {key: [row.get(key) for row in content] for key in keys}
+    if isinstance(content, dict):
+        return {key: columnar(value) for key, value in content.items()}
+    return content
+
+
+def encode_body(content: Any, fmt: str) -> bytes:
+    if fmt == "json":
+        return JSONResponse(content).body
+    if fmt == "msgpack-columnar":
+        content = columnar(content)
+    # Даты остаются ISO-строками, как в JSON: они хранятся без часового пояса
+    return msgpack.packb(content)
+
+
+class ResponseCache:
+    """LRU готовых ответов с ограничением по объёму в байтах."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedBody]" = OrderedDict()
+        self._size = 0
+        # Растёт при каждом сбросе: результат, вычисленный до сброса, не сохраняем
+        self.generation = 0
+
+    def get(self, key: str) -> Optional[CachedBody]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: CachedBody):
+        self._discard(key)
+        if entry.size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._size += entry.size
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+
+    def clear(self, prefix: str = ""):
+        self.generation += 1
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            self._discard(key)
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
+
+
+response_cache = ResponseCache(max_bytes=settings.RESPONSE_CACHE_MAX_MB * 1024 * 1024)
+
+async def _serialize(route: Optional[APIRoute], result: Any) -> Any:
+    """Приводит результат к данным ответа так же, как это сделал бы FastAPI по response_model."""
+    if route is not None and route.response_field is not None and not isinstance(result, SparseList):
+        content = await serialize_response(
+            field=route.response_field,
+            response_content=result,
+            exclude_unset=route.response_model_exclude_unset,
+            exclude_defaults=route.response_model_exclude_defaults,
+            exclude_none=route.response_model_exclude_none,
+        )
+    else:
+        content = jsonable_encoder(result)
+    return content
+
+
+async def _build_entry(route: Optional[APIRoute], result: Any, fmt: str = "json") -> CachedBody:
+    with span("serialize", "cache", format=fmt):
+        body = encode_body(await _serialize(route, result), fmt)
+    if len(body) < MIN_COMPRESS_SIZE:
+        variants = {"identity": body}
+    else:
+        # Сжатие большого списка заметно по времени - не держим им цикл событий
+        with span("compress", "cache", size=len(body)):
+            variants = await asyncio.to_thread(encode_variants, body)
+    return CachedBody(
+        variants=variants,
+        etag=f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"',
+        media_type=FORMATS[fmt],
+    )
+
+
+def _respond(entry: CachedBody, request: Request) -> Response:
+    headers = {"ETag": entry.etag, "Vary": "Accept-Encoding, Accept"}
+    if request.headers.get("if-none-match") == entry.etag:
+        return Response(status_code=304, headers=headers)
+    encoding = choose_encoding(request.headers.get("accept-encoding"), entry.variants)
+    if encoding != "identity":
+        # GZipMiddleware пропускает ответы с уже выставленным Content-Encoding
+        headers["Content-Encoding"] = encoding
+    return Response(content=entry.variants[encoding], media_type=entry.media_type, headers=headers)
+
+
+def cache_response(expire: int = 300, stale: int = 0, *, version):
+    """Кэш готовых байтов ответа GET-эндпоинта.
+
+    Ответ сериализуется по response_model и сжимается один раз; попадание
+    в кэш отдаёт сохранённые байты в кодировке из Accept-Encoding без
+    сериализации и сжатия. JSON и MessagePack (по Accept) - разные записи
+    кэша, каждая кодируется один раз. Одновременные промахи с одинаковым ключом ждут
+    одно вычисление. Если задан stale, значение старше expire, но моложе
+    expire + stale отдаётся сразу, а обновление идёт в фоне.
+
+    version(kwargs) - версия данных, которая входит в ключ: после изменения
+    ответ пересчитывается и в воркерах, чей кэш invalidate_user_cache не сбросил.
+    Кэш у каждого процесса свой, поэтому version обязателен
+    (для данных пользователя - api.statements.data_version).
+    """
+
+    def wrapper(func):
+        signature = inspect.signature(func)
+        # Request нужен для Accept-Encoding/If-None-Match - добавляем его в сигнатуру
+        inject_request = "request" not in signature.parameters
+
+        @wraps(func)
+        async def inner(*args, **kwargs):
+            request: Optional[Request] = kwargs.pop("request", None) if inject_request else kwargs.get("request")
+            if request is None:
+                # Вызов не из FastAPI (скрипты, проверка планов запросов)
+                return await func(*args, **kwargs)
+
+            with span("cache.lookup", "cache"):
+                key = f"{build_cache_key(func, kwargs)}@{version(kwargs)}"
+                fmt = choose_format(request.headers.get("accept"))
+                if fmt != "json":
+                    key = f"{key}#{fmt}"
+                entry = response_cache.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry.stored_at
+                if age < expire:
+                    return _respond(entry, request)
+                if age < expire + stale:
+                    if not flight.in_flight(key):
+                        flight.start(key, lambda: _refresh(func, key, route_for(request), fmt, args, kwargs))
+                    return _respond(entry, request)
+
+            route = route_for(request)
+
+            async def compute():
+                generation = response_cache.generation
+                result = await func(*args, **kwargs)
+                if isinstance(result, Response):
+                    return result
+                entry = await _build_entry(route, result, fmt)
+                if generation == response_cache.generation:
+                    response_cache.set(key, entry)
+                return entry
+
+            result = await flight.do(key, compute)
+            if isinstance(result, Response):
+                return result
+            return _respond(result, request)
+
+        if inject_request:
+            params = list(signature.parameters.values())
+            params.append(inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request))
+            inner.__signature__ = signature.replace(parameters=params)
+        return inner
+
+    return wrapper
+
+
+async def _refresh(func, key: str, route: Optional[APIRoute], fmt: str, args, kwargs):
+    # Сессия запроса закрывается после ответа, фоновому обновлению нужна своя
+    current_user = kwargs.get("current_user")
+    db = open_session(current_user.id if current_user is not None else None, readonly=True)
+    try:
+        generation = response_cache.generation
+        result = await func(*args, **{**kwargs, "db": db})
+        entry = await _build_entry(route, result, fmt)
+        if generation == response_cache.generation:
+            response_cache.set(key, entry)
+        return entry
+    except Exception:
+        logger.exception("Ошибка фонового обновления %s", key)
+    finally:
+        db.close()
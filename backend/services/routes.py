@@ -0,0 +1,16 @@
+from typing import Callable, Dict, Optional
+
+from fastapi import Request
+from fastapi.routing import APIRoute
+
+_routes_by_endpoint: Dict[Callable, APIRoute] = {}
+
+
+def route_for(request: Request) -> Optional[APIRoute]:
+    """Маршрут, обработавший запрос (после маршрутизации), например для шаблона пути."""
+    endpoint = request.scope.get("endpoint")
+    if endpoint not in _routes_by_endpoint:
+        for route in request.app.routes:
+            if isinstance(route, APIRoute):
+                _routes_by_endpoint[route.endpoint] = route
+    return _routes_by_endpoint.get(endpoint)
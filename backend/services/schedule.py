@@ -0,0 +1,102 @@
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import Lesson
+
+Interval = Tuple[datetime, datetime]
+
+
+def busy_lessons(db: Session, user_id: int, start: datetime, end: datetime,
+                 exclude_id: Optional[int] = None) -> List[Lesson]:
+    """Неотменённые занятия, пересекающиеся с [start, end), по возрастанию date.
+
+    Занятие, начавшееся раньше start, может пересекать интервал не дольше
+    самого длинного занятия пользователя, поэтому диапазон по
+    (user_id, date) ограничен с обеих сторон и не зависит от объёма истории.
+    """
+    max_duration = db.query(func.max(Lesson.duration)).filter(Lesson.user_id == user_id).scalar()
+    if max_duration is None:
+        return []
+    query = db.query(Lesson).filter(
+        Lesson.user_id == user_id,
+        Lesson.date > start - timedelta(minutes=max_duration),
+        Lesson.date < end,
+        Lesson.end_date > start,
+        Lesson.is_cancelled.isnot(True)
+    )
+    if exclude_id is not None:
+        query = query.filter(Lesson.id != exclude_id)
+    return query.order_by(Lesson.date).all()
+
+
+def overlapping_lessons(db: Session, user_id: int, ids: Iterable[int]) -> List[Tuple[int, int]]:
+    """Пары (id из ids, id пересекающегося занятия) после массового изменения.
+
+    end_date к этому моменту уже пересчитан, поэтому занятия из ids
+    сравниваются и между собой. Каждое занятие - отдельный запрос по
+    ограниченному диапазону (user_id, date), как в busy_lessons.
+    """
+    pairs = []
+    lessons = db.query(Lesson).filter(
+        Lesson.user_id == user_id,
+        Lesson.id.in_(list(ids)),
+        Lesson.is_cancelled.isnot(True)
+    ).populate_existing()  # массовый UPDATE шёл мимо объектов сессии
+    for lesson in lessons:
+        for other in busy_lessons(db, user_id, lesson.date, lesson.end_date, exclude_id=lesson.id):
+            pairs.append((lesson.id, other.id))
+    return pairs
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Даты занятий хранятся без часового пояса (UTC): "...Z" и "+03:00" приводим к ним."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def parse_working_hours(value: str) -> Tuple[time, time]:
+    """"09:00-21:00" -> (09:00, 21:00)."""
+    try:
+        start, end = (time.fromisoformat(part.strip()) for part in value.split("-"))
+    except ValueError:
+        raise ValueError("working_hours must look like HH:MM-HH:MM")
+    if start >= end:
+        raise ValueError("working_hours must end after it starts")
+    return start, end
+
+
+def free_slots(busy: List[Interval], start: datetime, end: datetime, duration: timedelta,
+               working_hours: Tuple[time, time]) -> List[Interval]:
+    """Свободные интервалы не короче duration внутри рабочих часов.
+
+    busy должен быть отсортирован по началу: один проход по занятиям
+    на весь диапазон дней.
+    """
+    slots = []
+    index = 0
+    day: date = start.date()
+    while day <= end.date():
+        window_start = max(datetime.combine(day, working_hours[0]), start)
+        window_end = min(datetime.combine(day, working_hours[1]), end)
+        day += timedelta(days=1)
+        if window_end - window_start < duration:
+            continue
+
+        # Занятия, закончившиеся до окна, больше не понадобятся
+        while index < len(busy) and busy[index][1] <= window_start:
+            index += 1
+        cursor = window_start
+        scan = index
+        while scan < len(busy) and busy[scan][0] < window_end:
+            busy_start, busy_end = busy[scan]
+            if busy_start - cursor >= duration:
+                slots.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            scan += 1
+        if window_end - cursor >= duration:
+            slots.append((cursor, window_end))
+    return slots
@@ -0,0 +1,186 @@
+"""Шардирование по преподавателям (SHARDING_ENABLED).
+
+Данные каждого пользователя лежат в отдельном файле SQLite
+(SHARD_DIR/user_<id>.db). Основная база (DATABASE_URL) остаётся
+каталогом: в ней users для входа, jobs и tenant_shards - какой файл
+принадлежит какому пользователю. Шард создаётся при первом обращении.
+
+Открытые engine шардов хранятся в LRU на SHARD_MAX_OPEN_ENGINES
+записей; вытесненный engine закрывает свои соединения. У каждого шарда
+свой писатель, поэтому записи разных преподавателей не ждут друг друга.
+
+Сессия запроса (ShardedSession) выбирает базу в get_bind: пока
+пользователь не известен (проверка токена) и для таблиц каталога -
+основная база, после get_current_user - шард пользователя.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import Base, ReadSessionLocal, SessionLocal, create_db_engine, engine, read_engine
+
+logger = logging.getLogger(__name__)
+
+# Таблицы, которые есть только в основной базе
+DIRECTORY_TABLES = {"jobs", "tenant_shards"}
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def shard_tables():
+    import models  # noqa: F401 - таблицы должны быть в Base.metadata
+    return [table for table in Base.metadata.sorted_tables if table.name not in DIRECTORY_TABLES]
+
+
+def shard_path(user_id: int) -> str:
+    return os.path.join(settings.SHARD_DIR, f"user_{user_id}.db")
+
+
+def stamp_head(connection):
+    """Помечает новый шард последней ревизией: схема создана по моделям."""
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    # script_location в alembic.ini задан относительно backend/
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    script = ScriptDirectory.from_config(config)
+    MigrationContext.configure(connection).stamp(script, "head")
+
+
+def init_shard(writer: Engine, user_row: dict):
+    """Создаёт таблицы шарда и копию строки пользователя (без пароля).
+
+    Копия нужна для внешних ключей и счётчика users.change_seq;
+    вход по-прежнему проверяется по основной базе.
+    """
+    from models import User
+
+    Base.metadata.create_all(writer, tables=shard_tables())
+    with writer.begin() as connection:
+        connection.execute(
+            sqlite_insert(User.__table__)
+            .values(id=user_row["id"], username=user_row["username"], change_seq=user_row.get("change_seq") or 0)
+            .on_conflict_do_nothing()
+        )
+        stamp_head(connection)
+
+
+class ShardEngines(NamedTuple):
+    writer: Engine
+    reader: Engine
+
+    def dispose(self):
+        self.writer.dispose()
+        self.reader.dispose()
+
+
+def open_shard_engines(path: str) -> ShardEngines:
+    url = f"sqlite:///{path}"
+    return ShardEngines(writer=create_db_engine(url), reader=create_db_engine(url, readonly=True))
+
+
+class ShardRouter:
+    """LRU открытых engine шардов по user_id."""
+
+    def __init__(self, max_engines: int):
+        self.max_engines = max_engines
+        self._engines: "OrderedDict[int, ShardEngines]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def engines_for(self, user_id: int) -> ShardEngines:
+        with self._lock:
+            engines = self._engines.get(user_id)
+            if engines is not None:
+                self._engines.move_to_end(user_id)
+                return engines
+
+            engines = open_shard_engines(self._resolve_path(user_id))
+            self._engines[user_id] = engines
+            while len(self._engines) > self.max_engines:
+                evicted_id, evicted = self._engines.popitem(last=False)
+                # Соединения, выданные сейчас, закроются при возврате в пул
+                evicted.dispose()
+                logger.debug("Закрыт engine шарда пользователя %s", evicted_id)
+            return engines
+
+    def dispose_all(self):
+        with self._lock:
+            for engines in self._engines.values():
+                engines.dispose()
+            self._engines.clear()
+
+    def _resolve_path(self, user_id: int) -> str:
+        from models import TenantShard, User
+
+        directory = SessionLocal()
+        try:
+            shard = directory.get(TenantShard, user_id)
+            if shard is not None:
+                return shard.path
+
+            user = directory.get(User, user_id)
+            if user is None:
+                raise LookupError(f"User {user_id} not found")
+            path = shard_path(user_id)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            engines = open_shard_engines(path)
+            try:
+                init_shard(engines.writer, {"id": user.id, "username": user.username, "change_seq": user.change_seq})
+            finally:
+                engines.dispose()
+            directory.add(TenantShard(user_id=user_id, path=path))
+            directory.commit()
+            logger.info("Создан шард пользователя %s: %s", user_id, path)
+            return path
+        finally:
+            directory.close()
+
+
+shard_router = ShardRouter(max_engines=settings.SHARD_MAX_OPEN_ENGINES)
+
+
+class ShardedSession(Session):
+    """Сессия, выбирающая базу по текущему пользователю.
+
+    user_id запрашивается лениво: в FastAPI сессия создаётся раньше, чем
+    get_current_user узнаёт пользователя.
+    """
+
+    def __init__(self, resolve_user_id: Callable[[], Optional[int]], readonly: bool = False, **kwargs):
+        super().__init__(autocommit=False, autoflush=False, **kwargs)
+        self._resolve_user_id = resolve_user_id
+        self._readonly = readonly
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        user_id = self._resolve_user_id()
+        if user_id is None or (mapper is not None and mapper.local_table.name in DIRECTORY_TABLES):
+            return read_engine if self._readonly else engine
+        engines = shard_router.engines_for(user_id)
+        return engines.reader if self._readonly else engines.writer
+
+
+def open_session(user_id: Optional[int], readonly: bool = False) -> Session:
+    """Сессия к данным пользователя вне запроса (фоновое обновление кэша и т.п.)."""
+    if settings.SHARDING_ENABLED:
+        return ShardedSession(lambda: user_id, readonly=readonly)
+    return ReadSessionLocal() if readonly else SessionLocal()
+
+
+def iter_shards():
+    """(user_id, path) всех шардов из каталога."""
+    from models import TenantShard
+
+    directory = SessionLocal()
+    try:
+        return directory.execute(select(TenantShard.user_id, TenantShard.path).order_by(TenantShard.user_id)).all()
+    finally:
+        directory.close()
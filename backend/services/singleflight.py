@@ -0,0 +1,47 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+# Аргументы эндпоинтов, которые не влияют на результат
+NON_KEY_PARAMS = {"db", "current_user", "request", "response"}
+
+
+def build_cache_key(func: Callable, kwargs: Dict[str, Any]) -> str:
+    """Ключ по пользователю, эндпоинту и параметрам запроса.
+
+    Пользователь стоит первым, чтобы сбрасывать кэш по префиксу user_key_prefix.
+    """
+    user = kwargs.get("current_user")
+    params = ",".join(
+        f"{name}={kwargs[name]!r}" for name in sorted(kwargs) if name not in NON_KEY_PARAMS
+    )
+    return f"{user_key_prefix(getattr(user, 'id', None))}{func.__module__}:{func.__name__}:{params}"
+
+
+def user_key_prefix(user_id) -> str:
+    return f"user-{user_id}:"
+
+
+class SingleFlight:
+    """Объединяет одновременные вызовы с одинаковым ключом в одно вычисление."""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    def start(self, key: str, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._calls.get(key)
+        if task is None:
+            # Вычисление живёт в отдельной задаче, чтобы отмена одного
+            # из ожидающих запросов не прерывала его для остальных
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return task
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        return await asyncio.shield(self.start(key, fn))
+
+
+flight = SingleFlight()
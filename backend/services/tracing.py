@@ -0,0 +1,209 @@
+"""Трассировка запросов без внешнего коллектора (TRACING_ENABLED).
+
+Каждый запрос получает трассу со спанами: проверка токена и поиск
+пользователя, каждый SQL-запрос, поиск в кэше ответов, сериализация и
+сжатие. Трасса связана с логами через request_id (services/log_pipeline.py).
+
+Решение о сохранении принимается в конце запроса (tail-based): пишутся
+трассы дольше TRACE_SLOW_MS, с ошибкой (статус 5xx или исключение) и
+доля TRACE_SAMPLE_RATE остальных. Формат - Chrome trace (JSON Array
+Format): файл открывается в chrome://tracing или ui.perfetto.dev, каждый
+запрос - отдельная строка-дорожка. Файл TRACE_FILE ротируется по
+TRACE_FILE_MAX_MB, запись идёт в фоновом потоке.
+"""
+import itertools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueListener, RotatingFileHandler
+from typing import List, Optional
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import settings
+from services.log_pipeline import DroppingQueueHandler, request_id_var
+from services.routes import route_for
+
+# perf_counter для длительностей, смещение - чтобы ts были временем эпохи
+_EPOCH_OFFSET = time.time() - time.perf_counter()
+_trace_ids = itertools.count(1)
+
+SQL_TEXT_LIMIT = 300
+
+
+def _now_us() -> float:
+    return (time.perf_counter() + _EPOCH_OFFSET) * 1_000_000
+
+
+class Trace:
+    def __init__(self, request_id: Optional[str], name: str):
+        self.id = next(_trace_ids)
+        self.request_id = request_id
+        self.name = name
+        self.events: List[dict] = []
+        self.error = False
+
+    def add(self, name: str, category: str, start_us: float, end_us: float, args: Optional[dict] = None):
+        # Спаны SQL приходят и из потоков пула - list.append потокобезопасен
+        self.events.append({
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round(start_us, 1),
+            "dur": round(end_us - start_us, 1),
+            "pid": os.getpid(),
+            "tid": self.id,
+            "args": args or {},
+        })
+
+    def chrome_events(self) -> List[dict]:
+        label = {
+            "name": "thread_name",
+            "ph": "M",
+            "pid": os.getpid(),
+            "tid": self.id,
+            "args": {"name": f"{self.name} [{self.request_id}]"},
+        }
+        return [label] + self.events
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def span(name: str, category: str = "app", **args):
+    """Спан текущей трассы; вне трассы ничего не делает."""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = _now_us()
+    try:
+        yield
+    except Exception:
+        args["error"] = True
+        raise
+    finally:
+        trace.add(name, category, start, _now_us(), args)
+
+
+class ChromeTraceFileHandler(RotatingFileHandler):
+    """Файл в формате JSON Array: "[" в начале, события через запятую.
+
+    Закрывающая скобка не нужна - chrome://tracing и Perfetto читают
+    незакрытый массив, поэтому файл всегда пригоден для открытия.
+    """
+
+    def _open(self):
+        stream = super()._open()
+        if stream.tell() == 0:
+            stream.write("[\n")
+        return stream
+
+
+class TraceExporter:
+    def __init__(self):
+        self._logger = logging.getLogger("tracing.export")
+        self._logger.propagate = False
+        self._listener: Optional[QueueListener] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._listener is not None:
+                return
+            os.makedirs(os.path.dirname(settings.TRACE_FILE) or ".", exist_ok=True)
+            handler = ChromeTraceFileHandler(
+                settings.TRACE_FILE,
+                maxBytes=settings.TRACE_FILE_MAX_MB * 1024 * 1024,
+                backupCount=settings.TRACE_FILE_BACKUPS,
+                encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            log_queue = queue.Queue(maxsize=1000)
+            # Трассы не должны тормозить запросы: при переполнении отбрасываются
+            self._logger.handlers = [DroppingQueueHandler(log_queue)]
+            self._logger.setLevel(logging.INFO)
+            self._listener = QueueListener(log_queue, handler)
+            self._listener.start()
+
+    def stop(self):
+        with self._lock:
+            if self._listener is not None:
+                self._listener.stop()
+                self._listener = None
+
+    def export(self, trace: Trace):
+        # Одна строка на трассу, запятая в конце - следующий элемент массива
+        line = ",\n".join(json.dumps(item, ensure_ascii=False, default=str) for item in trace.chrome_events()) + ","
+        self._logger.info(line)
+
+
+exporter = TraceExporter()
+
+
+def keep_trace(duration_ms: float, trace: Trace) -> bool:
+    if trace.error or duration_ms >= settings.TRACE_SLOW_MS:
+        return True
+    return settings.TRACE_SAMPLE_RATE > 0 and random.random() < settings.TRACE_SAMPLE_RATE
+
+
+async def trace_requests(request: Request, call_next):
+    """Middleware: трасса на запрос, сохраняется по итогам (tail-based)."""
+    trace = Trace(request_id_var.get(), f"{request.method} {request.url.path}")
+    token = current_trace.set(trace)
+    start = _now_us()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    except Exception:
+        trace.error = True
+        raise
+    finally:
+        end = _now_us()
+        current_trace.reset(token)
+        route = route_for(request)
+        trace.name = f"{request.method} {route.path if route is not None else request.url.path}"
+        trace.error = trace.error or status >= 500
+        trace.add(
+            trace.name, "request", start, end,
+            {"status": status, "path": request.url.path, "request_id": trace.request_id},
+        )
+        if keep_trace((end - start) / 1000, trace):
+            exporter.export(trace)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _sql_start(conn, cursor, statement, parameters, context, executemany):
+    if current_trace.get() is not None:
+        conn.info.setdefault("trace_starts", []).append(_now_us())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _sql_end(conn, cursor, statement, parameters, context, executemany):
+    trace = current_trace.get()
+    starts = conn.info.get("trace_starts")
+    if trace is None or not starts:
+        return
+    trace.add("sql", "sql", starts.pop(), _now_us(), {"statement": " ".join(statement.split())[:SQL_TEXT_LIMIT]})
+
+
+@event.listens_for(Engine, "handle_error")
+def _sql_error(context):
+    # Начало запроса, завершившегося ошибкой, не должно достаться следующему
+    starts = context.connection.info.get("trace_starts") if context.connection is not None else None
+    if starts:
+        starts.pop()
+    trace = current_trace.get()
+    if trace is not None:
+        trace.error = True
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Tuple
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from config import settings
+from database import Base, writer_engine
+
+logger = logging.getLogger(__name__)
+
+WriteFn = Callable[[Session], Any]
+
+_STOP = object()
+
+# expire_on_commit=False: объекты из результата читаются уже после закрытия сессии писателя
+WriterSession = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=writer_engine)
+
+
+class WriteQueue:
+    """Единственный поток-писатель с групповым коммитом.
+
+    Изменения, пришедшие в пределах WRITE_QUEUE_MAX_DELAY_MS, выполняются
+    одной транзакцией: один fsync на пачку вместо одного на строку и никаких
+    "database is locked" между потоками одного процесса. Если одна из функций
+    в пачке падает, пачка откатывается и функции выполняются по одной, чтобы
+    ошибка досталась только своему вызывающему.
+    """
+
+    def __init__(self, session_factory=WriterSession, max_batch: int = 100, max_delay: float = 0.005):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._stopping = False
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, fn: WriteFn) -> Future:
+        future: Future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def _collect(self, first) -> List[Tuple[WriteFn, Future]]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._stopping = True
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self):
+        while not (self._stopping and self._queue.empty()):
+            item = self._queue.get()
+            if item is _STOP:
+                self._stopping = True
+                continue
+            batch = [(fn, future) for fn, future in self._collect(item) if future.set_running_or_notify_cancel()]
+            if batch:
+                self._commit_batch(batch)
+
+    def _commit_batch(self, batch: List[Tuple[WriteFn, Future]]):
+        if len(batch) > 1:
+            session = self.session_factory()
+            try:
+                results = []
+                for fn, _ in batch:
+                    results.append(fn(session))
+                    session.flush()
+                session.commit()
+            except Exception:
+                session.rollback()
+                logger.debug("Групповой коммит из %s изменений не удался, выполняем по одному", len(batch))
+            else:
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+                return
+            finally:
+                session.close()
+
+        for fn, future in batch:
+            self._commit_one(fn, future)
+
+    def _commit_one(self, fn: WriteFn, future: Future):
+        session = self.session_factory()
+        try:
+            result = fn(session)
+            session.commit()
+        except BaseException as e:
+            session.rollback()
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            session.close()
+
+
+write_queue = WriteQueue(
+    max_batch=settings.WRITE_QUEUE_MAX_BATCH,
+    max_delay=settings.WRITE_QUEUE_MAX_DELAY_MS / 1000,
+)
+
+
+async def run_write(db: Session, fn: WriteFn) -> Any:
+    """Выполняет изменение и коммитит его.
+
+    fn получает сессию, вносит изменения без commit и возвращает результат.
+    При WRITE_QUEUE_ENABLED изменение уходит потоку-писателю, иначе
+    выполняется в сессии запроса, как раньше. При SHARDING_ENABLED очередь
+    не используется: у каждого шарда свой писатель.
+    """
+    if settings.WRITE_QUEUE_ENABLED and not settings.SHARDING_ENABLED:
+        # Соединение сессии запроса (проверки перед записью) не держим, пока ждём писателя.
+        # Загруженные объекты (current_user) остаются доступны для чтения.
+        db.close()
+        return await asyncio.wrap_future(write_queue.submit(fn))
+
+    try:
+        result = fn(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    if isinstance(result, Base):
+        db.refresh(result)
+    return result
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""Разделение общей базы на шарды по пользователям (SHARDING_ENABLED).
+
+Для каждого пользователя без шарда создаёт SHARD_DIR/user_<id>.db,
+копирует в него строки пользователя из всех таблиц с user_id (кроме
+каталожных jobs и tenant_shards) и регистрирует файл в tenant_shards.
+Основная база остаётся каталогом. С --prune перенесённые строки
+удаляются из основной базы после регистрации шарда.
+
+Перед запуском основная база должна быть обновлена (alembic upgrade head).
+
+Запуск:
+    python split_shards.py [--prune]
+    python split_shards.py --migrate   # alembic upgrade head для всех шардов
+"""
+import argparse
+import os
+import sqlite3
+import subprocess
+import sys
+
+from database import SessionLocal, engine
+from models import TenantShard, User
+from services.shards import BACKEND_DIR, iter_shards, init_shard, open_shard_engines, shard_path, shard_tables
+
+
+def data_tables():
+    return [table for table in shard_tables() if "user_id" in table.c]
+
+
+def remove_files(path: str):
+    # Недоделанный шард от прерванного запуска: он ещё не в каталоге
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def copy_user_rows(source: str, path: str, user_id: int) -> int:
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute("ATTACH DATABASE ? AS src", (source,))
+        copied = 0
+        with connection:
+            for table in data_tables():
+                columns = ", ".join(column.name for column in table.columns)
+                cursor = connection.execute(
+                    f"INSERT INTO main.{table.name} ({columns}) "
+                    f"SELECT {columns} FROM src.{table.name} WHERE user_id = ?",
+                    (user_id,),
+                )
+                copied += cursor.rowcount
+        connection.execute("DETACH DATABASE src")
+        return copied
+    finally:
+        connection.close()
+
+
+def prune_user_rows(user_id: int):
+    with engine.begin() as connection:
+        # Обратный порядок: сначала строки, ссылающиеся на другие
+        for table in reversed(data_tables()):
+            connection.exec_driver_sql(f"DELETE FROM {table.name} WHERE user_id = ?", (user_id,))
+
+
+def split(prune: bool):
+    source = engine.url.database
+    if engine.url.get_backend_name() != "sqlite" or not source or source == ":memory:":
+        raise SystemExit("Разделение поддерживается только для файловой SQLite")
+
+    directory = SessionLocal()
+    try:
+        users = directory.query(User).order_by(User.id).all()
+        sharded = {user_id for user_id, _ in iter_shards()}
+        for user in users:
+            if user.id in sharded:
+                print(f"Пользователь {user.id}: шард уже есть, пропускаем")
+                continue
+            path = shard_path(user.id)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            remove_files(path)
+
+            engines = open_shard_engines(path)
+            try:
+                init_shard(engines.writer, {"id": user.id, "username": user.username, "change_seq": user.change_seq})
+            finally:
+                engines.dispose()
+            copied = copy_user_rows(source, path, user.id)
+
+            directory.add(TenantShard(user_id=user.id, path=path))
+            directory.commit()
+            if prune:
+                prune_user_rows(user.id)
+            print(f"Пользователь {user.id}: {copied} строк -> {path}")
+    finally:
+        directory.close()
+
+
+def migrate():
+    failed = 0
+    for user_id, path in iter_shards():
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{path}"}
+        result = subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=BACKEND_DIR, env=env)
+        if result.returncode != 0:
+            print(f"Пользователь {user_id}: ошибка миграции {path}")
+            failed += 1
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Шардирование базы по пользователям")
+    parser.add_argument("--prune", action="store_true", help="удалить перенесённые строки из основной базы")
+    parser.add_argument("--migrate", action="store_true", help="применить миграции ко всем шардам")
+    args = parser.parse_args()
+    if args.migrate:
+        return migrate()
+    split(args.prune)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -34,7 +34,6 @@ call venv\Scripts\activate.bat
 echo Installing backend dependencies...
 cd backend
 pip install -r requirements.txt
-pip install uvloop  # Установка uvloop для оптимизации производительности
 
 :: Создание файла .env для бэкенда
 echo Creating backend .env file...
@@ -77,7 +76,7 @@ echo call venv\Scripts\activate.bat >> start_backend.bat
 echo cd backend >> start_backend.bat
 echo set PYTHONUNBUFFERED=1 >> start_backend.bat
 echo set PYTHONHASHSEED=random >> start_backend.bat
-echo uvicorn main:app --host 0.0.0.0 --port 8000 --workers 4 --loop uvloop --limit-concurrency 1000 --timeout-keep-alive 30 --access-log >> start_backend.bat
+echo python serve.py >> start_backend.bat
 
 :: Скрипт для запуска фронтенда с оптимизациями
 echo @echo off > start_frontend.bat
@@ -111,7 +110,7 @@ echo Username: admin
 echo Password: admin
 echo.
 echo Performance Optimizations:
-echo - Backend uses uvloop for better performance
+echo - Backend runs serve.py: workers by CPU count, httptools parser
 echo - Frontend is optimized with webpack
 echo - Database connections are pooled
 echo - API responses are compressed
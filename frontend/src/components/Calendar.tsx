@@ -707,9 +707,15 @@ const Calendar: React.FC = () => {
     const controller = new AbortController();
     const signal = controller.signal;
 
-    // Функция для загрузки данных с учетом сигнала отмены
+    // Ученики и уроки одним запросом (/views/calendar), при ошибке - по отдельности
     const loadData = async () => {
-      if (!signal.aborted) {
+      if (signal.aborted) return;
+      try {
+        const response = await api.get('/views/calendar', { signal });
+        setStudents(response.data.students);
+        setLessons(response.data.lessons);
+      } catch (error) {
+        if (error instanceof Error && error.name === 'CanceledError') return;
         await Promise.all([
           fetchStudents(),
           fetchLessons()
@@ -106,40 +106,18 @@ const Finance: React.FC = () => {
     setError(null);
 
     try {
-      const [expensesResponse, incomesResponse, subscriptionsResponse, studentsResponse] = await Promise.all([
-        api.get('/expenses/', {
-          params: { skip: (page - 1) * ITEMS_PER_PAGE, limit: ITEMS_PER_PAGE },
-          signal: abortControllerRef.current.signal
-        }).catch((err: Error) => {
-          if (err.name === 'CanceledError') return { data: [] };
-          throw err;
-        }),
-        api.get('/incomes/', {
-          params: { skip: (page - 1) * ITEMS_PER_PAGE, limit: ITEMS_PER_PAGE },
-          signal: abortControllerRef.current.signal
-        }).catch((err: Error) => {
-          if (err.name === 'CanceledError') return { data: [] };
-          throw err;
-        }),
-        api.get('/subscriptions/', { 
-          signal: abortControllerRef.current.signal 
-        }).catch((err: Error) => {
-          if (err.name === 'CanceledError') return { data: [] };
-          throw err;
-        }),
-        api.get('/students/', { 
-          signal: abortControllerRef.current.signal 
-        }).catch((err: Error) => {
-          if (err.name === 'CanceledError') return { data: [] };
-          throw err;
-        })
-      ]);
-
-      setExpenses(expensesResponse.data);
-      setIncomes(incomesResponse.data);
-      setSubscriptions(subscriptionsResponse.data);
-      setStudents(studentsResponse.data);
-      setTotalPages(Math.ceil(expensesResponse.data.length / ITEMS_PER_PAGE));
+      // Все данные страницы одним запросом (/views/finance)
+      const response = await api.get('/views/finance', {
+        params: { skip: (page - 1) * ITEMS_PER_PAGE, limit: ITEMS_PER_PAGE },
+        signal: abortControllerRef.current.signal
+      });
+      const view = response.data;
+
+      setExpenses(view.expenses);
+      setIncomes(view.incomes);
+      setSubscriptions(view.subscriptions);
+      setStudents(view.students);
+      setTotalPages(Math.ceil(view.expenses.length / ITEMS_PER_PAGE));
     } catch (err) {
       if (err instanceof Error && err.name === 'CanceledError') return;
       setError('Ошибка при загрузке данных');